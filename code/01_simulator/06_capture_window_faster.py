@@ -3,44 +3,20 @@
 # 설치: pip install pygetwindow pyautogui pillow
 
 import os
-import pygetwindow as gw
-import mss
-import numpy as np
-from PIL import Image
 import time
-import win32gui
-import win32con
 from directkeys import PressKey, ReleaseKey
+from window_handle import CaptureWindow
+from capture_engine import CaptureEngine, MssSource
 
-def capture_arma3_window(win, save_path='data/capture/01_capture_arma3.png'):
-	# win: pygetwindow 윈도우 객체 (이미 찾은 창)
-	if win.isMinimized:
-		print("최소화된 창 복원 중...")
-		win.restore()
-		time.sleep(0.1)
-	win.activate()
-	# win32gui로 클라이언트 영역 좌표 얻기
-	hwnd = win._hWnd
-	rect = win32gui.GetClientRect(hwnd)
-	left_top = win32gui.ClientToScreen(hwnd, (rect[0], rect[1]))
-	right_bottom = win32gui.ClientToScreen(hwnd, (rect[2], rect[3]))
-	left, top = left_top
-	right, bottom = right_bottom
-	width = right - left
-	height = bottom - top
-	# mss로 빠른 캡처
-	with mss.mss() as sct:
-		monitor = {"left": left, "top": top, "width": width, "height": height}
-		img = sct.grab(monitor)
-		img_pil = Image.frombytes("RGB", img.size, img.rgb)
-		img_pil.save(save_path)
-	return True
+def capture_arma3_window(window, engine, save_path='data/capture/01_capture_arma3.png'):
+	# window: CaptureWindow (클라이언트 영역 좌표는 캐시된 값 사용)
+	# engine: CaptureEngine (grab만 하고 PNG 저장은 인코더 워커가 처리)
+	# 계속 열어둔 mss로 grab → 링 버퍼 → 백그라운드 인코딩
+	return engine.capture(save_path, window.region())
 
-def send_n_key_to_arma3(win):
-	# win: pygetwindow 윈도우 객체 (이미 찾은 창)
-	if win.isMinimized:
-		win.restore()
-	win.activate()
+def send_n_key_to_arma3(window):
+	# window: CaptureWindow (최소화/포커스 검사는 검사 주기마다 한 번만)
+	window.ensure_foreground()
 	VK_N_SCAN = 0x31  # 'N'의 스캔코드
 	PressKey(VK_N_SCAN)
 	ReleaseKey(VK_N_SCAN)
@@ -55,29 +31,35 @@ def main():
 	}
 	time.sleep(10) 
 	# 최초 1회만 창 찾기
-	windows = gw.getWindowsWithTitle('Arma 3')
-	if not windows:
+	window = CaptureWindow.find('Arma 3', check_interval=0.5)
+	if window is None:
 		print('Arma 3 실행 창을 찾을 수 없습니다.')
 		return
-	win = windows[0]
-	if win.isMinimized:
-		win.restore()
-	win.activate()
+	window.region()
+	# grab은 메인 스레드, PNG 인코딩은 워커 스레드에서 처리
+	engine = CaptureEngine(MssSource(), num_slots=8, num_workers=3).start()
 	idx = 1
 	mode_idx = 0
-	while True:
-		mode = MODES[mode_idx]
-		dir_path = MODE_DIRS[mode]
-		save_path = os.path.join(dir_path, f"{idx:06d}_{mode}.png")
-		capture_arma3_window(win, save_path) # 화면 캡처
-		send_n_key_to_arma3(win) # 화면 전환
+	try:
+		while True:
+			mode = MODES[mode_idx]
+			dir_path = MODE_DIRS[mode]
+			save_path = os.path.join(dir_path, f"{idx:06d}_{mode}.png")
+			capture_arma3_window(window, engine, save_path) # 화면 캡처
+			send_n_key_to_arma3(window) # 화면 전환
 
-		time.sleep(0.05)  # 화면 전환 대기 시간: 0.05s
-		mode_idx += 1
-		if mode_idx == 3:
-			mode_idx = 0
-			idx += 1
-			time.sleep(1)  # 인덱스가 넘어갈 때 1초 대기
+			time.sleep(0.05)  # 화면 전환 대기 시간: 0.05s
+			mode_idx += 1
+			if mode_idx == 3:
+				mode_idx = 0
+				idx += 1
+				s = engine.stats()
+				print(f"[{idx - 1:06d}] 큐 깊이: {s['queue_depth']}, 드롭: {s['dropped']}, 평균 인코딩: {s['avg_encode_ms']:.1f}ms")
+				time.sleep(1)  # 인덱스가 넘어갈 때 1초 대기
+	finally:
+		# 종료(Ctrl+C) 시 큐에 남은 프레임까지 모두 저장
+		engine.stop()
+		print('창 핸들 호출 통계:', window.summary())
 
 if __name__ == '__main__':
 	main()
\ No newline at end of file
@@ -0,0 +1,277 @@
+# 화면 캡처(grab)와 PNG 인코딩을 분리한 파이프라인 캡처 엔진
+# - grabber 1개를 계속 유지 (프레임마다 mss.mss()를 새로 열지 않음)
+# - 미리 할당한 프레임 버퍼 링(ring)에 캡처 → 인코더 워커 풀이 큐에서 꺼내 저장
+# - 드롭된 프레임 수, 큐 깊이 통계 제공
+# - 게임 없이도 합성(synthetic)/파일 재생(replay) 소스로 리눅스에서 벤치마크 가능
+# 필요한 패키지: mss, numpy, pillow
+# 설치: pip install mss numpy pillow
+#
+# 벤치마크 예: python capture_engine.py --source synthetic --frames 300 --workers 4
+
+import os
+import glob
+import queue
+import threading
+import time
+import numpy as np
+from PIL import Image
+
+
+def save_png(frame, save_path):
+	"""기본 저장 함수: RGB 프레임을 PNG로 저장"""
+	Image.fromarray(frame).save(save_path)
+
+
+class MssSource:
+	"""mss 기반 화면 소스 (mss 인스턴스를 한 번만 만들고 계속 재사용)"""
+
+	def __init__(self, region=None):
+		self.region = region  # {"left", "top", "width", "height"}
+		self._sct = None
+
+	def frame_shape(self, region=None):
+		region = region or self.region
+		return (region['height'], region['width'], 3)
+
+	def grab_into(self, out, region=None):
+		# mss 인스턴스는 처음 grab한 스레드에서 생성 (Windows DC는 스레드에 묶임)
+		if self._sct is None:
+			import mss
+			self._sct = mss.mss()
+		img = self._sct.grab(region or self.region)
+		bgra = np.frombuffer(img.bgra, dtype=np.uint8).reshape(img.height, img.width, 4)
+		np.copyto(out, bgra[:, :, 2::-1])  # BGRA -> RGB
+		return out
+
+	def close(self):
+		if self._sct is not None:
+			self._sct.close()
+			self._sct = None
+
+
+class SyntheticSource:
+	"""합성 프레임 소스 (게임 없이 처리량 측정용, 매 프레임 조금씩 움직이는 패턴)"""
+
+	def __init__(self, width=1920, height=1080, seed=0):
+		rng = np.random.default_rng(seed)
+		# 완전 랜덤 노이즈는 PNG 압축이 비현실적으로 느려지므로 그라디언트 + 약한 노이즈 사용
+		yy, xx = np.mgrid[0:height, 0:width]
+		base = np.stack([xx * 255 // max(width - 1, 1),
+						 yy * 255 // max(height - 1, 1),
+						 (xx + yy) * 255 // max(width + height - 2, 1)], axis=-1)
+		noise = rng.integers(0, 4, size=base.shape)
+		self._base = (base + noise).clip(0, 255).astype(np.uint8)
+		self._shift = 0
+
+	def frame_shape(self, region=None):
+		return self._base.shape
+
+	def grab_into(self, out, region=None):
+		self._shift = (self._shift + 8) % self._base.shape[1]
+		np.copyto(out[:, self._shift:], self._base[:, :self._base.shape[1] - self._shift])
+		np.copyto(out[:, :self._shift], self._base[:, self._base.shape[1] - self._shift:])
+		return out
+
+
+class ReplaySource:
+	"""이미지 파일을 미리 메모리에 올려두고 순서대로 반복 재생하는 소스"""
+
+	def __init__(self, image_paths):
+		if not image_paths:
+			raise ValueError('재생할 이미지가 없습니다.')
+		self._frames = [np.asarray(Image.open(p).convert('RGB')) for p in image_paths]
+		shapes = {f.shape for f in self._frames}
+		if len(shapes) != 1:
+			raise ValueError(f'재생 이미지 크기가 서로 다릅니다: {shapes}')
+		self._pos = 0
+
+	def frame_shape(self, region=None):
+		return self._frames[0].shape
+
+	def grab_into(self, out, region=None):
+		np.copyto(out, self._frames[self._pos])
+		self._pos = (self._pos + 1) % len(self._frames)
+		return out
+
+
+class CaptureEngine:
+	"""
+	파이프라인 캡처 엔진
+
+	capture()는 호출한 스레드에서 링 버퍼의 빈 슬롯에 바로 grab만 하고,
+	저장(인코딩)은 워커 스레드가 큐에서 꺼내 처리한다.
+
+	Args:
+		source: grab_into(out, region), frame_shape(region)를 가진 프레임 소스
+		num_slots: 미리 할당할 프레임 버퍼 개수 (링 크기)
+		num_workers: 인코더 워커 스레드 수
+		block: True면 빈 슬롯이 생길 때까지 대기, False면 프레임을 드롭
+		sink: 저장 함수 sink(frame, target) (기본값: PNG 저장)
+	"""
+
+	def __init__(self, source, num_slots=8, num_workers=2, block=True, sink=save_png):
+		self.source = source
+		self.num_slots = num_slots
+		self.num_workers = num_workers
+		self.block = block
+		self.sink = sink
+
+		self._ring = None
+		self._scratch = None
+		self._free = queue.Queue()
+		self._jobs = queue.Queue()
+		self._workers = []
+		self._lock = threading.Lock()
+		self._stats = {'grabbed': 0, 'encoded': 0, 'dropped': 0, 'errors': 0,
+					   'max_queue_depth': 0, 'grab_time': 0.0, 'encode_time': 0.0}
+
+	def start(self):
+		for i in range(self.num_workers):
+			t = threading.Thread(target=self._worker, name=f'encoder-{i}', daemon=True)
+			t.start()
+			self._workers.append(t)
+		return self
+
+	def _allocate(self, shape):
+		# 해상도가 바뀌면 진행 중인 인코딩을 모두 끝낸 뒤 링을 다시 할당
+		if self._ring is not None:
+			self.flush()
+		self._ring = np.empty((self.num_slots,) + tuple(shape), dtype=np.uint8)
+		self._free = queue.Queue()
+		for slot in range(self.num_slots):
+			self._free.put(slot)
+
+	def capture(self, target, region=None):
+		"""프레임 1장을 grab해서 인코딩 큐에 넣는다. 드롭되면 False 반환"""
+		shape = self.source.frame_shape(region)
+		if self._ring is None or self._ring.shape[1:] != tuple(shape):
+			self._allocate(shape)
+		try:
+			slot = self._free.get(block=self.block)
+		except queue.Empty:
+			with self._lock:
+				self._stats['dropped'] += 1
+			return False
+
+		t0 = time.perf_counter()
+		self.source.grab_into(self._ring[slot], region)
+		grab_time = time.perf_counter() - t0
+
+		self._jobs.put((slot, target))
+		depth = self._jobs.qsize()
+		with self._lock:
+			self._stats['grabbed'] += 1
+			self._stats['grab_time'] += grab_time
+			self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+		return True
+
+	def peek(self, region=None):
+		"""링/큐를 거치지 않고 scratch 버퍼에 grab만 한다 (화면 전환 감지용, 저장하지 않음)"""
+		shape = tuple(self.source.frame_shape(region))
+		if self._scratch is None or self._scratch.shape != shape:
+			self._scratch = np.empty(shape, dtype=np.uint8)
+		return self.source.grab_into(self._scratch, region)
+
+	def _worker(self):
+		while True:
+			job = self._jobs.get()
+			if job is None:
+				self._jobs.task_done()
+				break
+			slot, target = job
+			t0 = time.perf_counter()
+			try:
+				self.sink(self._ring[slot], target)
+				ok = True
+			except Exception as e:
+				print(f'[CaptureEngine] 저장 실패: {target} ({e})')
+				ok = False
+			encode_time = time.perf_counter() - t0
+			self._free.put(slot)
+			with self._lock:
+				self._stats['encoded' if ok else 'errors'] += 1
+				self._stats['encode_time'] += encode_time
+			self._jobs.task_done()
+
+	def queue_depth(self):
+		return self._jobs.qsize()
+
+	def flush(self):
+		"""큐에 남은 프레임이 모두 저장될 때까지 대기"""
+		self._jobs.join()
+
+	def stop(self):
+		self.flush()
+		for _ in self._workers:
+			self._jobs.put(None)
+		for t in self._workers:
+			t.join()
+		self._workers = []
+		if hasattr(self.source, 'close'):
+			self.source.close()
+
+	def stats(self):
+		with self._lock:
+			s = dict(self._stats)
+		s['queue_depth'] = self._jobs.qsize()
+		s['avg_grab_ms'] = s['grab_time'] / s['grabbed'] * 1000 if s['grabbed'] else 0.0
+		done = s['encoded'] + s['errors']
+		s['avg_encode_ms'] = s['encode_time'] / done * 1000 if done else 0.0
+		return s
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc, tb):
+		self.stop()
+
+
+def benchmark(source, out_dir, frames=300, num_slots=8, num_workers=2, block=True, interval=0.0):
+	"""엔진 처리량 측정 (interval: grab 간격 초, 0이면 최대 속도)"""
+	os.makedirs(out_dir, exist_ok=True)
+	engine = CaptureEngine(source, num_slots=num_slots, num_workers=num_workers, block=block)
+	t0 = time.perf_counter()
+	with engine:
+		for idx in range(frames):
+			engine.capture(os.path.join(out_dir, f'{idx:06d}.png'))
+			if interval > 0:
+				time.sleep(interval)
+		grab_done = time.perf_counter() - t0
+	total = time.perf_counter() - t0
+	s = engine.stats()
+	print(f'프레임: {frames}장, 워커: {num_workers}, 슬롯: {num_slots}, block={block}')
+	print(f'grab 완료: {grab_done:.2f}s ({s["grabbed"] / grab_done:.1f} fps)')
+	print(f'저장 완료: {total:.2f}s ({s["encoded"] / total:.1f} fps)')
+	print(f'평균 grab: {s["avg_grab_ms"]:.2f}ms, 평균 인코딩: {s["avg_encode_ms"]:.2f}ms')
+	print(f'드롭: {s["dropped"]}장, 저장 실패: {s["errors"]}장, 최대 큐 깊이: {s["max_queue_depth"]}')
+	return s
+
+
+if __name__ == '__main__':
+	import argparse
+	import tempfile
+
+	parser = argparse.ArgumentParser(description='캡처 엔진 처리량 벤치마크 (게임 없이 실행 가능)')
+	parser.add_argument('--source', choices=['synthetic', 'replay'], default='synthetic')
+	parser.add_argument('--replay_dir', default='', help='replay 소스로 쓸 이미지 폴더')
+	parser.add_argument('--frames', type=int, default=300)
+	parser.add_argument('--width', type=int, default=1920)
+	parser.add_argument('--height', type=int, default=1080)
+	parser.add_argument('--slots', type=int, default=8)
+	parser.add_argument('--workers', type=int, default=2)
+	parser.add_argument('--interval', type=float, default=0.0, help='grab 간격(초)')
+	parser.add_argument('--drop', action='store_true', help='버퍼가 가득 차면 대기하지 않고 프레임 드롭')
+	parser.add_argument('--out', default='', help='저장 폴더 (기본: 임시 폴더)')
+	args = parser.parse_args()
+
+	if args.source == 'replay':
+		paths = sorted(glob.glob(os.path.join(args.replay_dir, '*.png')))
+		src = ReplaySource(paths)
+	else:
+		src = SyntheticSource(args.width, args.height)
+
+	if args.out:
+		benchmark(src, args.out, args.frames, args.slots, args.workers, not args.drop, args.interval)
+	else:
+		with tempfile.TemporaryDirectory() as tmp:
+			benchmark(src, tmp, args.frames, args.slots, args.workers, not args.drop, args.interval)
@@ -0,0 +1,307 @@
+# JSON/YAML로 적은 입력/대기/캡처 시퀀스를 단조 시계(monotonic) 타임라인 위에서 실행하는 스케줄러
+# - 08_move_and_capture.py, 09_fit_for_main.py 에 하드코딩돼 있던 W/Shift+V/N/']' 루프를 시퀀스 파일로 분리
+# - wait는 타임라인 커서만 앞으로 옮기고 실제 대기는 다음 단계 직전에 한 번에 → 캡처 인코딩은 그동안 백그라운드에서 진행
+# - 단계별 계획 시각/실제 시각/소요 시간을 trace로 기록
+# - 입력/캡처 백엔드 교체 가능 (RecordingBackend + DryRunCapture + VirtualClock 으로 리눅스에서 드라이런/프로파일링)
+#
+# 드라이런 예: python capture_sequence.py sequences/fit_for_main.json --dry-run --samples 3
+
+import os
+import json
+import time
+
+from directkeys import SCAN_CODES, PRESS, RELEASE, RecordingBackend, send_events
+
+
+def load_sequence(path):
+	"""시퀀스 파일 로드 (.json 또는 .yaml/.yml)"""
+	with open(path, 'r', encoding='utf-8') as f:
+		if path.lower().endswith(('.yaml', '.yml')):
+			import yaml
+			seq = yaml.safe_load(f)
+		else:
+			seq = json.load(f)
+	for i, step in enumerate(seq['steps']):
+		if step['action'] not in ('hold', 'tap', 'chord', 'wait', 'capture'):
+			raise ValueError(f"{path}: {i}번째 단계의 action을 알 수 없습니다: {step['action']}")
+		for key in step.get('keys', [step.get('key')] if 'key' in step else []):
+			if key not in SCAN_CODES:
+				raise ValueError(f"{path}: {i}번째 단계의 키를 알 수 없습니다: {key}")
+		if step['action'] == 'capture' and step['mode'] not in seq['modes']:
+			raise ValueError(f"{path}: {i}번째 단계의 mode가 modes에 없습니다: {step['mode']}")
+	return seq
+
+
+# ---- 시계 ----
+
+class MonotonicClock:
+	"""실제 시계 (time.monotonic 기준)"""
+
+	def now(self):
+		return time.monotonic()
+
+	def sleep_until(self, t):
+		dt = t - time.monotonic()
+		if dt > 0:
+			time.sleep(dt)
+
+
+class VirtualClock:
+	"""드라이런용 가상 시계 (sleep하지 않고 시각만 앞으로 이동)"""
+
+	def __init__(self):
+		self.t = 0.0
+
+	def now(self):
+		return self.t
+
+	def sleep_until(self, t):
+		self.t = max(self.t, t)
+
+	def advance(self, dt):
+		self.t += dt
+
+
+# ---- 입력 백엔드 ----
+
+class DirectKeysInput:
+	"""directkeys.py 배치 API로 키 입력 (여러 키를 SendInput 1회로 전송)
+
+	backend에 directkeys.RecordingBackend를 넘기면 실제 입력 없이 기록만 한다.
+	"""
+
+	def __init__(self, window=None, backend=None):
+		self.window = window
+		self.backend = backend
+
+	def press(self, keys):
+		if self.window is not None:
+			self.window.ensure_foreground()
+		send_events([(PRESS, SCAN_CODES[k]) for k in keys], self.backend)
+
+	def release(self, keys):
+		send_events([(RELEASE, SCAN_CODES[k]) for k in reversed(keys)], self.backend)
+
+	def tap(self, keys):
+		if self.window is not None:
+			self.window.ensure_foreground()
+		events = [(PRESS, SCAN_CODES[k]) for k in keys] + [(RELEASE, SCAN_CODES[k]) for k in reversed(keys)]
+		send_events(events, self.backend)
+
+
+# ---- 캡처 백엔드 ----
+
+def make_sink(sequence):
+	"""
+	시퀀스의 output 설정에 맞는 CaptureEngine sink 생성
+
+	"output": {
+		"format": "files" 또는 "shards",
+		"encoder": "png:1",                  기본 인코더 (frame_encoder.make_encoder 형식)
+		"encoders": {"visual": "jpeg:95"},   모달리티별 인코더
+		"dir": ..., "samples_per_shard": 500 샤드 저장 시
+	}
+	output이 없으면 기존과 같이 기본 압축 PNG 파일로 저장한다.
+	"""
+	output = sequence.get('output') or {}
+	fmt = output.get('format', 'files')
+	encoder = output.get('encoder', 'png:6')
+	encoders = output.get('encoders')
+	if fmt == 'files':
+		from frame_encoder import FileSink
+		return FileSink(encoder, encoders)
+	if fmt == 'shards':
+		from frame_shards import ShardWriter
+		return ShardWriter(output['dir'], output.get('samples_per_shard', 500), encoder, encoders)
+	raise ValueError(f"알 수 없는 output format: {fmt}")
+
+
+class EngineCapture:
+	"""CaptureEngine + CaptureWindow (+ SettleDetector) 로 실제 캡처
+
+	sink에는 (idx, mode, 저장 경로)를 넘긴다 (make_sink의 FileSink/ShardWriter).
+	"""
+
+	def __init__(self, engine, window, detector=None):
+		self.engine = engine
+		self.window = window
+		self.detector = detector
+
+	def capture(self, idx, mode, save_path):
+		return self.engine.capture((idx, mode, save_path), self.window.region())
+
+	def snapshot(self):
+		return self.detector.snapshot() if self.detector else None
+
+	def settle(self, before, label, timeout):
+		if self.detector is None:
+			time.sleep(timeout)
+			return timeout
+		return self.detector.wait(before, label, timeout)
+
+
+class DryRunCapture:
+	"""캡처 경로만 기록하고, 화면 전환은 settle_time 만큼 가상 시계를 진행"""
+
+	def __init__(self, clock, settle_time=0.3, capture_time=0.02):
+		self.clock = clock
+		self.settle_time = settle_time
+		self.capture_time = capture_time
+		self.captured = []
+
+	def capture(self, idx, mode, save_path):
+		self.captured.append(save_path)
+		self.clock.advance(self.capture_time)
+		return True
+
+	def snapshot(self):
+		return None
+
+	def settle(self, before, label, timeout):
+		dt = min(self.settle_time, timeout)
+		self.clock.advance(dt)
+		return dt
+
+
+# ---- 스케줄러 ----
+
+class SequenceScheduler:
+	"""
+	시퀀스 실행기
+
+	타임라인 커서(cursor)는 '다음 단계가 시작돼야 할 시각'이다.
+	wait는 커서만 옮기고, 다음 단계가 시작될 때 커서까지 sleep한다.
+	hold/chord는 누른 시각 기준으로 정확히 duration 뒤에 뗀다.
+
+	Args:
+		sequence: load_sequence()로 읽은 dict
+		input_backend: press(keys)/release(keys)/tap(keys)
+		capture_backend: capture(idx, mode, path)/snapshot()/settle(before, label, timeout)
+		clock: MonotonicClock 또는 VirtualClock
+	"""
+
+	def __init__(self, sequence, input_backend, capture_backend, clock=None):
+		self.sequence = sequence
+		self.input = input_backend
+		self.capture = capture_backend
+		self.clock = clock or MonotonicClock()
+		self.trace = []
+		self._cursor = None
+
+	def _save_path(self, idx, mode):
+		cfg = self.sequence['modes'][mode]
+		name = self.sequence.get('filename', '{idx:06d}_{tag}.png').format(idx=idx, tag=cfg['tag'], mode=mode)
+		return os.path.join(cfg['dir'], name)
+
+	def _run_step(self, idx, step):
+		action = step['action']
+		keys = step.get('keys') or ([step['key']] if 'key' in step else [])
+		if action == 'wait':
+			self._cursor += step['duration']
+			return ''
+
+		self.clock.sleep_until(self._cursor)
+		if action in ('hold', 'chord'):
+			t_press = self.clock.now()
+			self.input.press(keys)
+			self.clock.sleep_until(t_press + step['duration'])
+			self.input.release(keys)
+			detail = '+'.join(keys)
+		elif action == 'tap':
+			before = self.capture.snapshot() if 'settle' in step else None
+			self.input.tap(keys)
+			detail = '+'.join(keys)
+			if 'settle' in step:
+				timeout = step.get('settle_timeout', self.sequence.get('settle_timeout', 2.0))
+				settle = self.capture.settle(before, step['settle'], timeout)
+				detail += f" settle={settle:.3f}s"
+		else:  # capture
+			detail = self._save_path(idx, step['mode'])
+			self.capture.capture(idx, step['mode'], detail)
+		self._cursor = self.clock.now()
+		return detail
+
+	def run_sample(self, idx):
+		"""시퀀스 1회(샘플 1개) 실행"""
+		self._cursor = self.clock.now()
+		for i, step in enumerate(self.sequence['steps']):
+			planned = self._cursor
+			if step['action'] == 'wait':
+				start = planned
+			else:
+				start = max(self.clock.now(), planned)
+			detail = self._run_step(idx, step)
+			end = self._cursor if step['action'] == 'wait' else self.clock.now()
+			self.trace.append({'idx': idx, 'step': i, 'action': step['action'], 'detail': detail,
+							   'planned': planned, 'start': start, 'end': end})
+		# 마지막 wait까지 지킨 뒤 다음 샘플로
+		self.clock.sleep_until(self._cursor)
+
+	def run(self, start_idx=1, samples=None):
+		"""samples개(None이면 무한) 샘플을 연속 실행"""
+		idx = start_idx
+		while samples is None or idx < start_idx + samples:
+			t0 = self.clock.now()
+			self.run_sample(idx)
+			print(f"[{idx:06d}] 시퀀스 '{self.sequence.get('name', '')}' 완료: {self.clock.now() - t0:.2f}s")
+			idx += 1
+		return idx
+
+	def save_trace(self, path):
+		"""trace를 CSV로 저장"""
+		with open(path, 'w', encoding='utf-8') as f:
+			f.write('idx,step,action,detail,planned,start,end,late_ms,duration_ms\n')
+			for r in self.trace:
+				late = (r['start'] - r['planned']) * 1000
+				dur = (r['end'] - r['start']) * 1000
+				f.write(f"{r['idx']},{r['step']},{r['action']},\"{r['detail']}\",{r['planned']:.4f},"
+						f"{r['start']:.4f},{r['end']:.4f},{late:.2f},{dur:.2f}\n")
+
+	def profile(self):
+		"""단계별 평균 소요 시간/지연(계획 대비 늦게 시작한 시간) 요약 문자열"""
+		rows = {}
+		for r in self.trace:
+			s = rows.setdefault(r['step'], {'action': r['action'], 'n': 0, 'dur': 0.0, 'late': 0.0})
+			s['n'] += 1
+			s['dur'] += r['end'] - r['start']
+			s['late'] += r['start'] - r['planned']
+		lines = []
+		for i, s in sorted(rows.items()):
+			step = self.sequence['steps'][i]
+			what = step.get('mode') or '+'.join(step.get('keys') or [step.get('key', '')])
+			lines.append(f"{i:2d} {s['action']:<8s}{what:<12s} 평균 {s['dur'] / s['n'] * 1000:8.1f}ms, "
+						 f"지연 {s['late'] / s['n'] * 1000:6.1f}ms")
+		return '\n'.join(lines)
+
+
+def sequence_path(name):
+	"""sequences/ 폴더의 시퀀스 파일 경로"""
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sequences', name)
+
+
+if __name__ == '__main__':
+	import argparse
+
+	parser = argparse.ArgumentParser(description='캡처 시퀀스 드라이런/프로파일링')
+	parser.add_argument('sequence', help='시퀀스 파일 (.json/.yaml)')
+	parser.add_argument('--dry-run', action='store_true', help='가상 시계 + 기록용 백엔드로 실행 (게임 불필요)')
+	parser.add_argument('--samples', type=int, default=3)
+	parser.add_argument('--settle-time', type=float, default=0.3, help='드라이런에서 가정할 화면 전환 시간(초)')
+	parser.add_argument('--trace', default='', help='trace CSV 저장 경로')
+	args = parser.parse_args()
+
+	if not args.dry_run:
+		parser.error('실제 캡처는 08_move_and_capture.py / 09_fit_for_main.py 로 실행하세요.')
+
+	seq = load_sequence(args.sequence)
+	clock = VirtualClock()
+	recorder = RecordingBackend(clock=clock.now)
+	scheduler = SequenceScheduler(seq, DirectKeysInput(backend=recorder),
+								  DryRunCapture(clock, args.settle_time), clock)
+	scheduler.run(samples=args.samples)
+	print(scheduler.profile())
+	print(f"SendInput 호출: 샘플당 {len(recorder.calls) / args.samples:.1f}회")
+	print(f"샘플당 평균: {clock.now() / args.samples:.2f}s (가상 시계)")
+	if args.trace:
+		scheduler.save_trace(args.trace)
+		print(f"trace 저장: {args.trace}")
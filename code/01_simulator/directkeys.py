@@ -6,13 +6,32 @@
 import ctypes
 import time
 
-SendInput = ctypes.windll.user32.SendInput
+try:
+    SendInput = ctypes.windll.user32.SendInput
+except AttributeError:
+    SendInput = None  # Windows가 아닌 환경: RecordingBackend만 사용 가능
 
 
 W = 0x11
 A = 0x1E
 S = 0x1F
 D = 0x20
+N = 0x31
+V = 0x2F
+LSHIFT = 0x2A
+RBRACKET = 0x1B  # ']'
+
+# 시퀀스 파일 등에서 키 이름으로 찾을 때 사용
+SCAN_CODES = {'W': W, 'A': A, 'S': S, 'D': D, 'N': N, 'V': V, 'LSHIFT': LSHIFT, 'RBRACKET': RBRACKET}
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_SCANCODE = 0x0008
+
+# 배치 입력 이벤트 종류: (PRESS, 스캔코드), (RELEASE, 스캔코드), (DELAY, 초)
+PRESS = 'press'
+RELEASE = 'release'
+DELAY = 'delay'
 
 # C struct redefinitions 
 PUL = ctypes.POINTER(ctypes.c_ulong)
@@ -45,21 +64,116 @@ class Input(ctypes.Structure):
     _fields_ = [("type", ctypes.c_ulong),
                 ("ii", Input_I)]
 
+# Batched input
+
+class SendInputBackend:
+    """미리 할당한 Input 배열을 재사용해서 연속된 키 이벤트를 SendInput 1회로 전송"""
+
+    def __init__(self, capacity=16):
+        if SendInput is None:
+            raise OSError('SendInput은 Windows에서만 사용할 수 있습니다.')
+        self._extra = ctypes.c_ulong(0)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._capacity = capacity
+        self._array = (Input * capacity)()
+        for x in self._array:
+            x.type = INPUT_KEYBOARD
+            x.ii.ki.dwExtraInfo = ctypes.pointer(self._extra)
+
+    def send(self, events):
+        n = len(events)
+        if n > self._capacity:
+            self._allocate(max(n, self._capacity * 2))
+        for x, (kind, code) in zip(self._array, events):
+            ki = x.ii.ki
+            ki.wVk = 0
+            ki.wScan = code
+            ki.dwFlags = KEYEVENTF_SCANCODE | (KEYEVENTF_KEYUP if kind == RELEASE else 0)
+            ki.time = 0
+        return SendInput(n, self._array, ctypes.sizeof(Input))
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class RecordingBackend:
+    """SendInput 대신 호출 단위로 이벤트와 시각을 기록 (리눅스 테스트용)
+
+    clock이 없으면 실제로 sleep하지 않고 내부 가상 시각만 진행한다.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self._t = 0.0
+        self.calls = []  # [(시각, [(kind, code), ...])] : SendInput 1회 = 1항목
+        self.delays = []  # [(시각, 초)]
+
+    def now(self):
+        return self.clock() if self.clock else self._t
+
+    def send(self, events):
+        self.calls.append((self.now(), list(events)))
+        return len(events)
+
+    def sleep(self, seconds):
+        self.delays.append((self.now(), seconds))
+        if self.clock:
+            time.sleep(seconds)
+        else:
+            self._t += seconds
+
+    def events(self):
+        """기록된 이벤트를 (시각, kind, code) 목록으로 펼침"""
+        return [(t, kind, code) for t, batch in self.calls for kind, code in batch]
+
+
+_default_backend = None
+
+def default_backend():
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = SendInputBackend()
+    return _default_backend
+
+def send_events(events, backend=None):
+    """(PRESS/RELEASE/DELAY, 값) 시퀀스 전송. DELAY 사이의 연속 이벤트는 SendInput 1회로 묶음
+
+    Returns: SendInput 호출 횟수
+    """
+    backend = backend or default_backend()
+    batch = []
+    calls = 0
+    for kind, value in events:
+        if kind == DELAY:
+            if batch:
+                backend.send(batch)
+                calls += 1
+                batch = []
+            backend.sleep(value)
+        else:
+            batch.append((kind, value))
+    if batch:
+        backend.send(batch)
+        calls += 1
+    return calls
+
+def tap(*codes):
+    """키들을 누르고 역순으로 떼는 이벤트 (지연 없음, SendInput 1회)"""
+    return [(PRESS, c) for c in codes] + [(RELEASE, c) for c in reversed(codes)]
+
+def chord(codes, hold=0.1):
+    """키 조합을 hold초 동안 누르는 이벤트 (예: chord([LSHIFT, V]) → SendInput 2회)"""
+    return [(PRESS, c) for c in codes] + [(DELAY, hold)] + [(RELEASE, c) for c in reversed(codes)]
+
 # Actuals Functions
 
 def PressKey(hexKeyCode):
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    ii_.ki = KeyBdInput( 0, hexKeyCode, 0x0008, 0, ctypes.pointer(extra) )
-    x = Input( ctypes.c_ulong(1), ii_ )
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    send_events([(PRESS, hexKeyCode)])
 
 def ReleaseKey(hexKeyCode):
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    ii_.ki = KeyBdInput( 0, hexKeyCode, 0x0008 | 0x0002, 0, ctypes.pointer(extra) )
-    x = Input( ctypes.c_ulong(1), ii_ )
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    send_events([(RELEASE, hexKeyCode)])
 
 if __name__ == '__main__':
     PressKey(0x11)
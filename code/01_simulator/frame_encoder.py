@@ -0,0 +1,214 @@
+# 캡처 프레임 인코더 선택 (코덱/압축 수준) + 인코딩 비용 벤치마크
+# - png:<0~9>  : PNG, compress_level 지정 (기본 저장은 6, 1이면 훨씬 빠름)
+# - qoi        : QOI 고속 무손실 (pip install qoi)
+# - npy        : 무압축 uint8 .npy (np.load(mmap_mode='r')로 memmap 읽기 가능)
+# - jpeg:<품질>, webp:<품질> : 손실 압축 (visual 채널용)
+# 필요한 패키지: numpy, pillow (qoi 사용 시 qoi)
+# 설치: pip install numpy pillow qoi
+#
+# 벤치마크 예: python frame_encoder.py --dir E:/data/dataset/visual --frames 10
+#             python frame_encoder.py (샘플 폴더가 없으면 합성 1080p 프레임 사용)
+
+import os
+import io
+import glob
+import time
+import numpy as np
+from PIL import Image
+
+
+class PngEncoder:
+	"""PNG (compress_level 0~9, 숫자가 작을수록 빠르고 파일이 큼)"""
+	ext = '.png'
+
+	def __init__(self, compress_level=6):
+		self.compress_level = compress_level
+		self.name = f'png:{compress_level}'
+
+	def encode(self, frame):
+		buf = io.BytesIO()
+		Image.fromarray(frame).save(buf, format='PNG', compress_level=self.compress_level)
+		return buf.getvalue()
+
+	def decode(self, data):
+		return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+class QoiEncoder:
+	"""QOI 고속 무손실 (qoi 패키지 필요)"""
+	ext = '.qoi'
+	name = 'qoi'
+
+	def __init__(self):
+		try:
+			import qoi
+		except ImportError:
+			raise ImportError('qoi 인코더를 쓰려면 qoi 패키지가 필요합니다: pip install qoi')
+		self._qoi = qoi
+
+	def encode(self, frame):
+		return self._qoi.encode(np.ascontiguousarray(frame))
+
+	def decode(self, data):
+		return self._qoi.decode(bytes(data))
+
+
+class NpyEncoder:
+	"""무압축 uint8 배열 (.npy). 인코딩/디코딩은 거의 복사 비용뿐"""
+	ext = '.npy'
+	name = 'npy'
+
+	def encode(self, frame):
+		buf = io.BytesIO()
+		np.save(buf, np.ascontiguousarray(frame), allow_pickle=False)
+		return buf.getvalue()
+
+	def decode(self, data):
+		return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class LossyEncoder:
+	"""JPEG / WebP 손실 압축 (quality 1~100)"""
+
+	def __init__(self, fmt='jpeg', quality=95):
+		self.fmt = fmt
+		self.quality = quality
+		self.ext = '.jpg' if fmt == 'jpeg' else '.' + fmt
+		self.name = f'{fmt}:{quality}'
+
+	def encode(self, frame):
+		buf = io.BytesIO()
+		Image.fromarray(frame).save(buf, format=self.fmt.upper(), quality=self.quality)
+		return buf.getvalue()
+
+	def decode(self, data):
+		return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+def make_encoder(spec):
+	"""'png:1', 'qoi', 'npy', 'jpeg:90', 'webp:90' 형식 문자열로 인코더 생성"""
+	name, _, arg = spec.partition(':')
+	name = name.lower()
+	if name == 'png':
+		return PngEncoder(int(arg) if arg else 6)
+	if name == 'qoi':
+		return QoiEncoder()
+	if name == 'npy':
+		return NpyEncoder()
+	if name in ('jpeg', 'jpg', 'webp'):
+		return LossyEncoder('jpeg' if name == 'jpg' else name, int(arg) if arg else 95)
+	raise ValueError(f'알 수 없는 인코더: {spec}')
+
+
+_DECODERS = {}
+
+def decode_bytes(data, ext):
+	"""확장자에 맞는 인코더로 디코딩 (샤드/파일 읽기용)"""
+	ext = ext.lower()
+	dec = _DECODERS.get(ext)
+	if dec is None:
+		dec = {'.png': PngEncoder, '.npy': NpyEncoder, '.qoi': QoiEncoder,
+			   '.jpg': lambda: LossyEncoder('jpeg'), '.jpeg': lambda: LossyEncoder('jpeg'),
+			   '.webp': lambda: LossyEncoder('webp')}[ext]()
+		_DECODERS[ext] = dec
+	return dec.decode(data)
+
+
+def load_frame(path, mmap=False):
+	"""파일 1개 읽기 (.npy는 mmap=True면 memmap으로 복사 없이 반환)"""
+	ext = os.path.splitext(path)[1].lower()
+	if ext == '.npy':
+		return np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+	with open(path, 'rb') as f:
+		return decode_bytes(f.read(), ext)
+
+
+class FileSink:
+	"""
+	모달리티별 인코더로 파일 저장하는 CaptureEngine sink
+
+	target = (idx, mode, save_path). save_path의 확장자는 인코더 확장자로 바뀐다.
+
+	Args:
+		encoder: 기본 인코더 (문자열 spec 또는 인코더 객체)
+		encoders: {mode: 인코더} 모달리티별 지정 (예: {"visual": "jpeg:95"})
+	"""
+
+	def __init__(self, encoder='png:6', encoders=None):
+		as_encoder = lambda e: make_encoder(e) if isinstance(e, str) else e
+		self.encoder = as_encoder(encoder)
+		self.encoders = {m: as_encoder(e) for m, e in (encoders or {}).items()}
+		self._made_dirs = set()
+
+	def encoder_for(self, mode):
+		return self.encoders.get(mode, self.encoder)
+
+	def __call__(self, frame, target):
+		_, mode, save_path = target
+		dir_path = os.path.dirname(save_path)
+		if dir_path not in self._made_dirs:
+			os.makedirs(dir_path, exist_ok=True)
+			self._made_dirs.add(dir_path)
+		enc = self.encoder_for(mode)
+		data = enc.encode(frame)
+		with open(os.path.splitext(save_path)[0] + enc.ext, 'wb') as f:
+			f.write(data)
+
+	def close(self):
+		pass
+
+
+def benchmark(frames, specs, repeat=1):
+	"""인코더별 평균 인코딩/디코딩 시간(ms/frame)과 크기(bytes/frame) 측정"""
+	raw = frames[0].nbytes
+	print(f"프레임: {len(frames)}장, {frames[0].shape[1]}x{frames[0].shape[0]}, 원본 {raw / 1e6:.2f}MB/frame")
+	print(f"{'encoder':<10s}{'encode ms':>12s}{'decode ms':>12s}{'KB/frame':>12s}{'ratio':>8s}  lossless")
+	results = {}
+	for spec in specs:
+		try:
+			enc = make_encoder(spec)
+		except ImportError as e:
+			print(f"{spec:<10s}  건너뜀: {e}")
+			continue
+		enc_t = dec_t = 0.0
+		size = 0
+		lossless = True
+		for _ in range(repeat):
+			for frame in frames:
+				t0 = time.perf_counter()
+				data = enc.encode(frame)
+				t1 = time.perf_counter()
+				out = enc.decode(data)
+				t2 = time.perf_counter()
+				enc_t += t1 - t0
+				dec_t += t2 - t1
+				size += len(data)
+				lossless = lossless and np.array_equal(out, frame)
+		n = len(frames) * repeat
+		results[spec] = {'encode_ms': enc_t / n * 1000, 'decode_ms': dec_t / n * 1000, 'bytes': size / n}
+		print(f"{spec:<10s}{enc_t / n * 1000:12.1f}{dec_t / n * 1000:12.1f}{size / n / 1024:12.0f}"
+			  f"{raw / (size / n):8.2f}  {'yes' if lossless else 'no'}")
+	return results
+
+
+if __name__ == '__main__':
+	import argparse
+
+	parser = argparse.ArgumentParser(description='프레임 인코더 벤치마크')
+	parser.add_argument('--dir', default='', help='샘플 이미지 폴더 (없으면 합성 1080p 프레임)')
+	parser.add_argument('--frames', type=int, default=5)
+	parser.add_argument('--repeat', type=int, default=1)
+	parser.add_argument('--encoders', default='png:6,png:1,png:0,qoi,npy,jpeg:95,webp:90')
+	args = parser.parse_args()
+
+	if args.dir:
+		paths = sorted(glob.glob(os.path.join(args.dir, '*.png')))[:args.frames]
+		frames = [np.asarray(Image.open(p).convert('RGB')) for p in paths]
+	else:
+		from capture_engine import SyntheticSource
+		src = SyntheticSource(1920, 1080)
+		frames = [src.grab_into(np.empty(src.frame_shape(), np.uint8)) for _ in range(args.frames)]
+	if not frames:
+		print('벤치마크할 이미지가 없습니다.')
+	else:
+		benchmark(frames, args.encoders.split(','), args.repeat)
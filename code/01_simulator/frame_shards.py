@@ -0,0 +1,258 @@
+# 캡처 프레임을 모달리티별 개별 PNG 대신 샤드(shard) 파일로 묶어서 저장/읽기
+# - 샤드 1개 = 연속된 샘플 N개(idx // N 기준)의 모든 모달리티 프레임
+#   shard_00000.bin : 인코딩된 프레임 바이트를 이어 붙인 데이터 파일
+#   shard_00000.idx : 프레임마다 한 줄씩 추가되는 JSON 인덱스 {"idx", "mode", "offset", "length", "ext"}
+# - ShardWriter는 CaptureEngine의 sink로 바로 사용 가능 (target = (idx, mode, ...))
+# - ShardReader는 샘플 단위 랜덤 접근과 샤드 단위 순차 읽기(mmap) 지원
+# - 기존 폴더 구조(visual/nvg/thermal/grid 의 {idx:06d}_{tag}.png)와 상호 변환 (재인코딩 없이 바이트 그대로 복사)
+# - 인코더는 frame_encoder.py의 spec 문자열로 모달리티별 지정 가능 (예: visual은 jpeg:95)
+# 필요한 패키지: numpy, pillow
+# 설치: pip install numpy pillow
+#
+# 변환 예:
+#   python frame_shards.py pack sequences/fit_for_main.json E:/data/dataset_shards
+#   python frame_shards.py unpack E:/data/dataset_shards sequences/fit_for_main.json
+#   python frame_shards.py info E:/data/dataset_shards
+
+import os
+import glob
+import json
+import mmap
+import threading
+from frame_encoder import make_encoder, decode_bytes
+
+
+def shard_name(shard_id):
+	return f'shard_{shard_id:05d}'
+
+
+class ShardWriter:
+	"""
+	샤드 파일 작성기 (여러 인코더 스레드에서 동시에 호출해도 안전)
+
+	Args:
+		out_dir: 샤드 저장 폴더
+		samples_per_shard: 샤드 1개에 담을 샘플 수
+		encoder: 기본 인코더 spec (frame_encoder.make_encoder 형식)
+		encoders: {mode: spec} 모달리티별 인코더
+	"""
+
+	def __init__(self, out_dir, samples_per_shard=500, encoder='png:6', encoders=None):
+		self.out_dir = out_dir
+		self.samples_per_shard = samples_per_shard
+		self.encoder = make_encoder(encoder)
+		self.encoders = {m: make_encoder(e) for m, e in (encoders or {}).items()}
+		self._files = {}  # shard_id -> (data 파일, idx 파일)
+		self._lock = threading.Lock()
+		os.makedirs(out_dir, exist_ok=True)
+		self._write_meta()
+
+	def _write_meta(self):
+		meta_path = os.path.join(self.out_dir, 'shards.json')
+		if os.path.exists(meta_path):
+			with open(meta_path, 'r', encoding='utf-8') as f:
+				meta = json.load(f)
+			if meta['samples_per_shard'] != self.samples_per_shard:
+				raise ValueError(f"기존 샤드와 samples_per_shard가 다릅니다: {meta['samples_per_shard']}")
+			return
+		with open(meta_path, 'w', encoding='utf-8') as f:
+			json.dump({'samples_per_shard': self.samples_per_shard}, f)
+
+	def _open(self, shard_id):
+		files = self._files.get(shard_id)
+		if files is None:
+			# 샘플은 idx 순서로 들어오므로 새 샤드를 열 때 이전 샤드는 닫음 (긴 캡처에서 파일 핸들이 쌓이지 않도록)
+			# 인코더 스레드가 늦게 넘긴 이전 샤드 프레임은 append 모드로 다시 열고 다음 샤드에서 닫힘
+			for old_id in [i for i in self._files if i < shard_id]:
+				for f in self._files.pop(old_id):
+					f.close()
+			base = os.path.join(self.out_dir, shard_name(shard_id))
+			files = (open(base + '.bin', 'ab'), open(base + '.idx', 'a', encoding='utf-8'))
+			self._files[shard_id] = files
+		return files
+
+	def write_bytes(self, idx, mode, data, ext):
+		"""이미 인코딩된 바이트를 샤드에 추가 (ext: 인코딩 형식 확장자)"""
+		with self._lock:
+			data_file, index_file = self._open(idx // self.samples_per_shard)
+			offset = data_file.seek(0, os.SEEK_END)
+			data_file.write(data)
+			# 데이터를 먼저 쓰고 인덱스를 기록 → 중간에 끊겨도 인덱스가 가리키는 데이터는 항상 완전함
+			data_file.flush()
+			index_file.write(json.dumps({'idx': idx, 'mode': mode, 'offset': offset,
+										 'length': len(data), 'ext': ext}) + '\n')
+			index_file.flush()
+
+	def write(self, frame, target):
+		"""프레임 인코딩 후 저장 (target = (idx, mode, ...)). 인코딩은 락 밖에서 수행"""
+		idx, mode = target[0], target[1]
+		enc = self.encoders.get(mode, self.encoder)
+		self.write_bytes(idx, mode, enc.encode(frame), enc.ext)
+
+	__call__ = write  # CaptureEngine sink로 사용
+
+	def close(self):
+		with self._lock:
+			for data_file, index_file in self._files.values():
+				data_file.close()
+				index_file.close()
+			self._files = {}
+
+
+class ShardReader:
+	"""샤드 읽기: read(idx, mode)로 랜덤 접근, iter_samples()로 샤드 순서대로 순차 읽기"""
+
+	def __init__(self, shard_dir):
+		self.shard_dir = shard_dir
+		self.index = {}  # idx -> {mode: (shard_id, offset, length, ext)}
+		self._maps = {}
+		self._lock = threading.Lock()
+		for idx_path in sorted(glob.glob(os.path.join(shard_dir, 'shard_*.idx'))):
+			shard_id = int(os.path.basename(idx_path)[len('shard_'):-len('.idx')])
+			with open(idx_path, 'r', encoding='utf-8') as f:
+				for line in f:
+					if not line.endswith('\n'):
+						break  # 마지막 줄이 잘린 경우 (기록 중 중단)
+					e = json.loads(line)
+					self.index.setdefault(e['idx'], {})[e['mode']] = (shard_id, e['offset'], e['length'], e['ext'])
+
+	def __len__(self):
+		return len(self.index)
+
+	def ids(self):
+		return sorted(self.index)
+
+	def modes(self, idx):
+		return sorted(self.index[idx])
+
+	def _map(self, shard_id):
+		with self._lock:
+			m = self._maps.get(shard_id)
+			if m is None:
+				with open(os.path.join(self.shard_dir, shard_name(shard_id) + '.bin'), 'rb') as f:
+					m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+				self._maps[shard_id] = m
+			return m
+
+	def read_bytes(self, idx, mode):
+		shard_id, offset, length, _ = self.index[idx][mode]
+		return self._map(shard_id)[offset:offset + length]
+
+	def read(self, idx, mode):
+		"""샘플 1개 모달리티 1개를 디코딩해서 반환 (RGB)"""
+		ext = self.index[idx][mode][3]
+		return decode_bytes(self.read_bytes(idx, mode), ext)
+
+	def read_sample(self, idx, modes=None):
+		return {m: self.read(idx, m) for m in (modes or self.modes(idx))}
+
+	def iter_bytes(self, modes=None):
+		"""(idx, mode, bytes, ext)를 샤드별 오프셋 순서대로 순차 반환 (디코딩 없음)"""
+		entries = [(loc[0], loc[1], idx, mode, loc[2], loc[3])
+				   for idx, per_mode in self.index.items()
+				   for mode, loc in per_mode.items()
+				   if modes is None or mode in modes]
+		entries.sort()
+		for shard_id, offset, idx, mode, length, ext in entries:
+			yield idx, mode, self._map(shard_id)[offset:offset + length], ext
+
+	def iter_samples(self, modes=None):
+		"""(idx, {mode: frame})를 idx 순서대로 반환 (샤드 단위로 순차 읽기)"""
+		for idx in self.ids():
+			per_mode = self.index[idx]
+			yield idx, {m: self.read(idx, m) for m in sorted(per_mode) if modes is None or m in modes}
+
+	def close(self):
+		with self._lock:
+			for m in self._maps.values():
+				m.close()
+			self._maps = {}
+
+
+def _parse_name(filename):
+	"""'000012_v.png' → (12, 'v', '.png'), 형식이 다르면 None"""
+	stem, ext = os.path.splitext(filename)
+	num, _, tag = stem.partition('_')
+	if not num.isdigit() or not tag:
+		return None
+	return int(num), tag, ext
+
+
+def pack_folders(modes, out_dir, samples_per_shard=500):
+	"""
+	폴더 구조 → 샤드 변환 (파일 바이트를 그대로 복사)
+
+	Args:
+		modes: {mode: {"dir": 폴더, "tag": 파일명 접미사}} (시퀀스 파일의 modes와 동일)
+	"""
+	writer = ShardWriter(out_dir, samples_per_shard)
+	files = []
+	for mode, cfg in modes.items():
+		if not os.path.isdir(cfg['dir']):
+			print(f"Warning: {mode} 폴더가 존재하지 않습니다: {cfg['dir']}")
+			continue
+		for entry in os.scandir(cfg['dir']):
+			parsed = _parse_name(entry.name)
+			if parsed and parsed[1] == cfg['tag']:
+				files.append((parsed[0], mode, parsed[2], entry.path))
+	files.sort()
+	for idx, mode, ext, path in files:
+		with open(path, 'rb') as f:
+			writer.write_bytes(idx, mode, f.read(), ext)
+	writer.close()
+	print(f"{len(files)}개 파일 → {out_dir} ({samples_per_shard}샘플/샤드)")
+	return len(files)
+
+
+def unpack_shards(shard_dir, modes, filename='{idx:06d}_{tag}{ext}'):
+	"""샤드 → 폴더 구조 변환 (바이트 그대로 기록)"""
+	reader = ShardReader(shard_dir)
+	count = 0
+	made = set()
+	for idx, mode, data, ext in reader.iter_bytes(set(modes)):
+		cfg = modes[mode]
+		if cfg['dir'] not in made:
+			os.makedirs(cfg['dir'], exist_ok=True)
+			made.add(cfg['dir'])
+		with open(os.path.join(cfg['dir'], filename.format(idx=idx, tag=cfg['tag'], ext=ext)), 'wb') as f:
+			f.write(data)
+		count += 1
+	reader.close()
+	print(f"{shard_dir} → {count}개 파일")
+	return count
+
+
+if __name__ == '__main__':
+	import argparse
+
+	parser = argparse.ArgumentParser(description='캡처 프레임 샤드 변환 도구')
+	sub = parser.add_subparsers(dest='cmd', required=True)
+	p = sub.add_parser('pack', help='폴더 구조 → 샤드')
+	p.add_argument('sequence', help='modes(dir/tag)가 정의된 시퀀스 파일')
+	p.add_argument('out_dir')
+	p.add_argument('--samples-per-shard', type=int, default=500)
+	p = sub.add_parser('unpack', help='샤드 → 폴더 구조')
+	p.add_argument('shard_dir')
+	p.add_argument('sequence', help='modes(dir/tag)가 정의된 시퀀스 파일')
+	p = sub.add_parser('info', help='샤드 요약')
+	p.add_argument('shard_dir')
+	args = parser.parse_args()
+
+	if args.cmd == 'info':
+		reader = ShardReader(args.shard_dir)
+		ids = reader.ids()
+		counts = {}
+		for idx in ids:
+			for m in reader.modes(idx):
+				counts[m] = counts.get(m, 0) + 1
+		print(f"샘플: {len(ids)}개" + (f" ({ids[0]} ~ {ids[-1]})" if ids else ''))
+		for m, c in sorted(counts.items()):
+			print(f"  {m}: {c}장")
+		reader.close()
+	else:
+		with open(args.sequence, 'r', encoding='utf-8') as f:
+			modes = json.load(f)['modes']
+		if args.cmd == 'pack':
+			pack_folders(modes, args.out_dir, args.samples_per_shard)
+		else:
+			unpack_shards(args.shard_dir, modes)
@@ -0,0 +1,135 @@
+# NVG/열상 전환 후 고정 time.sleep(2) 대신 화면이 실제로 바뀌고 안정될 때까지만 기다리는 감지기
+# - 다운샘플한 회색조 프레임(signature)끼리의 평균 절대 차이로 전환/안정 여부 판단
+# - 전환이 감지되지 않으면 timeout 후 그대로 진행 (기존 고정 대기와 같은 최악 시간)
+# - 측정한 전환 시간(settle time)을 기록하고 CSV로 남길 수 있음
+# 필요한 패키지: numpy
+# 설치: pip install numpy
+
+import os
+import time
+import numpy as np
+
+
+def frame_signature(frame, step=8):
+	"""프레임을 step 간격으로 다운샘플한 회색조 signature (float32)"""
+	small = frame[::step, ::step]
+	if small.ndim == 3:
+		return small.mean(axis=2, dtype=np.float32)
+	return small.astype(np.float32)
+
+
+def signature_diff(a, b):
+	"""두 signature의 평균 절대 차이 (0~255 밝기 단위)"""
+	if a.shape != b.shape:
+		return float('inf')
+	return float(np.mean(np.abs(a - b)))
+
+
+class SettleDetector:
+	"""
+	화면 전환 감지기
+
+	Args:
+		grab: 현재 화면 프레임(H, W, 3)을 반환하는 함수 (예: lambda: engine.peek(window.region()))
+		step: 다운샘플 간격 (8이면 1080p → 135x240)
+		change_threshold: 전환 전 화면과 이만큼 달라지면 '전환됨'으로 판단
+		stable_threshold: 연속 프레임 차이가 이 값 이하면 '안정'으로 판단
+		stable_frames: 안정 판정에 필요한 연속 프레임 수
+		timeout: 최대 대기 시간(초). 넘으면 감지 실패로 기록하고 진행
+		poll_interval: 화면 확인 간격(초)
+		log_path: 측정 결과를 덧붙일 CSV 파일 경로 (None이면 기록하지 않음)
+	"""
+
+	def __init__(self, grab, step=8, change_threshold=6.0, stable_threshold=1.0,
+				 stable_frames=3, timeout=2.0, poll_interval=0.02, log_path=None, verbose=True):
+		self.grab = grab
+		self.step = step
+		self.change_threshold = change_threshold
+		self.stable_threshold = stable_threshold
+		self.stable_frames = stable_frames
+		self.timeout = timeout
+		self.poll_interval = poll_interval
+		self.log_path = log_path
+		self.verbose = verbose
+		self.records = []  # (label, settle 시간, timeout 여부)
+
+	def snapshot(self):
+		"""현재 화면 signature (키 입력 직전에 호출해서 기준으로 사용)"""
+		return frame_signature(self.grab(), self.step)
+
+	def wait(self, before=None, label='', timeout=None):
+		"""
+		화면이 before와 달라진 뒤 안정될 때까지 대기하고 걸린 시간(초)을 반환
+
+		before가 None이면 전환 감지 단계 없이 화면이 안정되기만 기다린다.
+		"""
+		timeout = self.timeout if timeout is None else timeout
+		start = time.monotonic()
+		changed = before is None
+		prev = None
+		stable = 0
+		while True:
+			sig = self.snapshot()
+			elapsed = time.monotonic() - start
+			if not changed:
+				if signature_diff(sig, before) >= self.change_threshold:
+					changed = True
+			elif prev is not None and signature_diff(sig, prev) <= self.stable_threshold:
+				stable += 1
+				if stable >= self.stable_frames:
+					return self._record(label, elapsed, False)
+			else:
+				stable = 0
+			prev = sig
+			if elapsed >= timeout:
+				return self._record(label, elapsed, True)
+			time.sleep(self.poll_interval)
+
+	def _record(self, label, elapsed, timed_out):
+		self.records.append((label, elapsed, timed_out))
+		if self.verbose:
+			status = 'timeout' if timed_out else 'settled'
+			print(f"  [settle] {label}: {elapsed:.3f}s ({status})")
+		if self.log_path:
+			new_file = not os.path.exists(self.log_path)
+			with open(self.log_path, 'a', encoding='utf-8') as f:
+				if new_file:
+					f.write('timestamp,label,settle_s,timed_out\n')
+				f.write(f"{time.time():.3f},{label},{elapsed:.4f},{int(timed_out)}\n")
+		return elapsed
+
+	def summary(self):
+		"""라벨별 평균/최대 settle 시간과 timeout 횟수"""
+		stats = {}
+		for label, elapsed, timed_out in self.records:
+			s = stats.setdefault(label, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+			s['count'] += 1
+			s['total'] += elapsed
+			s['max'] = max(s['max'], elapsed)
+			s['timeouts'] += int(timed_out)
+		lines = []
+		for label, s in stats.items():
+			lines.append(f"{label}: {s['count']}회, 평균 {s['total'] / s['count']:.3f}s, "
+						 f"최대 {s['max']:.3f}s, timeout {s['timeouts']}회")
+		return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+	# 합성 화면으로 동작 확인: 0.3초 뒤 모드 전환, 0.2초 동안 페이드 후 안정
+	h, w = 1080, 1920
+	day = np.full((h, w, 3), 120, dtype=np.uint8)
+	night = np.full((h, w, 3), 30, dtype=np.uint8)
+	t_switch = time.monotonic() + 0.3
+
+	def fake_grab():
+		t = time.monotonic() - t_switch
+		if t < 0:
+			return day
+		alpha = min(t / 0.2, 1.0)
+		return (day * (1 - alpha) + night * alpha).astype(np.uint8)
+
+	detector = SettleDetector(fake_grab, timeout=2.0)
+	before = detector.snapshot()
+	detector.wait(before, 'visual->nvg')
+	detector.wait(detector.snapshot(), 'no_change', timeout=0.3)
+	print(detector.summary())
@@ -0,0 +1,219 @@
+# 캡처 대상 창(클라이언트 영역) 좌표를 캐싱하는 윈도우 핸들 래퍼
+# - 프레임마다 isMinimized / activate / GetClientRect / ClientToScreen 을 반복하지 않음
+# - 이동/크기 변경 이벤트(invalidate) 또는 주기적인 가벼운 검사(GetWindowRect 1회)로만 재계산
+# - 호출별 지연시간 카운터 제공
+# - FakeWindowBackend로 리눅스에서도 동작 확인 가능
+# 필요한 패키지: pygetwindow, pywin32 (Win32WindowBackend 사용 시)
+# 설치: pip install pygetwindow pywin32
+
+import time
+
+
+class Win32WindowBackend:
+	"""pygetwindow 창 객체 + win32gui 기반 백엔드"""
+
+	def __init__(self, win):
+		import win32gui
+		self._win32gui = win32gui
+		self.win = win
+		self.hwnd = win._hWnd
+
+	def is_minimized(self):
+		return bool(self._win32gui.IsIconic(self.hwnd))
+
+	def restore(self):
+		self.win.restore()
+
+	def activate(self):
+		self.win.activate()
+
+	def is_foreground(self):
+		return self._win32gui.GetForegroundWindow() == self.hwnd
+
+	def window_rect(self):
+		# 창 전체 좌표 (이동/크기 변경 감지용, 가벼운 호출 1회)
+		return tuple(self._win32gui.GetWindowRect(self.hwnd))
+
+	def client_rect(self):
+		# 클라이언트 영역의 화면 좌표 (left, top, right, bottom)
+		rect = self._win32gui.GetClientRect(self.hwnd)
+		left, top = self._win32gui.ClientToScreen(self.hwnd, (rect[0], rect[1]))
+		right, bottom = self._win32gui.ClientToScreen(self.hwnd, (rect[2], rect[3]))
+		return (left, top, right, bottom)
+
+
+class FakeWindowBackend:
+	"""테스트용 가짜 창 (호출 횟수를 calls에 기록)"""
+
+	def __init__(self, left=0, top=0, width=1920, height=1080, border=8, title_bar=31):
+		self.left, self.top = left, top
+		self.width, self.height = width, height
+		self.border, self.title_bar = border, title_bar
+		self.minimized = False
+		self.foreground = True
+		self.calls = {}
+
+	def _count(self, name):
+		self.calls[name] = self.calls.get(name, 0) + 1
+
+	# 테스트에서 창 상태를 바꾸는 함수들
+	def move(self, left, top):
+		self.left, self.top = left, top
+
+	def resize(self, width, height):
+		self.width, self.height = width, height
+
+	def minimize(self):
+		self.minimized = True
+		self.foreground = False
+
+	# 백엔드 인터페이스
+	def is_minimized(self):
+		self._count('is_minimized')
+		return self.minimized
+
+	def restore(self):
+		self._count('restore')
+		self.minimized = False
+
+	def activate(self):
+		self._count('activate')
+		self.foreground = True
+
+	def is_foreground(self):
+		self._count('is_foreground')
+		return self.foreground
+
+	def window_rect(self):
+		self._count('window_rect')
+		return (self.left, self.top,
+				self.left + self.width + 2 * self.border,
+				self.top + self.height + self.title_bar + self.border)
+
+	def client_rect(self):
+		self._count('client_rect')
+		left = self.left + self.border
+		top = self.top + self.title_bar
+		return (left, top, left + self.width, top + self.height)
+
+
+class CaptureWindow:
+	"""
+	캡처 영역을 한 번만 계산해 두고 재사용하는 창 핸들
+
+	Args:
+		backend: Win32WindowBackend 또는 FakeWindowBackend
+		check_interval: 주기적 유효성 검사 간격(초). 이 시간 안에는 win32 호출 없이 캐시 반환
+		restore_wait: 최소화된 창 복원 후 대기 시간(초)
+	"""
+
+	def __init__(self, backend, check_interval=0.5, restore_wait=0.1):
+		self.backend = backend
+		self.check_interval = check_interval
+		self.restore_wait = restore_wait
+		self._region = None
+		self._window_rect = None
+		self._last_check = 0.0
+		self.counters = {}
+
+	@classmethod
+	def find(cls, title='Arma 3', **kwargs):
+		"""제목으로 창을 찾아 CaptureWindow 생성 (없으면 None)"""
+		import pygetwindow as gw
+		windows = gw.getWindowsWithTitle(title)
+		if not windows:
+			return None
+		return cls(Win32WindowBackend(windows[0]), **kwargs)
+
+	def _timed(self, name, fn, *args):
+		t0 = time.perf_counter()
+		result = fn(*args)
+		dt = time.perf_counter() - t0
+		c = self.counters.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+		c['count'] += 1
+		c['total_ms'] += dt * 1000
+		c['max_ms'] = max(c['max_ms'], dt * 1000)
+		return result
+
+	def invalidate(self):
+		"""창 이동/크기 변경 이벤트를 받았을 때 호출 → 다음 region()에서 재계산"""
+		self._region = None
+		self._last_check = 0.0
+
+	def _validate(self):
+		# 주기적 검사: 최소화 여부, 포커스, 창 좌표(이동/크기 변경) 확인
+		if self.backend.is_minimized():
+			print("최소화된 창 복원 중...")
+			self.backend.restore()
+			time.sleep(self.restore_wait)
+			self._region = None
+		if not self.backend.is_foreground():
+			self.backend.activate()
+		window_rect = self.backend.window_rect()
+		if window_rect != self._window_rect:
+			self._window_rect = window_rect
+			self._region = None
+
+	def _recompute(self):
+		left, top, right, bottom = self.backend.client_rect()
+		self._region = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+	def ensure_foreground(self):
+		"""키 입력 전 호출: 검사 주기가 지났을 때만 최소화/포커스 확인"""
+		now = time.monotonic()
+		if self._region is None or now - self._last_check >= self.check_interval:
+			self._timed('validate', self._validate)
+			self._last_check = now
+
+	def region(self):
+		"""캡처 영역 {"left", "top", "width", "height"} 반환 (대부분 캐시 그대로 반환)"""
+		t0 = time.perf_counter()
+		self.ensure_foreground()
+		if self._region is None:
+			self._timed('recompute', self._recompute)
+		region = self._region
+		dt = (time.perf_counter() - t0) * 1000
+		c = self.counters.setdefault('region', {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+		c['count'] += 1
+		c['total_ms'] += dt
+		c['max_ms'] = max(c['max_ms'], dt)
+		return region
+
+	def summary(self):
+		"""지연시간 카운터 요약 문자열"""
+		parts = []
+		for name, c in self.counters.items():
+			avg = c['total_ms'] / c['count'] if c['count'] else 0.0
+			parts.append(f"{name}: {c['count']}회, 평균 {avg:.3f}ms, 최대 {c['max_ms']:.3f}ms")
+		return ' | '.join(parts)
+
+
+if __name__ == '__main__':
+	# 가짜 창으로 캐싱 동작 확인 (리눅스에서도 실행 가능)
+	fake = FakeWindowBackend(left=100, top=50)
+	window = CaptureWindow(fake, check_interval=0.05)
+
+	first = window.region()
+	for _ in range(1000):
+		assert window.region() == first
+	print('1000회 호출 후 백엔드 호출 수:', fake.calls)
+	assert fake.calls['client_rect'] == 1
+
+	time.sleep(0.06)
+	fake.move(300, 200)
+	moved = window.region()
+	assert moved['left'] == 300 + fake.border and moved['top'] == 200 + fake.title_bar
+	print('이동 후 영역:', moved)
+
+	fake.resize(1280, 720)
+	window.invalidate()
+	resized = window.region()
+	assert (resized['width'], resized['height']) == (1280, 720)
+	print('크기 변경 후 영역:', resized)
+
+	fake.minimize()
+	time.sleep(0.06)
+	window.region()
+	assert not fake.minimized and fake.foreground
+	print('최소화 복원 확인, client_rect 호출 수:', fake.calls['client_rect'])
+	print(window.summary())
@@ -0,0 +1,89 @@
+"""
+person 라벨링 방식별 CPU 지연 시간 비교
+- before: 80개 클래스 전체 추론/NMS → r.boxes.cls == 0 마스크로 필터링 → 박스마다 xyxy[0].tolist()로 변환
+- after : classes=[0]으로 추론 (NMS 단계에서 person만 남김) → xywhn으로 모든 박스를 한 번에 변환
+- 두 방식의 라벨 문자열이 같은지도 확인
+
+사용 예:
+    python bench_class_filter.py --dir data/20251029_Takistan_1400_Taleban_2/visual --images 20
+"""
+
+from ultralytics import YOLO
+import argparse
+import glob
+import os
+import time
+import cv2
+from yolo9e_detect_only_person import MODEL_PATH, PERSON_CLASSES, CONF, IOU, MAX_DET, yolo_label_lines
+
+
+def labels_before(model, img):
+    """기존 방식: 전체 클래스 추론 후 person만 골라서 박스별로 변환"""
+    r = model(img, device='cpu', conf=CONF, iou=IOU, max_det=MAX_DET, verbose=False)[0]
+    person_indices = (r.boxes.cls == 0).cpu().numpy()
+    person_boxes = r.boxes[person_indices]
+    lines = []
+    for box in person_boxes:
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        img_w = r.orig_shape[1]
+        img_h = r.orig_shape[0]
+        x_center = ((x1 + x2) / 2) / img_w
+        y_center = ((y1 + y2) / 2) / img_h
+        w = (x2 - x1) / img_w
+        h = (y2 - y1) / img_h
+        lines.append(f"0 {x_center:.6f} {y_center:.6f} {w:.6f} {h:.6f}\n")
+    return lines
+
+
+def labels_after(model, img):
+    """새 방식: person만 추론하고 한 번에 변환"""
+    r = model(img, device='cpu', classes=PERSON_CLASSES, conf=CONF, iou=IOU, max_det=MAX_DET, verbose=False)[0]
+    return yolo_label_lines(r)
+
+
+def run(fn, model, imgs):
+    """이미지별 지연 시간(ms)과 라벨 목록"""
+    times, labels = [], []
+    for img in imgs:
+        t0 = time.perf_counter()
+        labels.append(fn(model, img))
+        times.append((time.perf_counter() - t0) * 1000)
+    return times, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='person 클래스 필터링 방식 CPU 지연 시간 비교')
+    parser.add_argument('--dir', required=True, help='테스트 이미지 폴더')
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--warmup', type=int, default=2)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.*')))
+    paths = [p for p in paths if p.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))][:args.images]
+    imgs = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not imgs:
+        print(f'이미지가 없습니다: {args.dir}')
+        return
+
+    model = YOLO(args.model)
+    model.to('cpu')
+    for img in imgs[:args.warmup]:
+        labels_before(model, img)
+        labels_after(model, img)
+
+    t_before, l_before = run(labels_before, model, imgs)
+    t_after, l_after = run(labels_after, model, imgs)
+
+    mismatch = sum(a != b for a, b in zip(l_before, l_after))
+    n = len(imgs)
+    print(f'이미지 {n}장, CPU, {imgs[0].shape[1]}x{imgs[0].shape[0]}')
+    print(f"{'':<8s}{'평균 ms':>10s}{'최소 ms':>10s}{'최대 ms':>10s}")
+    for name, t in (('before', t_before), ('after', t_after)):
+        print(f'{name:<8s}{sum(t) / n:10.1f}{min(t):10.1f}{max(t):10.1f}')
+    print(f'속도 향상: {sum(t_before) / sum(t_after):.2f}x')
+    print(f'라벨 불일치: {mismatch}/{n}장')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+자동 라벨링 진행 기록(manifest) 관리
+- 샘플마다 한 줄씩 추가만 하는 JSONL 파일 (sample_id, decision, boxes, model_hash, timestamp)
+- 재실행 시 이미 처리한 샘플은 dict 조회(O(1))로 건너뜀
+- 중간에 끊겨 마지막 줄이 잘려도 그 줄만 무시하고 이어서 실행
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """파일 내용 sha256 (앞 16자리, 가중치 / 특징점 캐시 키의 이미지에 사용)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+class LabelManifest:
+    """
+    append-only 라벨링 manifest
+
+    Args:
+        path: manifest 파일 경로 (예: output/<folder>/manifest.jsonl)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}  # sample_id -> 마지막 기록
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # 기록 중 끊긴 마지막 줄
+                    rec = json.loads(line)
+                    self.records[rec['sample_id']] = rec
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, sample_id):
+        return sample_id in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, sample_id, decision, boxes, model_hash):
+        """샘플 처리 결과 1줄 추가 (모든 파일 작업이 끝난 뒤 호출)"""
+        rec = {'sample_id': sample_id, 'decision': decision, 'boxes': int(boxes),
+               'model_hash': model_hash, 'timestamp': datetime.now().isoformat(timespec='seconds')}
+        self._file.write(json.dumps(rec, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.records[sample_id] = rec
+        return rec
+
+    def summary(self):
+        """결정(decision)별 개수"""
+        counts = {}
+        for rec in self.records.values():
+            counts[rec['decision']] = counts.get(rec['decision'], 0) + 1
+        return counts
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,138 @@
+"""
+라벨러 백엔드 정확도/속도 비교 (torch 기준 vs onnx fp32 / int8)
+- 같은 이미지, 같은 탐지 설정(PERSON_CLASSES, CONF, IOU, MAX_DET)으로 백엔드별 라벨 생성
+- 기준(torch) 박스와 IoU로 1:1 매칭 → 매칭률, 평균 IoU, 신뢰도 차이
+- 라벨 차이: 박스 수가 다른 이미지, IoU가 --strict 미만인 박스가 있는 이미지,
+  positive/negative 판정이 바뀐 이미지 (라벨러에서는 rejected 이동 여부가 달라짐)
+- 백엔드별 images/s (CPU)
+
+사용 예:
+    python labeler_parity.py --dir data/20251029_Takistan_1400_Taleban_2/visual --images 200 \\
+        --onnx model/yolov9e.onnx model/yolov9e.int8.onnx
+"""
+
+from ultralytics import YOLO
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from onnx_backend import OnnxDetector
+from yolo9e_detect_only_person import (MODEL_PATH, ONNX_PATH, BATCH_SIZE, PERSON_CLASSES, CONF, IOU, MAX_DET,
+                                       predict_persons, to_numpy)
+
+
+def iou_matrix(a, b):
+    """xyxy 박스 (N, 4) × (M, 4) → IoU (N, M)"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_boxes(ref, other, min_iou):
+    """IoU가 높은 쌍부터 1:1 매칭 → [(기준 번호, 비교 번호, IoU)]"""
+    if len(ref) == 0 or len(other) == 0:
+        return []
+    ious = iou_matrix(ref, other)
+    pairs = []
+    used_r, used_o = set(), set()
+    for flat in np.argsort(-ious, axis=None):
+        i, j = divmod(int(flat), ious.shape[1])
+        if ious[i, j] < min_iou:
+            break
+        if i in used_r or j in used_o:
+            continue
+        used_r.add(i)
+        used_o.add(j)
+        pairs.append((i, j, float(ious[i, j])))
+    return pairs
+
+
+def run_backend(model, imgs, batch_size, device):
+    """배치 추론 → (이미지별 (xyxy, conf), images/s)"""
+    outputs = []
+    t0 = time.perf_counter()
+    for i in range(0, len(imgs), batch_size):
+        for r in predict_persons(model, imgs[i:i + batch_size], device):
+            outputs.append((to_numpy(r.boxes.xyxy).reshape(-1, 4), to_numpy(r.boxes.conf).reshape(-1)))
+    return outputs, len(imgs) / (time.perf_counter() - t0)
+
+
+def compare(ref_out, out, paths, min_iou, strict):
+    """기준 대비 비교 통계"""
+    stats = {'ref_boxes': 0, 'boxes': 0, 'matched': 0, 'ious': [], 'conf_diff': [],
+             'count_diff': 0, 'loose': 0, 'flips': 0, 'worst': []}
+    for (ref_xyxy, ref_conf), (xyxy, conf), path in zip(ref_out, out, paths):
+        pairs = match_boxes(ref_xyxy, xyxy, min_iou)
+        stats['ref_boxes'] += len(ref_xyxy)
+        stats['boxes'] += len(xyxy)
+        stats['matched'] += len(pairs)
+        stats['ious'] += [p[2] for p in pairs]
+        stats['conf_diff'] += [abs(float(ref_conf[i]) - float(conf[j])) for i, j, _ in pairs]
+        stats['count_diff'] += len(ref_xyxy) != len(xyxy)
+        stats['flips'] += (len(ref_xyxy) > 0) != (len(xyxy) > 0)
+        unmatched = len(ref_xyxy) + len(xyxy) - 2 * len(pairs)
+        low = sum(p[2] < strict for p in pairs)
+        stats['loose'] += (unmatched + low) > 0
+        if unmatched + low:
+            stats['worst'].append((unmatched, low, os.path.basename(path), len(ref_xyxy), len(xyxy)))
+    stats['worst'].sort(reverse=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='라벨러 백엔드(torch / onnx) 정확도/속도 비교')
+    parser.add_argument('--dir', required=True, help='샘플 이미지 폴더')
+    parser.add_argument('--images', type=int, default=100, help='폴더 전체에서 고르게 뽑을 이미지 수')
+    parser.add_argument('--model', default=MODEL_PATH, help='기준 torch 가중치')
+    parser.add_argument('--device', default='cpu', help='기준 torch 장치 (기본 cpu: CPU 속도 비교)')
+    parser.add_argument('--onnx', nargs='+', default=[ONNX_PATH], help='비교할 onnx 모델 (여러 개 가능)')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE)
+    parser.add_argument('--match-iou', type=float, default=0.5, help='같은 박스로 볼 최소 IoU')
+    parser.add_argument('--strict', type=float, default=0.9, help='이 IoU 미만이면 라벨 차이로 집계')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.*')))
+    paths = [p for p in paths if p.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))]
+    paths = paths[::max(1, len(paths) // args.images)][:args.images]
+    pairs = [(p, cv2.imread(p)) for p in paths]
+    paths = [p for p, img in pairs if img is not None]
+    imgs = [img for _, img in pairs if img is not None]
+    if not imgs:
+        print(f'이미지가 없습니다: {args.dir}')
+        return
+    print(f'이미지 {len(imgs)}장, 배치 {args.batch}, classes {PERSON_CLASSES}, conf {CONF}, iou {IOU}')
+
+    # 기준: ultralytics (추론 시 device로 장치가 정해짐)
+    ref_model = YOLO(args.model)
+    predict_persons(ref_model, imgs[:1], args.device)  # warmup
+    ref_out, ref_speed = run_backend(ref_model, imgs, args.batch, args.device)
+    print(f"\n{'backend':<28s}{'images/s':>10s}{'boxes':>8s}{'매칭률':>8s}{'평균 IoU':>10s}"
+          f"{'conf 차':>9s}{'개수 차':>8s}{'라벨 차':>8s}{'판정 변경':>10s}")
+    print(f"{'torch ' + args.device:<28s}{ref_speed:10.2f}{sum(len(x) for x, _ in ref_out):8d}")
+
+    for onnx_path in args.onnx:
+        model = OnnxDetector(onnx_path)
+        predict_persons(model, imgs[:1], 'cpu')  # warmup
+        out, speed = run_backend(model, imgs, args.batch, 'cpu')
+        s = compare(ref_out, out, paths, args.match_iou, args.strict)
+        recall = s['matched'] / max(s['ref_boxes'], 1)
+        mean_iou = np.mean(s['ious']) if s['ious'] else float('nan')
+        conf_diff = np.mean(s['conf_diff']) if s['conf_diff'] else float('nan')
+        print(f"{os.path.basename(onnx_path):<28s}{speed:10.2f}{s['boxes']:8d}{recall:8.1%}{mean_iou:10.4f}"
+              f"{conf_diff:9.4f}{s['count_diff']:8d}{s['loose']:8d}{s['flips']:10d}")
+        for unmatched, low, name, n_ref, n in s['worst'][:5]:
+            print(f"    {name}: torch {n_ref}개 / onnx {n}개, 매칭 안 됨 {unmatched}, IoU<{args.strict} {low}")
+
+    print(f'\n라벨 차: 매칭 안 된 박스나 IoU<{args.strict} 박스가 있는 이미지 수, '
+          f'판정 변경: person 유무(positive/negative)가 바뀐 이미지 수')
+
+
+if __name__ == '__main__':
+    main()
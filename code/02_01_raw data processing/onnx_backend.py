@@ -0,0 +1,254 @@
+"""
+자동 라벨링 CPU 백엔드 (ONNX + onnxruntime)
+- GPU가 학습에 쓰이는 동안 CPU 장비에서 라벨링할 때 사용 (yolo9e_detect_only_person.py의 BACKEND = 'onnx')
+- export: ultralytics로 .pt → .onnx (배치/크기 동적), int8이면 onnxruntime 동적 양자화 모델도 생성
+    CPU에서는 fp16이 연산마다 형 변환이 들어가 오히려 느리므로 낮은 정밀도는 int8(가중치)로 지원
+- OnnxDetector는 ultralytics 모델과 같은 방식으로 호출 (model(imgs, classes=..., conf=..., iou=..., max_det=...))
+    전처리(letterbox)와 후처리(NMS, 원본 좌표 복원)는 ultralytics와 같은 계산을 numpy로 배치 단위 수행
+
+사용 예:
+    python onnx_backend.py export --model model/yolov9e.pt --precision int8
+    python onnx_backend.py check --onnx model/yolov9e.int8.onnx
+"""
+
+import os
+import time
+import argparse
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+IMGSZ = 640
+PAD_VALUE = 114
+MAX_WH = 7680          # 클래스별 NMS용 좌표 이동량 (ultralytics와 동일)
+THREADS = 0            # onnxruntime intra-op 스레드 수 (0이면 코어 수만큼)
+
+
+def export_onnx(model_path, imgsz=IMGSZ, precision='fp32'):
+    """
+    .pt → .onnx (같은 폴더, 예: model/yolov9e.onnx / model/yolov9e.int8.onnx)
+
+    Returns: 생성된 onnx 경로 (precision='int8'이면 양자화 모델 경로)
+    """
+    from ultralytics import YOLO
+    onnx_path = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    if precision == 'fp32':
+        return onnx_path
+    return quantize_int8(onnx_path)
+
+
+def quantize_int8(onnx_path):
+    """onnxruntime 동적 양자화 (가중치 int8, 활성값은 실행 중 양자화 → 보정 데이터 불필요)"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    out_path = os.path.splitext(onnx_path)[0] + '.int8.onnx'
+    quantize_dynamic(onnx_path, out_path, weight_type=QuantType.QUInt8)
+    return out_path
+
+
+def letterbox(img, imgsz=IMGSZ):
+    """비율 유지 리사이즈 + 114 패딩 (ultralytics LetterBox(auto=False)와 같은 반올림)"""
+    h, w = img.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    dw, dh = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+
+
+def preprocess(imgs, imgsz=IMGSZ):
+    """BGR 이미지 목록 → (B, 3, imgsz, imgsz) float32 RGB 0~1"""
+    batch = np.stack([letterbox(img, imgsz) for img in imgs])
+    return np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+
+def nms(boxes, scores, iou):
+    """greedy NMS (xyxy) → 남길 인덱스 (신뢰도 내림차순)"""
+    order = np.argsort(-scores, kind='stable')
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        order = rest[inter / (areas[i] + areas[rest] - inter + 1e-9) <= iou]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(pred, orig_shape, imgsz=IMGSZ, classes=None, conf=0.25, iou=0.7, max_det=300):
+    """
+    모델 출력 1장 (4 + 클래스 수, 앵커 수) → OnnxResult
+
+    ultralytics classes= 와 동일하게 전체 클래스에서 최고 점수 클래스를 고른 뒤 필터 (NMS 전)
+    → 다른 클래스 점수가 더 높은 박스는 classes에 있는 클래스로 남지 않음
+    """
+    pred = pred.T                                   # (앵커, 4 + nc)
+    scores = pred[:, 4:]
+    cls = scores.argmax(axis=1)
+    score = scores[np.arange(len(scores)), cls]
+    mask = score > conf
+    if classes is not None:
+        mask &= np.isin(cls, classes)
+    xywh, score, cls = pred[mask, :4], score[mask], cls[mask]
+
+    xyxy = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], axis=1)
+    keep = nms(xyxy + (cls * MAX_WH)[:, None], score, iou)[:max_det]
+    xyxy, score, cls = xyxy[keep], score[keep], cls[keep]
+
+    # letterbox 좌표 → 원본 좌표
+    h0, w0 = orig_shape
+    gain = min(imgsz / h0, imgsz / w0)
+    pad_x = round((imgsz - w0 * gain) / 2 - 0.1)
+    pad_y = round((imgsz - h0 * gain) / 2 - 0.1)
+    xyxy = (xyxy - [pad_x, pad_y, pad_x, pad_y]) / gain
+    xyxy = np.clip(xyxy, 0, [w0, h0, w0, h0])
+    return OnnxResult(xyxy.astype(np.float32), score.astype(np.float32), cls.astype(np.float32), orig_shape)
+
+
+class OnnxBoxes:
+    """ultralytics Boxes 중 라벨러가 쓰는 속성만 (numpy)"""
+
+    def __init__(self, xyxy, conf, cls, orig_shape):
+        h, w = orig_shape
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        xywh = np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        self.xywhn = xywh / np.array([w, h, w, h], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class OnnxResult:
+    def __init__(self, xyxy, conf, cls, orig_shape):
+        self.orig_shape = orig_shape
+        self.boxes = OnnxBoxes(xyxy, conf, cls, orig_shape)
+
+
+class OnnxDetector:
+    """
+    onnxruntime CPU 탐지기 (ultralytics 모델처럼 호출)
+
+    Args:
+        onnx_path: export_onnx()로 만든 파일
+        imgsz: export 시 크기
+        threads: intra-op 스레드 수 (0이면 코어 수만큼)
+    """
+
+    def __init__(self, onnx_path, imgsz=IMGSZ, threads=THREADS):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        # 배치 크기가 고정된 모델이면 1장씩 실행
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        self.imgsz = imgsz
+        self.path = onnx_path
+
+    def __call__(self, imgs, classes=None, conf=0.25, iou=0.7, max_det=300, **_):
+        """BGR 이미지 (또는 목록) → OnnxResult 목록 (device/verbose 등 ultralytics 인자는 무시)"""
+        if isinstance(imgs, np.ndarray):
+            imgs = [imgs]
+        x = preprocess(imgs, self.imgsz)
+        if self.fixed_batch == 1 and len(imgs) > 1:
+            preds = np.concatenate([self.session.run(None, {self.input_name: x[i:i + 1]})[0] for i in range(len(x))])
+        else:
+            preds = self.session.run(None, {self.input_name: x})[0]
+        return [postprocess(p, img.shape[:2], self.imgsz, classes, conf, iou, max_det) for p, img in zip(preds, imgs)]
+
+
+def check_postprocess(n_images=20, seed=0):
+    """
+    전처리/후처리 좌표 확인 (모델 없이)
+    - 원본 박스를 letterbox 좌표로 옮겨 모델 출력처럼 만든 뒤 postprocess → 원본 박스가 복원되는지
+    - 겹치는 중복 박스는 NMS로 제거되고 클래스 필터가 적용되는지
+
+    Returns: 최대 좌표 오차 (px), 복원 실패 이미지 수
+    """
+    rng = np.random.default_rng(seed)
+    max_err, failures = 0.0, 0
+    for _ in range(n_images):
+        h0, w0 = int(rng.integers(200, 1500)), int(rng.integers(200, 1500))
+        k = int(rng.integers(1, 6))
+        xy = rng.uniform(0, 0.7, (k, 2)) * [w0, h0]
+        wh = rng.uniform(0.05, 0.3, (k, 2)) * [w0, h0]
+        # 서로 겹치지 않도록 격자에 배치
+        xy = (np.arange(k)[:, None] * [w0 / k, 0]) + [0, 1] * xy
+        wh[:, 0] = np.minimum(wh[:, 0], w0 / k * 0.8)
+        truth = np.concatenate([xy, xy + wh], axis=1)
+
+        gain = min(IMGSZ / h0, IMGSZ / w0)
+        pad = np.array([round((IMGSZ - w0 * gain) / 2 - 0.1), round((IMGSZ - h0 * gain) / 2 - 0.1)] * 2)
+        lb = truth * gain + pad
+        cxcywh = np.concatenate([(lb[:, :2] + lb[:, 2:]) / 2, lb[:, 2:] - lb[:, :2]], axis=1)
+
+        nc, anchors = 80, 100
+        pred = np.zeros((anchors, 4 + nc), np.float32)
+        pred[:, :4] = [1, 1, 2, 2]
+        pred[:k, :4] = cxcywh
+        pred[:k, 4] = 0.9                                   # person
+        pred[k:2 * k, :4] = cxcywh + [0.2, 0.2, 0, 0]       # 중복 (NMS로 제거)
+        pred[k:2 * k, 4] = 0.6
+        pred[2 * k, :4] = [300, 300, 50, 50]
+        pred[2 * k, 5] = 0.95                               # 다른 클래스 (classes=[0]으로 제거)
+        pred[2 * k + 1, :4] = [400, 100, 50, 50]
+        pred[2 * k + 1, 4] = 0.3                            # person 점수가 있어도
+        pred[2 * k + 1, 6] = 0.9                            # 다른 클래스가 더 높으면 제거
+
+        r = postprocess(pred.T, (h0, w0), IMGSZ, classes=[0])
+        if len(r.boxes) != k:
+            failures += 1
+            continue
+        got = r.boxes.xyxy[np.argsort(r.boxes.xyxy[:, 0])]
+        max_err = max(max_err, float(np.abs(got - truth[np.argsort(truth[:, 0])]).max()))
+    return max_err, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='자동 라벨링 ONNX CPU 백엔드')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('export', help='.pt → .onnx (int8이면 양자화 모델도)')
+    p.add_argument('--model', default='model/yolov9e.pt')
+    p.add_argument('--imgsz', type=int, default=IMGSZ)
+    p.add_argument('--precision', choices=['fp32', 'int8'], default='fp32')
+    p.add_argument('--quantize-only', help='이미 있는 onnx를 int8로만 변환')
+
+    p = sub.add_parser('check', help='전/후처리 좌표 확인 (+ onnx 지정 시 실행 속도)')
+    p.add_argument('--onnx')
+    p.add_argument('--batch', type=int, default=1)
+    p.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        t0 = time.perf_counter()
+        path = quantize_int8(args.quantize_only) if args.quantize_only else \
+            export_onnx(args.model, args.imgsz, args.precision)
+        print(f'✅ {path} ({os.path.getsize(path) / 1024 ** 2:.1f} MB, {time.perf_counter() - t0:.1f}s)')
+        return
+
+    err, failures = check_postprocess()
+    print(f"후처리 좌표 복원: 최대 오차 {err:.2e}px, 실패 {failures}장 {'✅' if failures == 0 and err < 1e-2 else '❌'}")
+    if args.onnx:
+        detector = OnnxDetector(args.onnx)
+        imgs = [np.full((720, 1280, 3), 114, np.uint8)] * args.batch
+        detector(imgs)  # warmup
+        t0 = time.perf_counter()
+        for _ in range(args.runs):
+            detector(imgs)
+        elapsed = time.perf_counter() - t0
+        print(f'{args.onnx}: 배치 {args.batch}, {args.runs * args.batch / elapsed:.2f} images/s (CPU)')
+
+
+if __name__ == '__main__':
+    main()
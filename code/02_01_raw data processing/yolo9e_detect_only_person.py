@@ -1,6 +1,17 @@
 from ultralytics import YOLO
-import glob
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import cv2
 import os
+import sys
+import shutil
+import time
+import torch
+from label_manifest import LabelManifest, file_hash
+
+# 세션 인덱스 (02_02_raw data processing/session_index.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '02_02_raw data processing'))
+from session_index import load_index
 
 folder_name = '20251029_Takistan_1400_Taleban_2'  # 예: folder_name = 'sample1' (visual, thermal, ir의 상위 폴더)
 base_dir = os.path.join('data', folder_name)
@@ -8,98 +19,212 @@ visual_dir = os.path.join(base_dir, 'visual')
 thermal_dir = os.path.join(base_dir, 'thermal')
 nvg_dir = os.path.join(base_dir, 'nvg')
 output_dir = os.path.join('output', folder_name)
+rejected_dir = os.path.join(base_dir, 'rejected')  # person이 없는 원본은 삭제하지 않고 여기로 이동
+manifest_path = os.path.join(output_dir, 'manifest.jsonl')  # 처리 기록 (재실행 시 이어서 진행)
+MODEL_PATH = 'model/yolov9e.pt'
+
+# 추론 백엔드: 'torch'(ultralytics, GPU가 있으면 GPU) 또는 'onnx'(onnxruntime CPU, GPU가 학습 중일 때)
+# onnx 모델은 python onnx_backend.py export --precision int8 로 생성 (정확도는 labeler_parity.py로 확인)
+BACKEND = 'torch'
+ONNX_PATH = 'model/yolov9e.onnx'   # int8: 'model/yolov9e.int8.onnx'
+
+# 배치 추론 설정
+BATCH_SIZE = 8          # 한 번에 모델에 넣을 이미지 수 (1이면 기존처럼 한 장씩)
+PREFETCH_WORKERS = 4    # 이미지 디코딩 스레드 수 (모델이 도는 동안 다음 배치를 미리 읽음)
+DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'  # GPU가 없으면 CPU로 실행
+
+# 탐지 설정 (person만 모델 내부 NMS 단계에서 남김 → 80개 클래스 결과를 받아서 버리지 않음)
+PERSON_CLASSES = [0]    # COCO class 0 = person
+CONF = 0.25             # 신뢰도 임계값 (ultralytics 기본값)
+IOU = 0.7               # NMS IoU 임계값 (ultralytics 기본값)
+MAX_DET = 300           # 이미지당 최대 박스 수
+
+
+def iter_batches(image_paths, batch_size, workers):
+    """디코딩 스레드 풀로 이미지를 미리 읽어 (경로, BGR 이미지) 배치를 순서대로 반환"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        paths = iter(image_paths)
+        # 최대 2배치 분량만 미리 읽기 (메모리 제한)
+        for p in paths:
+            pending.append((p, executor.submit(cv2.imread, p)))
+            if len(pending) >= batch_size * 2:
+                break
+        batch = []
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(cv2.imread, next_path)))
+            img = future.result()
+            if img is None:
+                print(f'⚠️ 이미지를 읽을 수 없습니다: {path}')
+                continue
+            batch.append((path, img))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def predict_persons(model, imgs, device=DEVICE):
+    """person 클래스만 추론 (클래스 필터링은 NMS 안에서 수행)"""
+    return model(imgs, device=device, classes=PERSON_CLASSES, conf=CONF, iou=IOU,
+                 max_det=MAX_DET, verbose=False)
+
+
+def to_numpy(x):
+    """torch 텐서(ultralytics) 또는 numpy 배열(onnx 백엔드) → numpy"""
+    return x.cpu().numpy() if hasattr(x, 'cpu') else x
+
+
+def yolo_label_lines(r):
+    """결과의 모든 박스를 한 번에 YOLO 형식(class xc yc w h, 정규화) 문자열 목록으로 변환"""
+    xywhn = to_numpy(r.boxes.xywhn)  # (N, 4), 원본 이미지 크기 기준 정규화
+    return [f"0 {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n" for xc, yc, w, h in xywhn]
+
+
+def sample_id_of(img_path):
+    """visual 파일명에서 샘플 id 추출 (000001_v.png -> 000001)"""
+    base_name = os.path.splitext(os.path.basename(img_path))[0]
+    if base_name.endswith('_v'):
+        base_name = base_name[:-2]
+    return base_name
+
+
+def move_to_rejected(path, modality):
+    """원본을 rejected/<modality>/ 로 이동 (삭제하지 않음)"""
+    dst_dir = os.path.join(rejected_dir, modality)
+    os.makedirs(dst_dir, exist_ok=True)
+    dst = os.path.join(dst_dir, os.path.basename(path))
+    shutil.move(path, dst)
+    print(f'No person detected. Moved: {path} -> {dst}')
+
+
+def handle_result(img_path, r, index):
+    """탐지 결과 1장 처리: person이 있으면 복사 + 라벨 저장, 없으면 rejected로 이동
+
+    Returns: (decision, person 수)
+    """
+    # 모델에서 classes=[0]으로 추론했으므로 박스는 모두 person
+    person_boxes = r.boxes
+
+    # base_name 추출 (visual: 000001_v.png -> base: 000001)
+    base_name = sample_id_of(img_path)
+    ext = os.path.splitext(img_path)[1]  # .png
+
+    # thermal, nvg 경로 (세션 인덱스 조회, 없으면 None)
+    thermal_path = index.path(base_name, 'thermal')
+    nvg_path = index.path(base_name, 'nvg')
+
+    # output 폴더 구조: output/folder_name/visual, thermal, nvg
+    out_visual_dir = os.path.join(output_dir, 'visual')
+    out_thermal_dir = os.path.join(output_dir, 'thermal')
+    out_nvg_dir = os.path.join(output_dir, 'nvg')
+
+    os.makedirs(out_visual_dir, exist_ok=True)
+    os.makedirs(out_thermal_dir, exist_ok=True)
+
+    out_visual_path = os.path.join(out_visual_dir, os.path.basename(img_path))
+    out_thermal_path = os.path.join(out_thermal_dir, os.path.basename(thermal_path) if thermal_path else f'{base_name}_th{ext}')
+    out_nvg_path = os.path.join(out_nvg_dir, os.path.basename(nvg_path) if nvg_path else f'{base_name}_nv{ext}')
+
+    if len(person_boxes) > 0:
+        # visual, thermal, nvg 각각의 폴더로 복사
+        shutil.copy(img_path, out_visual_path)
+
+        if thermal_path:
+            shutil.copy(thermal_path, out_thermal_path)
+
+        if nvg_path:
+            os.makedirs(out_nvg_dir, exist_ok=True)
+            shutil.copy(nvg_path, out_nvg_path)
+
+        # YOLO 라벨 저장 (output_dir 바로 아래 labels 폴더에)
+        label_dir = os.path.join(output_dir, 'labels')
+        os.makedirs(label_dir, exist_ok=True)
+        label_path = os.path.join(label_dir, os.path.splitext(os.path.basename(img_path))[0] + '.txt')
+        with open(label_path, 'w') as f:
+            f.writelines(yolo_label_lines(r))
+        # 탐지된 객체 정보 출력 (person만)
+        print(person_boxes.xyxy, person_boxes.conf, person_boxes.cls)
+        return 'positive', len(person_boxes)
+    else:
+        # person이 하나도 없으면 output은 삭제하고 원본은 rejected 폴더로 이동
+        # output 삭제 (복사본)
+        if os.path.exists(out_visual_path):
+            os.remove(out_visual_path)
+        if os.path.exists(out_thermal_path):
+            os.remove(out_thermal_path)
+        if os.path.exists(out_nvg_path):
+            os.remove(out_nvg_path)
+
+        # 원본 이동: thermal/nvg 먼저, visual은 마지막
+        # (중간에 끊기면 visual이 남아 있으므로 재실행 시 다시 처리됨)
+        if thermal_path:
+            move_to_rejected(thermal_path, 'thermal')
+
+        # nvg가 있는 경우에만 이동 (야간 데이터)
+        if nvg_path:
+            move_to_rejected(nvg_path, 'nvg')
+
+        move_to_rejected(img_path, 'visual')
+        return 'negative', 0
+
+
+def load_model():
+    """BACKEND 설정에 따라 모델 로드 → (모델, 가중치 해시, 장치 설명)"""
+    if BACKEND == 'onnx':
+        from onnx_backend import OnnxDetector
+        return OnnxDetector(ONNX_PATH), file_hash(ONNX_PATH), f'cpu (onnxruntime, {os.path.basename(ONNX_PATH)})'
+    # 1. 사전학습된 YOLOv9e 모델 로드
+    model = YOLO(MODEL_PATH)  # yolov9e.pt 파일이 없으면 자동 다운로드
+    model.to(DEVICE)
+    return model, file_hash(MODEL_PATH), DEVICE
+
+
+def main():
+    # manifest의 model_hash로 어떤 백엔드/가중치로 라벨링했는지 구분됨
+    model, model_hash, device = load_model()
+    print(f'Device: {device}, batch size: {BATCH_SIZE}, prefetch workers: {PREFETCH_WORKERS}, '
+          f'classes: {PERSON_CLASSES}, conf: {CONF}, iou: {IOU}, max_det: {MAX_DET}')
+
+    # 2. visual 폴더 내 모든 이미지 탐지 (세션 인덱스로 조회, 폴더 glob/파일별 존재 확인 없음)
+    index = load_index(base_dir)
+    image_paths = [index.path(i, 'visual') for i in index.ids(['visual'])]
+
+    # 이전 실행에서 이미 처리한 샘플은 건너뜀 (manifest 조회 O(1))
+    manifest = LabelManifest(manifest_path)
+    total = len(image_paths)
+    image_paths = [p for p in image_paths if sample_id_of(p) not in manifest]
+    print(f'manifest: 기존 기록 {len(manifest)}개, 이번에 처리할 이미지 {len(image_paths)}/{total}장')
+
+    # 같은 해상도 이미지끼리 배치로 추론 (letterbox가 한 장씩 넣을 때와 동일 → 결과 동일)
+    processed = 0
+    infer_time = 0.0
+    start = time.perf_counter()
+    for batch in iter_batches(image_paths, BATCH_SIZE, PREFETCH_WORKERS):
+        paths = [p for p, _ in batch]
+        imgs = [img for _, img in batch]
+        for p in paths:
+            print(f'Processing: {p}')
+        t0 = time.perf_counter()
+        results = predict_persons(model, imgs)
+        infer_time += time.perf_counter() - t0
+        for img_path, r in zip(paths, results):
+            decision, boxes = handle_result(img_path, r, index)
+            # 파일 작업이 모두 끝난 뒤 기록 → 기록된 샘플은 항상 완료 상태
+            manifest.record(sample_id_of(img_path), decision, boxes, model_hash)
+        processed += len(batch)
+    manifest.close()
+
+    elapsed = time.perf_counter() - start
+    if processed:
+        print(f'\n총 {processed}장 처리: {elapsed:.1f}s, {processed / elapsed:.2f} images/s '
+              f'(추론만: {processed / infer_time:.2f} images/s)')
+    print(f'manifest 누적: {manifest.summary()}')
+
 
-# 1. 사전학습된 YOLOv9e 모델 로드
-model = YOLO('model/yolov9e.pt')  # yolov9e.pt 파일이 없으면 자동 다운로드
-model.to('cuda')  # 명시적으로 GPU 사용
-
-# 2. visual 폴더 내 모든 이미지 탐지
-image_paths = glob.glob(os.path.join(visual_dir, '*.*'))
-image_paths = [p for p in image_paths if p.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))]
-
-for img_path in image_paths:
-    print(f'Processing: {img_path}')
-    results = model(img_path)
-    for r in (results if isinstance(results, list) else [results]):
-        # person(class 0)만 남기고 나머지 박스는 무시
-        person_indices = (r.boxes.cls == 0).cpu().numpy()
-        
-        # person만 필터링된 boxes 추출
-        person_boxes = r.boxes[person_indices]
-        
-        import shutil
-        
-        # base_name 추출 (visual: 000001_v.png -> base: 000001)
-        base_name = os.path.splitext(os.path.basename(img_path))[0]
-        if base_name.endswith('_v'):
-            base_name = base_name[:-2]
-        ext = os.path.splitext(img_path)[1]  # .png
-        
-        # thermal, nvg 경로
-        thermal_path = os.path.join(thermal_dir, f'{base_name}_th{ext}')
-        nvg_path = os.path.join(nvg_dir, f'{base_name}_nv{ext}')
-        
-        # output 폴더 구조: output/folder_name/visual, thermal, nvg
-        out_visual_dir = os.path.join(output_dir, 'visual')
-        out_thermal_dir = os.path.join(output_dir, 'thermal')
-        out_nvg_dir = os.path.join(output_dir, 'nvg')
-        
-        os.makedirs(out_visual_dir, exist_ok=True)
-        os.makedirs(out_thermal_dir, exist_ok=True)
-        
-        out_visual_path = os.path.join(out_visual_dir, os.path.basename(img_path))
-        out_thermal_path = os.path.join(out_thermal_dir, f'{base_name}_th{ext}')
-        out_nvg_path = os.path.join(out_nvg_dir, f'{base_name}_nv{ext}')
-        
-        if len(person_boxes) > 0:
-            # visual, thermal, nvg 각각의 폴더로 복사
-            shutil.copy(img_path, out_visual_path)
-            
-            if os.path.exists(thermal_path):
-                shutil.copy(thermal_path, out_thermal_path)
-                
-            if os.path.exists(nvg_dir) and os.path.exists(nvg_path):
-                os.makedirs(out_nvg_dir, exist_ok=True)
-                shutil.copy(nvg_path, out_nvg_path)
-            
-            # YOLO 라벨 저장 (output_dir 바로 아래 labels 폴더에)
-            label_dir = os.path.join(output_dir, 'labels')
-            os.makedirs(label_dir, exist_ok=True)
-            label_path = os.path.join(label_dir, os.path.splitext(os.path.basename(img_path))[0] + '.txt')
-            with open(label_path, 'w') as f:
-                for box in person_boxes:
-                    # xyxy to YOLO xywh (normalized)
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    img_w = r.orig_shape[1]
-                    img_h = r.orig_shape[0]
-                    x_center = ((x1 + x2) / 2) / img_w
-                    y_center = ((y1 + y2) / 2) / img_h
-                    w = (x2 - x1) / img_w
-                    h = (y2 - y1) / img_h
-                    f.write(f"0 {x_center:.6f} {y_center:.6f} {w:.6f} {h:.6f}\n")
-            # 탐지된 객체 정보 출력 (person만)
-            for box in person_boxes:
-                print(box.xyxy, box.conf, box.cls)
-        else:
-            # person이 하나도 없으면 output과 원본 모두 삭제
-            # output 삭제
-            if os.path.exists(out_visual_path):
-                os.remove(out_visual_path)
-            if os.path.exists(out_thermal_path):
-                os.remove(out_thermal_path)
-            if os.path.exists(out_nvg_path):
-                os.remove(out_nvg_path)
-            
-            # 원본 삭제
-            if os.path.exists(img_path):
-                os.remove(img_path)
-                print(f'No person detected. Deleted: {img_path}')
-                
-            if os.path.exists(thermal_path):
-                os.remove(thermal_path)
-                print(f'No person detected. Deleted: {thermal_path}')
-            
-            # nvg 폴더가 존재하는 경우에만 삭제 시도 (야간 데이터)
-            if os.path.exists(nvg_dir) and os.path.exists(nvg_path):
-                os.remove(nvg_path)     
-                print(f'No person detected. Deleted: {nvg_path}')
\ No newline at end of file
+if __name__ == '__main__':
+    main()
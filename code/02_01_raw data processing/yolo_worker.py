@@ -0,0 +1,335 @@
+"""
+상주 YOLO 추론 워커 + CLI 클라이언트
+- 워커(serve)는 한 번 띄워 두면 모델을 메모리에 올려 둔 채로 작업을 받음
+    → 폴더/세션마다 스크립트를 새로 실행할 때 드는 모델 로드 + 첫 추론 warmup 비용을 1번만 냄
+- 모델 캐시: (가중치 절대 경로, 파일 해시) 키의 LRU (가중치 파일이 바뀌면 다시 로드)
+- 통신: multiprocessing.connection (127.0.0.1, authkey), 작업은 받은 순서대로 1개씩 처리 (GPU 1개 공유)
+    authkey는 환경 변수 YOLO_WORKER_KEY, 없으면 ~/.yolo_worker_key (serve가 처음 실행될 때 무작위로 만들고 본인만 읽기 0600)
+- 작업: 폴더 또는 파일 목록 → 배치 추론 → YOLO 라벨(txt) 저장, 선택적으로 결과 이미지 저장
+    (yolo9e.py / yolo11x.py처럼 폴더를 탐지해서 저장하는 작업을 대신함)
+
+사용 예:
+    python yolo_worker.py serve --capacity 2
+    python yolo_worker.py run --model model/yolov9e.pt --folder data/visual_5 data/visual_6 --output output/worker
+    python yolo_worker.py run --model model/yolo11x.pt --files list.txt --output output/worker --images
+    python yolo_worker.py status
+    python yolo_worker.py stop
+"""
+
+import os
+import time
+import pickle
+import argparse
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from label_manifest import file_hash
+
+ADDRESS = ('127.0.0.1', 6010)
+KEY_ENV = 'YOLO_WORKER_KEY'
+KEY_PATH = os.path.join(os.path.expanduser('~'), '.yolo_worker_key')
+CAPACITY = 2             # 동시에 올려 둘 모델 수 (GPU 메모리에 맞춰 조절)
+BATCH_SIZE = 8
+PREFETCH_WORKERS = 4
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+class ModelCache:
+    """
+    (가중치 경로, 해시) 키의 모델 LRU 캐시
+
+    해시는 파일 mtime/크기가 그대로면 다시 계산하지 않음 (대용량 가중치를 매번 읽지 않도록)
+    """
+
+    def __init__(self, capacity=CAPACITY, device=None):
+        self.capacity = capacity
+        self.device = device
+        self.models = OrderedDict()   # (path, hash) -> 모델
+        self.hashes = {}              # path -> (mtime, size, hash)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        cached = self.hashes.get(path)
+        if cached is None or cached[:2] != (st.st_mtime, st.st_size):
+            cached = (st.st_mtime, st.st_size, file_hash(path))
+            self.hashes[path] = cached
+        return path, cached[2]
+
+    def get(self, path):
+        """모델 반환 → (모델, 캐시 적중 여부, 로드 시간)"""
+        key = self.key(path)
+        if key in self.models:
+            self.models.move_to_end(key)
+            self.hits += 1
+            return self.models[key], True, 0.0
+
+        self.misses += 1
+        t0 = time.perf_counter()
+        from ultralytics import YOLO
+        model = YOLO(key[0])
+        # 첫 추론 warmup (CUDA 초기화, 레이어 fuse 등)
+        model(np.zeros((64, 64, 3), np.uint8), device=self.device, verbose=False)
+        self.models[key] = model
+        while len(self.models) > self.capacity:
+            old_key, old = self.models.popitem(last=False)
+            print(f'🗑️ 모델 내림 (LRU): {old_key[0]}')
+            del old
+            self._free()
+        return model, False, time.perf_counter() - t0
+
+    def _free(self):
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def status(self):
+        return {'models': [{'path': p, 'hash': h} for p, h in self.models],
+                'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses}
+
+
+def load_key(create=False):
+    """
+    워커 authkey 반환 (환경 변수 → 키 파일 순)
+
+    create=True(serve)면 키 파일이 없을 때 무작위 키로 만듦 (0600)
+    다른 사용자가 읽을 수 있는 키 파일은 거부 (키를 알면 워커에 pickle을 보낼 수 있음)
+    """
+    key = os.environ.get(KEY_ENV)
+    if key:
+        return key.encode()
+    if create and not os.path.exists(KEY_PATH):
+        fd = os.open(KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(os.urandom(32).hex())
+        print(f'🔑 워커 키 생성: {KEY_PATH}')
+    if not os.path.exists(KEY_PATH):
+        raise SystemExit(f'❌ 워커 키가 없습니다: {KEY_ENV} 환경 변수를 지정하거나 serve를 먼저 실행하세요 ({KEY_PATH})')
+    if os.name == 'posix' and os.stat(KEY_PATH).st_mode & 0o077:
+        raise SystemExit(f'❌ 워커 키 파일 권한이 너무 넓습니다: chmod 600 {KEY_PATH}')
+    with open(KEY_PATH, 'r') as f:
+        return f.read().strip().encode()
+
+
+def check_request(request):
+    """요청 형식 확인 → 문제가 있으면 오류 메시지, 없으면 None"""
+    if not isinstance(request, dict) or request.get('cmd') not in ('run', 'status', 'stop'):
+        return '알 수 없는 요청'
+    if request['cmd'] != 'run':
+        return None
+    jobs = request.get('jobs')
+    if not isinstance(jobs, list) or not jobs:
+        return 'jobs 목록이 없음'
+    for job in jobs:
+        if not isinstance(job, dict) or not isinstance(job.get('model'), str) or not isinstance(job.get('output'), str):
+            return '작업에 model / output이 없음'
+        if not isinstance(job.get('folder'), str) and not isinstance(job.get('files'), list):
+            return '작업에 folder / files가 없음'
+    return None
+
+
+def list_images(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS))
+
+
+def run_job(cache, job, progress):
+    """
+    작업 1개 처리
+
+    job: {'model', 'folder' 또는 'files', 'output', 'images', 'classes', 'conf', 'iou', 'max_det', 'batch'}
+    progress: 진행 상황 전달 함수 (dict를 받음)
+    """
+    from yolo9e_detect_only_person import iter_batches
+
+    model, cached, load_time = cache.get(job['model'])
+    paths = list_images(job['folder']) if job.get('folder') else list(job['files'])
+    # 라벨/결과 이미지는 파일 이름으로 저장하므로 이름이 겹치면 서로 덮어씀 → 추론 전에 실패 처리
+    seen = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem in seen:
+            raise ValueError(f'파일 이름이 겹침 (라벨 덮어쓰기): {seen[stem]}, {path}')
+        seen[stem] = path
+    label_dir = os.path.join(job['output'], 'labels')
+    os.makedirs(label_dir, exist_ok=True)
+    if job.get('images'):
+        os.makedirs(job['output'], exist_ok=True)
+
+    done = boxes = 0
+    infer_time = 0.0
+    start = time.perf_counter()
+    for batch in iter_batches(paths, job.get('batch', BATCH_SIZE), PREFETCH_WORKERS):
+        t0 = time.perf_counter()
+        results = model([img for _, img in batch], device=cache.device, classes=job.get('classes'),
+                        conf=job.get('conf', 0.25), iou=job.get('iou', 0.7),
+                        max_det=job.get('max_det', 300), verbose=False)
+        infer_time += time.perf_counter() - t0
+        for (path, _), r in zip(batch, results):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            cls = r.boxes.cls.cpu().numpy().astype(int)
+            xywhn = r.boxes.xywhn.cpu().numpy()
+            with open(os.path.join(label_dir, f'{stem}.txt'), 'w') as f:
+                f.writelines(f"{c} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n" for c, (xc, yc, w, h) in zip(cls, xywhn))
+            if job.get('images'):
+                r.save(filename=os.path.join(job['output'], os.path.basename(path)), line_width=1)
+            boxes += len(cls)
+        done += len(batch)
+        progress({'progress': done, 'total': len(paths)})
+
+    return {'ok': True, 'images': done, 'boxes': boxes, 'cached': cached, 'load_time': load_time,
+            'infer_time': infer_time, 'elapsed': time.perf_counter() - start}
+
+
+def model_note(result):
+    return '캐시 적중' if result['cached'] else f"로드 {result['load_time']:.1f}s"
+
+
+def serve(capacity=CAPACITY, address=ADDRESS, device=None):
+    """워커 실행 (stop 요청이 올 때까지, 연결은 1개씩 순서대로 처리)"""
+    cache = ModelCache(capacity, device)
+    with Listener(address, authkey=load_key(create=True)) as listener:
+        print(f'✅ YOLO 워커 대기 중: {address[0]}:{address[1]} (모델 캐시 {capacity}개)')
+        while True:
+            # 인증 실패 / 중간에 끊긴 연결 / 잘못된 요청은 알리고 다음 연결을 기다림
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as e:
+                print(f'⚠️ 연결 거부: {type(e).__name__}: {e}')
+                continue
+            with conn:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError, pickle.UnpicklingError) as e:
+                    print(f'⚠️ 요청 읽기 실패: {type(e).__name__}: {e}')
+                    continue
+                error = check_request(request)
+                if error:
+                    print(f'⚠️ 잘못된 요청: {error}')
+                    try:
+                        conn.send({'ok': False, 'rejected': True, 'error': error})
+                    except OSError:
+                        pass
+                    continue
+                cmd = request['cmd']
+                if cmd == 'stop':
+                    conn.send({'ok': True})
+                    print('워커 종료')
+                    return
+                if cmd == 'status':
+                    conn.send({'ok': True, **cache.status()})
+                    continue
+
+                # run: 작업 여러 개를 한 연결에서 순서대로
+                for job in request['jobs']:
+                    name = job.get('folder') or f"파일 {len(job['files'])}개"
+                    print(f'▶ {name} ({os.path.basename(job["model"])})')
+                    try:
+                        result = run_job(cache, job, conn.send)
+                        print(f"  {result['images']}장, 박스 {result['boxes']}개, {result['elapsed']:.1f}s "
+                              f"(모델 {model_note(result)})")
+                    except Exception as e:
+                        result = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+                        print(f'  ❌ {result["error"]}')
+                    try:
+                        conn.send(result)
+                    except OSError:
+                        break
+
+
+def request(message, address=ADDRESS):
+    """워커에 요청 1개 보내고 응답 반환 (run은 진행 상황을 출력하면서 작업별 결과 목록 반환)"""
+    try:
+        conn = Client(address, authkey=load_key())
+    except AuthenticationError:
+        raise SystemExit(f'❌ 워커 인증 실패: 워커와 같은 키를 쓰는지 확인하세요 ({KEY_ENV} 또는 {KEY_PATH})')
+    with conn:
+        conn.send(message)
+        if message['cmd'] != 'run':
+            return conn.recv()
+        results = []
+        while len(results) < len(message['jobs']):
+            msg = conn.recv()
+            if msg.get('rejected'):
+                raise SystemExit(f"❌ 워커가 요청을 거부함: {msg['error']}")
+            if 'progress' in msg:
+                print(f"\r  {msg['progress']}/{msg['total']}", end='', flush=True)
+            else:
+                print()
+                results.append(msg)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='상주 YOLO 추론 워커 / 클라이언트')
+    parser.add_argument('--port', type=int, default=ADDRESS[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='워커 실행')
+    p.add_argument('--capacity', type=int, default=CAPACITY, help='캐시할 모델 수')
+    p.add_argument('--device', help='예: cpu, 0 (기본: 자동)')
+
+    p = sub.add_parser('run', help='작업 보내기')
+    p.add_argument('--model', required=True, help='가중치 경로 (예: model/yolov9e.pt)')
+    p.add_argument('--folder', nargs='+', help='이미지 폴더 (폴더마다 작업 1개, 작업이 여러 개면 출력은 output/<폴더명>)')
+    p.add_argument('--files', help='이미지 경로 목록 txt (한 줄에 1개, 작업이 여러 개면 출력은 output/<목록 파일명>)')
+    p.add_argument('--output', required=True)
+    p.add_argument('--images', action='store_true', help='탐지 결과 이미지도 저장')
+    p.add_argument('--classes', type=int, nargs='+', help='예: 0 (person만)')
+    p.add_argument('--conf', type=float, default=0.25)
+    p.add_argument('--iou', type=float, default=0.7)
+    p.add_argument('--max-det', type=int, default=300)
+    p.add_argument('--batch', type=int, default=BATCH_SIZE)
+
+    sub.add_parser('status', help='캐시된 모델 / 적중률')
+    sub.add_parser('stop', help='워커 종료')
+    args = parser.parse_args()
+    address = (ADDRESS[0], args.port)
+
+    if args.command == 'serve':
+        serve(args.capacity, address, args.device)
+        return
+    if args.command in ('status', 'stop'):
+        print(request({'cmd': args.command}, address))
+        return
+
+    # 경로는 워커 작업 폴더와 상관없도록 절대 경로로 보냄
+    base = {'model': os.path.abspath(args.model), 'images': args.images, 'classes': args.classes,
+            'conf': args.conf, 'iou': args.iou, 'max_det': args.max_det, 'batch': args.batch}
+    # 작업이 여러 개면 작업마다 output/<폴더명 또는 목록 파일명>으로 나눠 저장 (같은 폴더에 쓰면 라벨이 덮어써짐)
+    sources = [('files', args.files)] if args.files else []
+    sources += [('folder', folder) for folder in args.folder or []]
+    if not sources:
+        parser.error('--folder 또는 --files 필요')
+    jobs = []
+    for kind, src in sources:
+        name = os.path.splitext(os.path.basename(src))[0] if kind == 'files' else os.path.basename(os.path.normpath(src))
+        out = os.path.abspath(args.output if len(sources) == 1 else os.path.join(args.output, name))
+        if any(job['output'] == out for job in jobs):
+            parser.error(f'출력 폴더가 겹침: {out} (폴더 이름이 같은 입력은 따로 실행하세요)')
+        if kind == 'files':
+            with open(src, 'r', encoding='utf-8') as f:
+                files = [os.path.abspath(line.strip()) for line in f if line.strip()]
+            jobs.append({**base, 'files': files, 'output': out})
+        else:
+            jobs.append({**base, 'folder': os.path.abspath(src), 'output': out})
+
+    start = time.perf_counter()
+    results = request({'cmd': 'run', 'jobs': jobs}, address)
+    for job, result in zip(jobs, results):
+        name = job.get('folder') or args.files
+        if result['ok']:
+            print(f"✅ {name}: {result['images']}장, 박스 {result['boxes']}개, "
+                  f"{result['images'] / max(result['elapsed'], 1e-9):.2f} images/s (모델 {model_note(result)})")
+        else:
+            print(f"❌ {name}: {result['error']}")
+    print(f'⏱️ 전체 {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
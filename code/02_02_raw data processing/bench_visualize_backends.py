@@ -0,0 +1,108 @@
+"""
+visualize_labels.py 렌더링 백엔드(thread / process) 비교 벤치마크
+- 합성 세션(기본 10,000 샘플, visual/thermal PNG + 라벨)을 임시 폴더에 만들고
+  백엔드 × 워커 수 × chunksize 조합별로 render_session() 처리 속도(samples/s) 측정
+- 동영상 인코딩은 단일 스레드라 백엔드 비교를 가리므로 기본은 생략 (--video로 포함)
+- draw_boxes의 박스 좌표 변환이 박스별 int() 계산과 같은지도 확인
+
+사용 예:
+    python bench_visualize_backends.py --samples 10000 --workers 4,8 --chunksize 1,8
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import cv2
+import numpy as np
+from visualize_labels import render_session, box_corners
+
+
+def make_session(root, samples, width, height, boxes_per_sample, seed=0):
+    """합성 세션 생성 → (session dict, 라벨 파일 목록)"""
+    session = {m: os.path.join(root, m) for m in ('visual', 'thermal', 'nvg', 'labels')}
+    session['viz'] = os.path.join(root, 'viz')
+    for m in ('visual', 'thermal', 'labels'):
+        os.makedirs(session[m], exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    # 이미지 몇 장을 돌려 가며 사용 (생성 시간 단축, 디코딩 비용은 동일)
+    images = [(rng.random((height, width, 3)) * 255).astype(np.uint8) for _ in range(8)]
+    encoded = [cv2.imencode('.png', img)[1].tobytes() for img in images]
+    label_files = []
+    for i in range(1, samples + 1):
+        data = encoded[i % len(encoded)]
+        with open(os.path.join(session['visual'], f'{i:06d}_v.png'), 'wb') as f:
+            f.write(data)
+        with open(os.path.join(session['thermal'], f'{i:06d}_th.png'), 'wb') as f:
+            f.write(data)
+        label_path = os.path.join(session['labels'], f'{i:06d}_v.txt')
+        with open(label_path, 'w') as f:
+            for _ in range(boxes_per_sample):
+                xc, yc = rng.uniform(0.1, 0.9, 2)
+                w, h = rng.uniform(0.02, 0.2, 2)
+                f.write(f"0 {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n")
+        label_files.append(label_path)
+    return session, label_files
+
+
+def check_box_corners(n=100000, seed=0):
+    """box_corners가 박스별 int() 계산과 같은지 확인 → 불일치 수"""
+    rng = np.random.default_rng(seed)
+    boxes = np.round(np.column_stack([np.zeros(n), rng.uniform(0, 1, (n, 4))]), 6)
+    w, h = 1920, 1080
+    got = box_corners(boxes, w, h)
+    mismatch = 0
+    for (cls, x_center, y_center, width, height), row in zip(boxes.tolist(), got.tolist()):
+        x_center_px = int(x_center * w)
+        y_center_px = int(y_center * h)
+        box_w = int(width * w)
+        box_h = int(height * h)
+        expected = [int(x_center_px - box_w / 2), int(y_center_px - box_h / 2),
+                    int(x_center_px + box_w / 2), int(y_center_px + box_h / 2)]
+        mismatch += expected != row
+    return mismatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='visualize_labels 렌더링 백엔드 벤치마크')
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--size', default='640x360', help='합성 이미지 크기')
+    parser.add_argument('--boxes', type=int, default=5, help='샘플당 박스 수')
+    parser.add_argument('--backends', default='thread,process')
+    parser.add_argument('--workers', default=str(os.cpu_count() or 1), help='쉼표로 여러 개 (예: 4,8)')
+    parser.add_argument('--chunksize', default='1,8', help='쉼표로 여러 개')
+    parser.add_argument('--video', action='store_true', help='동영상 인코딩까지 포함')
+    parser.add_argument('--keep', action='store_true', help='합성 세션 폴더 삭제 안 함')
+    args = parser.parse_args()
+
+    mismatch = check_box_corners()
+    print(f"박스 좌표 변환 확인: 불일치 {mismatch}개 {'✅' if mismatch == 0 else '❌'}")
+
+    width, height = map(int, args.size.lower().split('x'))
+    root = tempfile.mkdtemp(prefix='viz_bench_')
+    try:
+        t0 = time.perf_counter()
+        session, label_files = make_session(root, args.samples, width, height, args.boxes)
+        print(f"합성 세션: {args.samples}샘플 × 2 모달리티, {width}x{height}, "
+              f"샘플당 박스 {args.boxes}개 ({time.perf_counter() - t0:.1f}s) → {root}\n")
+
+        print(f"{'backend':<9s}{'workers':>8s}{'chunk':>7s}{'time s':>9s}{'samples/s':>11s}{'frames/s':>10s}")
+        for backend in args.backends.split(','):
+            for workers in map(int, args.workers.split(',')):
+                for chunksize in map(int, args.chunksize.split(',')):
+                    t0 = time.perf_counter()
+                    counts = render_session(label_files, save_png=False, workers=workers, backend=backend,
+                                            chunksize=chunksize, session=session, write_video=args.video)
+                    elapsed = time.perf_counter() - t0
+                    frames = sum(counts.values())
+                    print(f"{backend:<9s}{workers:8d}{chunksize:7d}{elapsed:9.2f}"
+                          f"{len(label_files) / elapsed:11.1f}{frames / elapsed:10.1f}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
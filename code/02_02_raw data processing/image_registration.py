@@ -1,229 +1,616 @@
+"""
+Visual ↔ Thermal / NVG 이미지 정합 (2단계)
+- calibrate: 세션 전체에서 고르게 뽑은 이미지 쌍으로 SIFT 매칭 → Homography 추정/검증 후 저장
+- apply    : 저장된 Homography로 라벨(필요하면 이미지도)을 일괄 변환 (특징점 검출 없음, 라벨은 label_registration.py)
+- check    : 몇 쌍만 다시 매칭해서 저장된 H의 재투영 오차 확인 (drift 검사)
+- auto     : check → 오차가 임계값을 넘을 때만 calibrate → apply
+- 정합 대상(--target)마다 Homography를 따로 저장 (visual → thermal, visual → nvg)
+  기본(all)은 thermal + 세션에 nvg 폴더가 있으면 nvg까지 처리
+- 이미지 쌍 매칭은 프로세스 풀로 병렬 처리, 특징점은 keypoint_cache.py로 디스크에 캐시
+  (ratio test / RANSAC 임계값만 바꿔서 다시 실행하면 특징점 검출 생략)
+
+시뮬레이터 카메라가 고정되어 있으면 세션 내에서 변환은 일정하므로
+매 쌍마다 SIFT를 돌리지 않고 calibrate 1회 + apply로 처리한다.
+
+사용 예:
+    python image_registration.py calibrate --samples 5
+    python image_registration.py calibrate --samples 0 --workers 8 --ratio 0.75   (전체 쌍)
+    python image_registration.py apply --images
+    python image_registration.py auto
+    python image_registration.py calibrate --target nvg
+"""
+
 import cv2
 import numpy as np
 import os
-import glob
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from label_registration import register_labels
+from keypoint_cache import KeypointCache
+from session_index import load_index
 
 # 테스트할 폴더 (여기 경로 수정)
 folder_name = '20251029_Takistan_1400_Taleban_2'
 data_dir = os.path.join('data', folder_name)
 visual_dir = os.path.join(data_dir, 'visual')
 thermal_dir = os.path.join(data_dir, 'thermal')
+nvg_dir = os.path.join(data_dir, 'nvg')
 label_dir = os.path.join('output', folder_name, 'labels')
 
-# 출력 폴더
+# 출력 폴더 (정합 테스트 시각화 + Homography 저장)
 output_dir = 'test_registration'
-os.makedirs(output_dir, exist_ok=True)
-
-print("=" * 60)
-print("Visual ↔ Thermal 이미지 정합 테스트")
-print("=" * 60)
-
-# Visual과 Thermal 이미지 쌍 가져오기 (처음 5장으로 테스트)
-visual_files = sorted(glob.glob(os.path.join(visual_dir, '*_v.png')))[:5]
-
-if len(visual_files) == 0:
-    print("❌ Visual 이미지를 찾을 수 없습니다!")
-    exit()
-
-print(f"\n📁 총 {len(visual_files)}개 이미지 쌍으로 정합 테스트\n")
-
-# 변환 행렬을 저장할 리스트
-homography_matrices = []
-
-for idx, visual_path in enumerate(visual_files):
-    base_name = os.path.basename(visual_path)
-    # 000001_v.png -> 000001
-    base_num = base_name.replace('_v.png', '').replace('_v.jpg', '')
-    thermal_path = os.path.join(thermal_dir, f'{base_num}_th.png')
-    
-    if not os.path.exists(thermal_path):
-        thermal_path = os.path.join(thermal_dir, f'{base_num}_th.jpg')
-    
-    if not os.path.exists(thermal_path):
-        print(f"⚠️  Thermal 이미지 없음: {base_num}")
-        continue
-    
-    print(f"[{idx+1}/{len(visual_files)}] Processing: {base_num}")
-    
-    # 이미지 읽기
-    img_visual = cv2.imread(visual_path)
-    img_thermal = cv2.imread(thermal_path)
-    
-    if img_visual is None or img_thermal is None:
-        print(f"  ⚠️  이미지 로드 실패")
-        continue
-    
-    # Grayscale 변환
-    gray_visual = cv2.cvtColor(img_visual, cv2.COLOR_BGR2GRAY)
-    gray_thermal = cv2.cvtColor(img_thermal, cv2.COLOR_BGR2GRAY)
-    
-    # 히스토그램 평활화 (대비 향상)
-    gray_visual = cv2.equalizeHist(gray_visual)
-    gray_thermal = cv2.equalizeHist(gray_thermal)
-    
+H_PATH = os.path.join(output_dir, 'homography_matrix.npy')
+CALIB_INFO_PATH = os.path.join(output_dir, 'homography_calib.json')
+
+# 정합 대상별 라벨 접미사 / Homography 저장 경로 (visual → 대상)
+TARGETS = {
+    'thermal': {'suffix': '_th', 'H': H_PATH, 'info': CALIB_INFO_PATH},
+    'nvg': {'suffix': '_nv', 'H': os.path.join(output_dir, 'homography_matrix_nvg.npy'),
+            'info': os.path.join(output_dir, 'homography_calib_nvg.json')},
+}
+
+# apply 결과 폴더 (thermal / nvg 좌표계 라벨, 정합된 visual 이미지)
+registered_dir = os.path.join('output', folder_name, 'registered')
+
+CALIB_SAMPLES = 5          # calibrate에 사용할 이미지 쌍 수 (세션 전체에서 고르게 선택)
+SPOT_CHECK_SAMPLES = 3     # drift 검사에 사용할 이미지 쌍 수
+DRIFT_THRESHOLD = 3.0      # 재투영 오차(px) 임계값, 넘으면 다시 calibrate
+
+# 특징점 검출/매칭 설정
+DETECTOR_PARAMS = {'nfeatures': 10000, 'contrastThreshold': 0.02, 'edgeThreshold': 5}  # 캐시 키에 포함
+MATCH_OPTIONS = {
+    'scale': 0.5,            # 평활화 grayscale을 이 배율로 줄여서 검출 (H는 원본 해상도로 환산)
+    'ratio': 0.7,            # Lowe's ratio test 임계값
+    'ransac_thresh': 3.0,    # RANSAC 재투영 임계값 (원본 해상도 px)
+    'cache_dir': os.path.join(output_dir, 'kp_cache'),  # 특징점 캐시 (None이면 사용 안 함)
+}
+WORKERS = os.cpu_count() or 1  # 이미지 쌍 병렬 처리 프로세스 수
+STAGES = ('cache', 'load', 'extract', 'match', 'ransac')  # 단계별 시간 측정 항목
+
+
+def find_pairs(target='thermal'):
+    """(base_num, visual 경로, 대상 경로) 목록 (대상 이미지가 있는 쌍만, 세션 인덱스로 조회)"""
+    index = load_index(data_dir)
+    if target not in index.modalities():
+        return []
+    for base_num in sorted(set(index.ids(['visual'])) - set(index.ids([target]))):
+        print(f"⚠️  {target} 이미지 없음: {base_num}")
+    return [(base_num, index.path(base_num, 'visual'), index.path(base_num, target))
+            for base_num in index.ids(['visual', target])]
+
+
+def spread_sample(pairs, n):
+    """세션 전체에서 고르게 n개 선택 (앞쪽 n개만 쓰면 세션 후반 변화를 놓침)"""
+    if len(pairs) <= n:
+        return list(pairs)
+    idx = np.linspace(0, len(pairs) - 1, n).round().astype(int)
+    return [pairs[i] for i in idx]
+
+
+def preprocess(img):
+    """Grayscale 변환 + 히스토그램 평활화 (대비 향상)"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.equalizeHist(gray)
+
+
+def create_detector():
+    """(검출기 이름, 검출기) - SIFT가 없으면 ORB"""
     # SIFT 특징점 검출기 생성 (ORB보다 정밀함)
     try:
-        sift = cv2.SIFT_create(nfeatures=10000, contrastThreshold=0.02, edgeThreshold=5)
+        return 'sift', cv2.SIFT_create(**DETECTOR_PARAMS)
     except:
-        print("  ⚠️  SIFT 사용 불가, ORB 사용")
-        sift = cv2.ORB_create(nfeatures=10000)
-    
-    # 특징점 및 디스크립터 검출
-    kp1, des1 = sift.detectAndCompute(gray_visual, None)
-    kp2, des2 = sift.detectAndCompute(gray_thermal, None)
-    
-    print(f"  Visual 특징점: {len(kp1)}개, Thermal 특징점: {len(kp2)}개")
-    
-    if des1 is None or des2 is None or len(kp1) < 4 or len(kp2) < 4:
-        print(f"  ⚠️  특징점 부족 (최소 4개 필요)")
-        continue
-    
+        return 'orb', cv2.ORB_create(nfeatures=DETECTOR_PARAMS['nfeatures'])
+
+
+def extract_features(path, scale, cache, timing):
+    """
+    평활화 grayscale을 scale 배로 줄여서 특징점 검출 (캐시에 있으면 검출 생략)
+
+    Returns: (pts 원본 해상도 좌표 (N, 2) float32, des) 또는 이미지 로드 실패 시 None
+    """
+    detector_name, detector = create_detector()
+    key = None
+    # 캐시를 끄면 파일 해시(이미지를 한 번 더 읽음)도 건너뜀
+    if cache.cache_dir:
+        t0 = time.perf_counter()
+        key = cache.key(path, dict(DETECTOR_PARAMS, detector=detector_name, scale=scale))
+        cached = cache.load(key)
+        timing['cache'] += time.perf_counter() - t0
+        if cached is not None:
+            return cached
+
+    t0 = time.perf_counter()
+    img = cv2.imread(path)
+    timing['load'] += time.perf_counter() - t0
+    if img is None:
+        return None
+
+    t0 = time.perf_counter()
+    gray = preprocess(img)
+    if scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    kp, des = detector.detectAndCompute(gray, None)
+    # 축소 이미지 좌표 → 원본 해상도 좌표 (H를 원본 해상도 기준으로 계산)
+    pts = np.float32([p.pt for p in kp]).reshape(-1, 2) / scale
+    timing['extract'] += time.perf_counter() - t0
+    if key is not None:
+        cache.save(key, pts, des)
+    return pts, des
+
+
+def match_features(pts1, des1, pts2, des2, ratio, ransac_thresh, timing):
+    """
+    디스크립터 매칭 + RANSAC Homography 추정
+
+    Returns: (result dict 또는 None, 메시지 목록)
+    """
+    log = [f"  Visual 특징점: {len(pts1)}개, 대상 특징점: {len(pts2)}개"]
+
+    if des1 is None or des2 is None or len(pts1) < 4 or len(pts2) < 4:
+        log.append(f"  ⚠️  특징점 부족 (최소 4개 필요)")
+        return None, log
+
+    t0 = time.perf_counter()
     # FLANN 매칭 (더 정밀함)
     FLANN_INDEX_KDTREE = 1
     index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
     search_params = dict(checks=100)  # 검색 정밀도 높임
-    
+
     try:
         flann = cv2.FlannBasedMatcher(index_params, search_params)
         matches = flann.knnMatch(des1, des2, k=2)
-        
+
         # Lowe's ratio test로 좋은 매칭만 선택
         good_matches = []
         for match_pair in matches:
             if len(match_pair) == 2:
                 m, n = match_pair
-                if m.distance < 0.7 * n.distance:  # ratio threshold
+                if m.distance < ratio * n.distance:  # ratio threshold
                     good_matches.append(m)
     except:
         # SIFT 못 쓰면 BFMatcher
         bf = cv2.BFMatcher(cv2.NORM_L2, crossCheck=True)
         matches = bf.match(des1, des2)
         good_matches = sorted(matches, key=lambda x: x.distance)[:int(len(matches) * 0.3)]
-    
-    print(f"  좋은 매칭: {len(good_matches)}개")
-    
+    timing['match'] += time.perf_counter() - t0
+
+    log.append(f"  좋은 매칭: {len(good_matches)}개")
+
     if len(good_matches) < 20:  # 최소 매칭 수 증가
-        print(f"  ⚠️  매칭 포인트 부족 (최소 20개 권장)")
-        continue
-    
+        log.append(f"  ⚠️  매칭 포인트 부족 (최소 20개 권장)")
+        return None, log
+
     # 매칭된 점들의 좌표 추출
-    src_pts = np.float32([kp1[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-    dst_pts = np.float32([kp2[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-    
+    src_pts = pts1[[m.queryIdx for m in good_matches]].reshape(-1, 1, 2)
+    dst_pts = pts2[[m.trainIdx for m in good_matches]].reshape(-1, 1, 2)
+
     # Homography 행렬 계산 (RANSAC, 더 엄격한 threshold)
-    H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 3.0, maxIters=5000, confidence=0.995)
-    
+    t0 = time.perf_counter()
+    H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, ransac_thresh, maxIters=5000, confidence=0.995)
+    timing['ransac'] += time.perf_counter() - t0
+
     if H is None:
-        print(f"  ❌ Homography 계산 실패")
-        continue
-    
+        log.append(f"  ❌ Homography 계산 실패")
+        return None, log
+    H = normalize_homography(H)
+
     # Inlier 비율 확인 (품질 검증)
-    inliers = np.sum(mask)
+    inliers = int(np.sum(mask))
     inlier_ratio = inliers / len(good_matches)
-    
-    print(f"  Homography: Inliers {inliers}/{len(good_matches)} ({inlier_ratio*100:.1f}%)")
-    
-    # Inlier 비율이 너무 낮으면 신뢰도 낮음
-    if inlier_ratio < 0.3:
-        print(f"  ⚠️  Inlier 비율 낮음 ({inlier_ratio*100:.1f}%), 품질 의심")
+    log.append(f"  Homography: Inliers {inliers}/{len(good_matches)} ({inlier_ratio*100:.1f}%)")
+
+    return {'H': H, 'src_pts': src_pts, 'dst_pts': dst_pts, 'mask': mask, 'inlier_ratio': inlier_ratio}, log
+
+
+def register_pair(task):
+    """
+    이미지 쌍 1개 정합 (프로세스 풀 작업 단위, 결과는 모두 pickle 가능한 값)
+
+    Args:
+        task: (base_num, visual 경로, thermal 경로, options)
+    Returns: dict(base_num, result, log, timing, cache_hits)
+    """
+    base_num, visual_path, thermal_path, options = task
+    timing = dict.fromkeys(STAGES, 0.0)
+    cache = KeypointCache(options['cache_dir'])
+
+    f1 = extract_features(visual_path, options['scale'], cache, timing)
+    f2 = extract_features(thermal_path, options['scale'], cache, timing) if f1 is not None else None
+    if f1 is None or f2 is None:
+        result, log = None, [f"  ⚠️  이미지 로드 실패"]
     else:
-        homography_matrices.append(H)
-        print(f"  ✅ 고품질 Homography 계산 성공")
-    
-    # Visual 이미지를 Thermal 좌표계로 변환
-    h, w = img_thermal.shape[:2]
-    img_warped = cv2.warpPerspective(img_visual, H, (w, h))
-    
-    # 라벨이 있으면 변환해서 시각화
+        result, log = match_features(f1[0], f1[1], f2[0], f2[1], options['ratio'], options['ransac_thresh'], timing)
+    return {'base_num': base_num, 'result': result, 'log': log, 'timing': timing, 'cache_hits': cache.hits}
+
+
+def reprojection_rmse(H, src_pts, dst_pts):
+    """src_pts를 H로 변환했을 때 dst_pts와의 RMSE (px)"""
+    proj = cv2.perspectiveTransform(src_pts.reshape(-1, 1, 2).astype(np.float32), H)
+    err = np.linalg.norm(proj.reshape(-1, 2) - dst_pts.reshape(-1, 2), axis=1)
+    return float(np.sqrt(np.mean(err ** 2)))
+
+
+def inlier_points(result):
+    """RANSAC inlier 대응점만 (src, dst)"""
+    keep = result['mask'].ravel().astype(bool)
+    return result['src_pts'][keep], result['dst_pts'][keep]
+
+
+def normalize_homography(H):
+    """H[2,2] = 1 로 정규화 (스케일이 다른 행렬끼리 비교/저장할 수 있게)"""
+    return H / H[2, 2]
+
+
+def pooled_homography(accepted, ransac_thresh, max_rmse=DRIFT_THRESHOLD):
+    """
+    여러 쌍의 inlier 대응점을 합친 집합에서 RANSAC으로 Homography 1개 추정
+
+    inlier가 많은 쌍이 자연스럽게 더 큰 비중을 가진다.
+    통합 H 기준 재투영 오차가 max_rmse를 넘는 쌍은 빼고 다시 추정하고,
+    최종 H 기준으로 남은 쌍이 모두 임계값 안에 들 때까지 반복한다.
+    (남은 쌍이 모두 임계값을 넘으면 그 직전 추정을 그대로 반환)
+
+    Returns: (H 또는 None, 사용한 base_num 목록, {base_num: 통합 H 기준 RMSE})
+    """
+    points = {base_num: inlier_points(r) for base_num, r in accepted}
+    used = list(points)
+    H = None
+    # 매번 쌍이 1개 이상 빠지므로 최대 쌍 수만큼 반복
+    for _ in range(len(points)):
+        src = np.concatenate([points[b][0] for b in used])
+        dst = np.concatenate([points[b][1] for b in used])
+        # 이미 쌍별 RANSAC을 통과한 inlier라 outlier가 적음 → 적은 반복으로 충분
+        H, _ = cv2.findHomography(src, dst, cv2.RANSAC, ransac_thresh, maxIters=500, confidence=0.999)
+        if H is None:
+            return None, [], {}
+        H = normalize_homography(H)
+        errors = {b: reprojection_rmse(H, *points[b]) for b in points}
+        keep = [b for b in used if errors[b] <= max_rmse]
+        if len(keep) == len(used) or not keep:
+            break
+        used = keep
+    return H, used, errors
+
+
+def read_yolo_labels(label_path):
+    """YOLO 라벨 파일 → [(cls, x_center, y_center, width, height), ...]"""
+    boxes = []
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) == 5:
+                boxes.append(tuple(map(float, parts)))
+    return boxes
+
+
+def transform_box(box, H, src_size, dst_size):
+    """
+    YOLO 박스 1개를 Homography로 변환 (4개 코너 변환 후 축 정렬 bbox)
+
+    Args:
+        src_size, dst_size: (w, h) visual / thermal 이미지 크기
+    Returns: (원본 픽셀 박스, 변환된 픽셀 박스), 각각 (x1, y1, x2, y2) 정수
+    """
+    cls, x_center, y_center, width, height = box
+    img_w, img_h = src_size
+
+    # YOLO normalized -> pixel 좌표
+    x_center_px = x_center * img_w
+    y_center_px = y_center * img_h
+    box_w = width * img_w
+    box_h = height * img_h
+
+    x1 = int(x_center_px - box_w / 2)
+    y1 = int(y_center_px - box_h / 2)
+    x2 = int(x_center_px + box_w / 2)
+    y2 = int(y_center_px + box_h / 2)
+
+    # Homography로 박스 좌표 변환
+    # 박스의 4개 코너 포인트
+    corners = np.float32([
+        [x1, y1],
+        [x2, y1],
+        [x2, y2],
+        [x1, y2]
+    ]).reshape(-1, 1, 2)
+
+    # 변환된 코너
+    corners_warped = cv2.perspectiveTransform(corners, H)
+
+    # 변환된 코너로 새로운 bounding box 계산
+    x_coords = corners_warped[:, 0, 0]
+    y_coords = corners_warped[:, 0, 1]
+    x1_new = int(np.min(x_coords))
+    y1_new = int(np.min(y_coords))
+    x2_new = int(np.max(x_coords))
+    y2_new = int(np.max(y_coords))
+    return (x1, y1, x2, y2), (x1_new, y1_new, x2_new, y2_new)
+
+
+def to_yolo_line(cls, box, dst_size):
+    """픽셀 박스 → 이미지 범위로 자른 YOLO 라벨 문자열 (범위 밖이면 None)"""
+    w, h = dst_size
+    x1, y1, x2, y2 = max(box[0], 0), max(box[1], 0), min(box[2], w), min(box[3], h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return f"{int(cls)} {(x1 + x2) / 2 / w:.6f} {(y1 + y2) / 2 / h:.6f} {(x2 - x1) / w:.6f} {(y2 - y1) / h:.6f}\n"
+
+
+def save_visualization(base_num, img_visual, img_target, result, target='thermal'):
+    """정합 전/후 라벨, 매칭, 정합된 visual 이미지 저장 (nvg는 파일 이름에 _nvg)"""
+    H = result['H']
+    h, w = img_target.shape[:2]
     label_path = os.path.join(label_dir, f'{base_num}_v.txt')
-    
+
     if os.path.exists(label_path):
-        # 원본 라벨로 thermal에 박스 그리기 (빨간색 - 정합 전)
-        img_thermal_before = img_thermal.copy()
-        
-        # 변환된 라벨로 thermal에 박스 그리기 (초록색 - 정합 후)
-        img_thermal_after = img_thermal.copy()
-        
-        with open(label_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) == 5:
-                    cls, x_center, y_center, width, height = map(float, parts)
-                    
-                    # YOLO normalized -> pixel 좌표
-                    img_h, img_w = img_thermal.shape[:2]
-                    x_center_px = x_center * img_w
-                    y_center_px = y_center * img_h
-                    box_w = width * img_w
-                    box_h = height * img_h
-                    
-                    x1 = int(x_center_px - box_w / 2)
-                    y1 = int(y_center_px - box_h / 2)
-                    x2 = int(x_center_px + box_w / 2)
-                    y2 = int(y_center_px + box_h / 2)
-                    
-                    # 원본 좌표 (빨간색)
-                    cv2.rectangle(img_thermal_before, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    cv2.putText(img_thermal_before, 'original', (x1, y1-10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                    
-                    # Homography로 박스 좌표 변환
-                    # 박스의 4개 코너 포인트
-                    corners = np.float32([
-                        [x1, y1],
-                        [x2, y1],
-                        [x2, y2],
-                        [x1, y2]
-                    ]).reshape(-1, 1, 2)
-                    
-                    # 변환된 코너
-                    corners_warped = cv2.perspectiveTransform(corners, H)
-                    
-                    # 변환된 코너로 새로운 bounding box 계산
-                    x_coords = corners_warped[:, 0, 0]
-                    y_coords = corners_warped[:, 0, 1]
-                    x1_new = int(np.min(x_coords))
-                    y1_new = int(np.min(y_coords))
-                    x2_new = int(np.max(x_coords))
-                    y2_new = int(np.max(y_coords))
-                    
-                    # 변환된 좌표 (초록색)
-                    cv2.rectangle(img_thermal_after, (x1_new, y1_new), (x2_new, y2_new), (0, 255, 0), 2)
-                    cv2.putText(img_thermal_after, 'registered', (x1_new, y1_new-10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
+        # 원본 라벨로 대상 이미지에 박스 그리기 (빨간색 - 정합 전)
+        img_target_before = img_target.copy()
+
+        # 변환된 라벨로 대상 이미지에 박스 그리기 (초록색 - 정합 후)
+        img_target_after = img_target.copy()
+
+        src_size = (img_visual.shape[1], img_visual.shape[0])
+        for box in read_yolo_labels(label_path):
+            (x1, y1, x2, y2), (x1_new, y1_new, x2_new, y2_new) = transform_box(box, H, src_size, (w, h))
+
+            # 원본 좌표 (빨간색)
+            cv2.rectangle(img_target_before, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(img_target_before, 'original', (x1, y1-10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+
+            # 변환된 좌표 (초록색)
+            cv2.rectangle(img_target_after, (x1_new, y1_new), (x2_new, y2_new), (0, 255, 0), 2)
+            cv2.putText(img_target_after, 'registered', (x1_new, y1_new-10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
         # 비교 이미지 저장
-        cv2.imwrite(os.path.join(output_dir, f'{base_num}_thermal_before.png'), img_thermal_before)
-        cv2.imwrite(os.path.join(output_dir, f'{base_num}_thermal_after.png'), img_thermal_after)
-        print(f"  💾 저장: {base_num}_thermal_before.png, {base_num}_thermal_after.png")
-    
-    # 매칭 시각화
-    img_matches = cv2.drawMatches(img_visual, kp1, img_thermal, kp2, 
-                                  good_matches[:50], None, 
+        cv2.imwrite(os.path.join(output_dir, f'{base_num}_{target}_before.png'), img_target_before)
+        cv2.imwrite(os.path.join(output_dir, f'{base_num}_{target}_after.png'), img_target_after)
+        print(f"  💾 저장: {base_num}_{target}_before.png, {base_num}_{target}_after.png")
+
+    # 매칭 시각화 (대응점 앞 50개)
+    src, dst = result['src_pts'][:50, 0], result['dst_pts'][:50, 0]
+    kp1 = [cv2.KeyPoint(float(x), float(y), 1) for x, y in src]
+    kp2 = [cv2.KeyPoint(float(x), float(y), 1) for x, y in dst]
+    good_matches = [cv2.DMatch(i, i, 0) for i in range(len(kp1))]
+    img_matches = cv2.drawMatches(img_visual, kp1, img_target, kp2,
+                                  good_matches, None,
                                   flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS)
-    cv2.imwrite(os.path.join(output_dir, f'{base_num}_matches.png'), img_matches)
-    
-    # 정합된 이미지 저장
-    cv2.imwrite(os.path.join(output_dir, f'{base_num}_warped.png'), img_warped)
-    
-    print()
-
-# 평균 Homography 계산
-if len(homography_matrices) > 0:
-    avg_H = np.mean(homography_matrices, axis=0)
+    tag = '' if target == 'thermal' else f'_{target}'
+    cv2.imwrite(os.path.join(output_dir, f'{base_num}_matches{tag}.png'), img_matches)
+
+    # 정합된 이미지 저장 (Visual 이미지를 대상 좌표계로 변환)
+    img_warped = cv2.warpPerspective(img_visual, H, (w, h))
+    cv2.imwrite(os.path.join(output_dir, f'{base_num}_warped{tag}.png'), img_warped)
+
+
+def estimate_pairs(pairs, visualize=False, options=None, workers=WORKERS, target='thermal'):
+    """이미지 쌍마다 매칭 (프로세스 풀) → [(base_num, result)] (품질 낮은 쌍 제외)"""
+    options = options or MATCH_OPTIONS
+    tasks = [(base_num, v, t, options) for base_num, v, t in pairs]
+    paths = {base_num: (v, t) for base_num, v, t in pairs}
+    timing = dict.fromkeys(STAGES, 0.0)
+    cache_hits = 0
+    accepted = []
+
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(tasks) > 1 else None
+    outputs = executor.map(register_pair, tasks) if executor else map(register_pair, tasks)
+    for idx, out in enumerate(outputs):
+        base_num, result = out['base_num'], out['result']
+        print(f"[{idx+1}/{len(pairs)}] Processing: {base_num}")
+        print('\n'.join(out['log']))
+        for k, v in out['timing'].items():
+            timing[k] += v
+        cache_hits += out['cache_hits']
+        if result is None:
+            print()
+            continue
+
+        # Inlier 비율이 너무 낮으면 신뢰도 낮음
+        if result['inlier_ratio'] < 0.3:
+            print(f"  ⚠️  Inlier 비율 낮음 ({result['inlier_ratio']*100:.1f}%), 품질 의심")
+        else:
+            accepted.append((base_num, result))
+            print(f"  ✅ 고품질 Homography 계산 성공")
+
+        if visualize:
+            visual_path, target_path = paths[base_num]
+            save_visualization(base_num, cv2.imread(visual_path), cv2.imread(target_path), result, target)
+        print()
+    if executor:
+        executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    # 단계별 시간 (프로세스 합계) / 전체 경과 시간
+    print(f"⏱️  {len(pairs)}쌍, 프로세스 {workers if executor else 1}개, 경과 {elapsed:.2f}s, "
+          f"특징점 캐시 적중 {cache_hits}/{len(pairs) * 2}")
+    print('   ' + ', '.join(f"{k} {v:.2f}s" for k, v in timing.items()) + ' (프로세스 합계)')
+    return accepted
+
+
+def calibrate(pairs, samples=CALIB_SAMPLES, visualize=True, options=None, workers=WORKERS, target='thermal'):
+    """샘플 쌍(samples=0이면 전체)으로 visual → target Homography 추정 + 검증 후 저장. 실패 시 None"""
+    os.makedirs(output_dir, exist_ok=True)
+    sample = spread_sample(pairs, samples) if samples > 0 else list(pairs)
+    print(f"\n📁 총 {len(pairs)}개 이미지 쌍 중 {len(sample)}개로 calibrate (visual → {target})\n")
+
+    accepted = estimate_pairs(sample, visualize, options, workers, target)
+    if not accepted:
+        print("❌ Homography 계산 실패!")
+        return None
+
+    # 모든 쌍의 inlier 대응점을 합쳐서 Homography 1개를 다시 추정
+    ransac_thresh = (options or MATCH_OPTIONS)['ransac_thresh']
+    t0 = time.perf_counter()
+    pooled_H, used, errors = pooled_homography(accepted, ransac_thresh)
+    pooled_time = time.perf_counter() - t0
+    if pooled_H is None:
+        print("❌ Homography 계산 실패!")
+        return None
+
     print("=" * 60)
-    print(f"✅ 총 {len(homography_matrices)}개 이미지에서 Homography 계산 성공")
-    print("\n평균 Homography 행렬:")
-    print(avg_H)
-    
+    print(f"✅ 총 {len(accepted)}개 이미지에서 Homography 계산 성공, 통합 추정에 {len(used)}개 사용 ({pooled_time:.3f}s)")
+    print("\n통합 Homography 행렬:")
+    print(pooled_H)
+    print("\n쌍별 재투영 오차 RMSE (쌍별 H / 통합 H 기준):")
+    for base_num, r in accepted:
+        own = reprojection_rmse(r['H'], *inlier_points(r))
+        flag = '' if base_num in used else f'  ⚠️  임계값 {DRIFT_THRESHOLD}px 초과, 통합 추정에서 제외'
+        print(f"  {base_num}: {own:.2f}px / {errors[base_num]:.2f}px{flag}")
     # 행렬 저장
-    np.save(os.path.join(output_dir, 'homography_matrix.npy'), avg_H)
-    print(f"\n💾 Homography 행렬 저장: {output_dir}/homography_matrix.npy")
+    np.save(TARGETS[target]['H'], pooled_H)
+    info = {'folder': folder_name, 'target': target, 'created': datetime.now().isoformat(timespec='seconds'),
+            'pairs': used, 'rejected': [b for b, _ in accepted if b not in used], 'rmse': errors,
+            'median_rmse': float(np.median([errors[b] for b in used]))}
+    with open(TARGETS[target]['info'], 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Homography 행렬 저장: {TARGETS[target]['H']} (정보: {TARGETS[target]['info']})")
     print("=" * 60)
-    print(f"\n📁 결과 확인: {output_dir}/")
-    print("   - *_thermal_before.png: 원본 라벨 (빨간색)")
-    print("   - *_thermal_after.png: 정합 후 라벨 (초록색)")
-    print("   - *_matches.png: 특징점 매칭 결과")
-    print("   - *_warped.png: 정합된 Visual 이미지")
-else:
-    print("❌ Homography 계산 실패!")
+    if visualize:
+        print(f"\n📁 결과 확인: {output_dir}/")
+        print(f"   - *_{target}_before.png: 원본 라벨 (빨간색)")
+        print(f"   - *_{target}_after.png: 정합 후 라벨 (초록색)")
+        print("   - *_matches.png: 특징점 매칭 결과")
+        print("   - *_warped.png: 정합된 Visual 이미지")
+    return pooled_H
+
+
+def load_homography(target='thermal'):
+    """저장된 visual → target Homography (없으면 None)"""
+    path = TARGETS[target]['H']
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def check_drift(pairs, H, samples=SPOT_CHECK_SAMPLES, threshold=DRIFT_THRESHOLD, options=None, workers=WORKERS,
+                target='thermal'):
+    """
+    일부 쌍만 다시 매칭해서 저장된 H의 재투영 오차 확인
+
+    Returns: (drift 여부, 쌍별 오차 dict)
+    """
+    sample = spread_sample(pairs, samples)
+    print(f"\n🔍 drift 검사 (visual → {target}): {len(sample)}개 쌍, 임계값 {threshold}px\n")
+    errors = {}
+    for base_num, r in estimate_pairs(sample, options=options, workers=workers, target=target):
+        src, dst = inlier_points(r)
+        errors[base_num] = reprojection_rmse(H, src, dst)
+        print(f"  {base_num}: 저장된 H 재투영 오차 {errors[base_num]:.2f}px")
+    if not errors:
+        print("⚠️  검사할 수 있는 쌍이 없습니다 (매칭 실패)")
+        return False, errors
+    median = float(np.median(list(errors.values())))
+    drift = median > threshold
+    print(f"  중앙값 {median:.2f}px → {'drift 감지, 다시 calibrate 필요' if drift else '정상'}")
+    return drift, errors
+
+
+def apply(pairs, H, warp_images=False, target='thermal'):
+    """
+    저장된 H로 라벨(+이미지) 일괄 변환 (특징점 검출 없음)
+
+    - 라벨: label_dir/{base}_v.txt → registered/labels/{base}_th.txt 또는 _nv.txt (대상 좌표계, 이미지 범위로 자름)
+    - 이미지: registered/visual/{base}_v.png (thermal 크기로 warp된 visual), nvg는 registered/visual_nvg/
+    """
+    suffix = TARGETS[target]['suffix']
+    out_label_dir = os.path.join(registered_dir, 'labels')
+    out_image_dir = os.path.join(registered_dir, 'visual' if target == 'thermal' else f'visual_{target}')
+
+    start = time.perf_counter()
+    # 세션 내 이미지 크기는 같으므로 첫 쌍의 크기를 인덱스에서 가져와 재사용
+    index = load_index(data_dir, update=False)
+    base_num = pairs[0][0]
+    src_size = index.size(base_num, 'visual')
+    dst_size = index.size(base_num, target)
+
+    # 라벨: 세션 전체를 한 번에 변환 (라벨 유무는 output 세션 인덱스로 조회)
+    label_index = load_index(os.path.dirname(label_dir))
+    label_files, out_paths = [], []
+    for base_num, _, _ in pairs:
+        label_path = label_index.label_path(base_num)
+        if label_path is not None:
+            label_files.append(label_path)
+            out_paths.append(os.path.join(out_label_dir, f'{base_num}{suffix}.txt'))
+    n_labels, n_boxes, transform_time = register_labels(label_files, out_paths, H, src_size, dst_size)
+
+    n_images = 0
+    if warp_images:
+        os.makedirs(out_image_dir, exist_ok=True)
+        for _, visual_path, _ in pairs:
+            img_warped = cv2.warpPerspective(cv2.imread(visual_path), H, dst_size)
+            cv2.imwrite(os.path.join(out_image_dir, os.path.basename(visual_path)), img_warped)
+            n_images += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ apply 완료 (visual → {target}): 라벨 {n_labels}개 파일 ({n_boxes}개 박스, 변환 {transform_time:.3f}s), "
+          f"이미지 {n_images}장, {elapsed:.2f}s")
+    print(f"📁 결과 폴더: {registered_dir}")
+
+
+def run_target(args, options, target):
+    """정합 대상 1개에 대해 calibrate / apply / check / auto 실행"""
+    pairs = find_pairs(target)
+    if len(pairs) == 0:
+        if target == 'thermal' or args.target != 'all':
+            print(f"❌ Visual / {target} 이미지 쌍을 찾을 수 없습니다!")
+        else:
+            print(f"ℹ️  {target} 폴더 없음 → 건너뜀")
+        return
+
+    if args.cmd == 'calibrate':
+        calibrate(pairs, args.samples, not args.no_viz, options, args.workers, target)
+        return
+
+    H = load_homography(target)
+    if H is None and args.cmd in ('apply', 'check'):
+        print(f"❌ 저장된 Homography가 없습니다: {TARGETS[target]['H']} (먼저 calibrate --target {target} 실행)")
+        return
+
+    if args.cmd == 'check':
+        check_drift(pairs, H, args.spot_check, args.threshold, options, args.workers, target)
+        return
+
+    if args.cmd == 'auto':
+        if H is None or check_drift(pairs, H, args.spot_check, args.threshold, options, args.workers, target)[0]:
+            H = calibrate(pairs, args.samples, not args.no_viz, options, args.workers, target)
+            if H is None:
+                return
+
+    apply(pairs, H, args.images, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Visual ↔ Thermal / NVG 이미지 정합 (calibrate / apply / check / auto)')
+    parser.add_argument('cmd', choices=['calibrate', 'apply', 'check', 'auto'])
+    parser.add_argument('--target', choices=list(TARGETS) + ['all'], default='all',
+                        help='정합 대상 (all: thermal + 세션에 있으면 nvg)')
+    parser.add_argument('--samples', type=int, default=CALIB_SAMPLES, help='calibrate에 사용할 쌍 수 (0이면 전체)')
+    parser.add_argument('--spot-check', type=int, default=SPOT_CHECK_SAMPLES, help='drift 검사에 사용할 쌍 수')
+    parser.add_argument('--threshold', type=float, default=DRIFT_THRESHOLD, help='drift 재투영 오차 임계값(px)')
+    parser.add_argument('--images', action='store_true', help='apply 시 정합된 visual 이미지도 저장')
+    parser.add_argument('--no-viz', action='store_true', help='calibrate 시각화 이미지 저장 안 함')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='이미지 쌍 병렬 처리 프로세스 수')
+    parser.add_argument('--scale', type=float, default=MATCH_OPTIONS['scale'], help='특징점 검출 이미지 축소 배율')
+    parser.add_argument('--ratio', type=float, default=MATCH_OPTIONS['ratio'], help="Lowe's ratio test 임계값")
+    parser.add_argument('--ransac-thresh', type=float, default=MATCH_OPTIONS['ransac_thresh'],
+                        help='RANSAC 재투영 임계값 (px)')
+    parser.add_argument('--no-cache', action='store_true', help='특징점 캐시 사용 안 함')
+    args = parser.parse_args()
+    options = dict(MATCH_OPTIONS, scale=args.scale, ratio=args.ratio, ransac_thresh=args.ransac_thresh,
+                   cache_dir=None if args.no_cache else MATCH_OPTIONS['cache_dir'])
+
+    print("=" * 60)
+    print("Visual ↔ Thermal / NVG 이미지 정합")
+    print("=" * 60)
+
+    for target in (list(TARGETS) if args.target == 'all' else [args.target]):
+        print(f"\n▶ visual → {target}")
+        run_target(args, options, target)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+특징점/디스크립터 디스크 캐시
+- 키: 이미지 파일 내용 해시(sha256) + 검출기 파라미터 해시
+  → ratio test나 RANSAC 임계값만 바꿔서 다시 실행하면 특징점 검출을 건너뜀
+- 항목 1개 = <cache_dir>/<파일 해시>_<파라미터 해시>.npz
+  (pts: (N, 2) float32 원본 해상도 좌표, des: 디스크립터)
+- 여러 프로세스가 동시에 써도 되도록 임시 파일에 쓴 뒤 os.replace
+"""
+
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+# 파일 내용 해시 (02_01_raw data processing/label_manifest.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '02_01_raw data processing'))
+from label_manifest import file_hash
+
+
+def params_hash(params):
+    """검출기 파라미터 dict 해시 (앞 8자리)"""
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]
+
+
+class KeypointCache:
+    """
+    특징점 캐시
+
+    Args:
+        cache_dir: 캐시 폴더 (None이면 캐시 사용 안 함)
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path, params):
+        return f'{file_hash(path)}_{params_hash(params)}'
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def load(self, key):
+        """(pts, des) 또는 캐시에 없으면 None"""
+        if not self.cache_dir or not os.path.exists(self._path(key)):
+            self.misses += 1
+            return None
+        with np.load(self._path(key)) as data:
+            pts, des = data['pts'], data['des']
+        self.hits += 1
+        return pts, (des if des.size else None)
+
+    def save(self, key, pts, des):
+        if not self.cache_dir:
+            return
+        tmp = self._path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, pts=pts, des=des if des is not None else np.zeros((0, 0), np.float32))
+        os.replace(tmp, self._path(key))
@@ -0,0 +1,219 @@
+"""
+YOLO 라벨 일괄 정합 (Homography로 세션 전체 라벨을 한 번에 변환)
+- 세션의 라벨 파일을 모두 읽어 (N, 5) 배열 하나로 합침 (파일별 시작 위치는 offsets)
+- 모든 박스의 4개 코너를 행렬 연산 한 번으로 변환 → 축 정렬 bbox → 이미지 범위로 자르기
+- 결과는 image_registration.transform_box + to_yolo_line (박스별 처리)과 동일 (int 절삭까지 같게 맞춤)
+
+사용 예:
+    python label_registration.py verify --boxes 100000
+    python label_registration.py register output/<folder>/labels output/<folder>/registered/labels \\
+        --homography test_registration/homography_matrix.npy --src-size 1920x1080 --dst-size 1920x1080 --suffix _th
+"""
+
+import os
+import glob
+import time
+import argparse
+import numpy as np
+
+
+def load_labels(label_files):
+    """
+    라벨 파일 목록 → (labels, offsets)
+
+    labels: (N, 5) float64 [cls, x_center, y_center, width, height]
+    offsets: (파일 수 + 1,) int, i번째 파일의 박스는 labels[offsets[i]:offsets[i+1]]
+    """
+    chunks = []
+    counts = []
+    for path in label_files:
+        with open(path, 'r') as f:
+            rows = [parts for parts in (line.split() for line in f) if len(parts) == 5]
+        counts.append(len(rows))
+        if rows:
+            chunks.append(rows)
+    offsets = np.zeros(len(label_files) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if not chunks:
+        return np.zeros((0, 5), dtype=np.float64), offsets
+    labels = np.array([v for rows in chunks for parts in rows for v in parts], dtype=np.float64).reshape(-1, 5)
+    return labels, offsets
+
+
+def perspective_transform(pts, H):
+    """cv2.perspectiveTransform과 같은 계산 순서 (double 계산 → float32 결과)
+
+    pts: (..., 2) 배열
+    """
+    m = np.asarray(H, dtype=np.float64).ravel()
+    x = pts[..., 0].astype(np.float64)
+    y = pts[..., 1].astype(np.float64)
+    w = x * m[6] + y * m[7] + m[8]
+    ok = np.abs(w) > np.finfo(np.float32).eps
+    w = np.divide(1.0, w, out=np.zeros_like(w), where=ok)
+    out = np.empty(pts.shape, dtype=np.float32)
+    out[..., 0] = (x * m[0] + y * m[1] + m[2]) * w
+    out[..., 1] = (x * m[3] + y * m[4] + m[5]) * w
+    return out
+
+
+def transform_boxes(labels, H, src_size):
+    """
+    (N, 5) YOLO 라벨 → (N, 4) int64 변환 픽셀 박스 [x1, y1, x2, y2]
+
+    Args:
+        src_size: (w, h) 라벨 기준(visual) 이미지 크기
+    """
+    img_w, img_h = src_size
+    xc = labels[:, 1] * img_w
+    yc = labels[:, 2] * img_h
+    bw = labels[:, 3] * img_w
+    bh = labels[:, 4] * img_h
+
+    # 박스별 처리와 같게 int()(0 방향 절삭)
+    x1 = np.trunc(xc - bw / 2)
+    y1 = np.trunc(yc - bh / 2)
+    x2 = np.trunc(xc + bw / 2)
+    y2 = np.trunc(yc + bh / 2)
+
+    # (N, 4, 2) 코너: 좌상, 우상, 우하, 좌하
+    corners = np.stack([np.stack([x1, y1], -1), np.stack([x2, y1], -1),
+                        np.stack([x2, y2], -1), np.stack([x1, y2], -1)], axis=1).astype(np.float32)
+    warped = perspective_transform(corners, H)
+
+    boxes = np.empty((len(labels), 4), dtype=np.int64)
+    boxes[:, 0:2] = np.trunc(warped.min(axis=1))
+    boxes[:, 2:4] = np.trunc(warped.max(axis=1))
+    return boxes
+
+
+def clip_boxes(boxes, dst_size):
+    """이미지 범위로 자르기 → (잘린 박스, 유효 여부 mask)"""
+    w, h = dst_size
+    clipped = boxes.copy()
+    np.maximum(clipped[:, 0:2], 0, out=clipped[:, 0:2])
+    np.minimum(clipped[:, 2], w, out=clipped[:, 2])
+    np.minimum(clipped[:, 3], h, out=clipped[:, 3])
+    valid = (clipped[:, 2] > clipped[:, 0]) & (clipped[:, 3] > clipped[:, 1])
+    return clipped, valid
+
+
+def to_yolo_array(boxes, dst_size):
+    """픽셀 박스 (N, 4) → 정규화 YOLO (N, 4) [x_center, y_center, width, height]"""
+    w, h = dst_size
+    x1, y1, x2, y2 = boxes.T
+    return np.stack([(x1 + x2) / 2 / w, (y1 + y2) / 2 / h, (x2 - x1) / w, (y2 - y1) / h], axis=1)
+
+
+def register_labels(label_files, out_paths, H, src_size, dst_size):
+    """
+    라벨 파일들을 한 번에 변환해서 out_paths에 저장 (박스가 모두 범위 밖이면 빈 파일)
+
+    Returns: (파일 수, 저장된 박스 수, 변환 시간 s)
+    """
+    labels, offsets = load_labels(label_files)
+    t0 = time.perf_counter()
+    clipped, valid = clip_boxes(transform_boxes(labels, H, src_size), dst_size)
+    yolo = to_yolo_array(clipped, dst_size)
+    cls = labels[:, 0].astype(np.int64)
+    transform_time = time.perf_counter() - t0
+
+    made = set()
+    for i, out_path in enumerate(out_paths):
+        out_dir = os.path.dirname(out_path)
+        if out_dir not in made:
+            os.makedirs(out_dir or '.', exist_ok=True)
+            made.add(out_dir)
+        s, e = offsets[i], offsets[i + 1]
+        keep = np.flatnonzero(valid[s:e]) + s
+        with open(out_path, 'w') as f:
+            f.writelines(f"{cls[j]} {yolo[j, 0]:.6f} {yolo[j, 1]:.6f} {yolo[j, 2]:.6f} {yolo[j, 3]:.6f}\n"
+                         for j in keep)
+    return len(out_paths), int(valid.sum()), transform_time
+
+
+def register_dir(label_dir, out_dir, H, src_size, dst_size, suffix='_th'):
+    """label_dir/{base}_v.txt → out_dir/{base}{suffix}.txt"""
+    label_files = sorted(glob.glob(os.path.join(label_dir, '*_v.txt')))
+    out_paths = [os.path.join(out_dir, os.path.basename(p)[:-len('_v.txt')] + suffix + '.txt')
+                 for p in label_files]
+    return register_labels(label_files, out_paths, H, src_size, dst_size)
+
+
+def verify(n_boxes=100000, src_size=(1920, 1080), dst_size=(1920, 1080), seed=0):
+    """
+    무작위 라벨/Homography로 박스별 처리(image_registration)와 결과 비교 + 시간 측정
+
+    Returns: 불일치 박스 수
+    """
+    import cv2
+    from image_registration import transform_box, to_yolo_line
+
+    rng = np.random.default_rng(seed)
+    labels = np.column_stack([
+        rng.integers(0, 3, n_boxes).astype(np.float64),
+        rng.uniform(-0.1, 1.1, n_boxes), rng.uniform(-0.1, 1.1, n_boxes),
+        rng.uniform(0.001, 0.3, n_boxes), rng.uniform(0.001, 0.3, n_boxes),
+    ])
+    # 저장된 라벨과 같은 정밀도 (소수점 6자리)
+    labels = np.round(labels, 6)
+    src = np.float32([[0, 0], [src_size[0], 0], [src_size[0], src_size[1]], [0, src_size[1]]])
+    dst = src + rng.uniform(-40, 40, src.shape).astype(np.float32)
+    H = cv2.getPerspectiveTransform(src, dst)
+
+    t0 = time.perf_counter()
+    expected = []
+    for box in labels.tolist():
+        _, warped = transform_box(box, H, src_size, dst_size)
+        expected.append(to_yolo_line(box[0], warped, dst_size))
+    per_box_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    clipped, valid = clip_boxes(transform_boxes(labels, H, src_size), dst_size)
+    yolo = to_yolo_array(clipped, dst_size)
+    batch_time = time.perf_counter() - t0
+
+    cls = labels[:, 0].astype(np.int64)
+    mismatch = 0
+    for j, line in enumerate(expected):
+        got = (f"{cls[j]} {yolo[j, 0]:.6f} {yolo[j, 1]:.6f} {yolo[j, 2]:.6f} {yolo[j, 3]:.6f}\n"
+               if valid[j] else None)
+        mismatch += got != line
+
+    print(f"박스 {n_boxes}개, {src_size[0]}x{src_size[1]} → {dst_size[0]}x{dst_size[1]}")
+    print(f"  박스별 처리: {per_box_time:.3f}s")
+    print(f"  일괄 처리  : {batch_time:.3f}s ({per_box_time / batch_time:.0f}x)")
+    print(f"  범위 밖 박스: {int((~valid).sum())}개")
+    print(f"  불일치: {mismatch}개 {'✅' if mismatch == 0 else '❌'}")
+    return mismatch
+
+
+def parse_size(text):
+    w, h = text.lower().split('x')
+    return int(w), int(h)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='YOLO 라벨 일괄 정합')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('verify', help='박스별 처리와 결과/속도 비교')
+    p.add_argument('--boxes', type=int, default=100000)
+    p.add_argument('--seed', type=int, default=0)
+    p = sub.add_parser('register', help='라벨 폴더 일괄 변환')
+    p.add_argument('label_dir')
+    p.add_argument('out_dir')
+    p.add_argument('--homography', required=True, help='.npy Homography (visual → 대상 모달리티)')
+    p.add_argument('--src-size', type=parse_size, required=True, help='visual 이미지 크기 (예: 1920x1080)')
+    p.add_argument('--dst-size', type=parse_size, required=True, help='대상 이미지 크기')
+    p.add_argument('--suffix', default='_th', help='저장 파일 접미사 (thermal: _th, nvg: _nv)')
+    args = parser.parse_args()
+
+    if args.cmd == 'verify':
+        raise SystemExit(1 if verify(args.boxes, seed=args.seed) else 0)
+
+    H = np.load(args.homography)
+    start = time.perf_counter()
+    n_files, n_boxes, transform_time = register_dir(args.label_dir, args.out_dir, H,
+                                                    args.src_size, args.dst_size, args.suffix)
+    print(f"✅ 라벨 {n_files}개 파일 ({n_boxes}개 박스): 변환 {transform_time:.3f}s, "
+          f"전체 {time.perf_counter() - start:.2f}s")
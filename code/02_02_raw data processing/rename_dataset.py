@@ -2,21 +2,152 @@
 데이터셋 파일명을 순차적으로 재정렬하는 스크립트
 - 이미지 파일과 labels 폴더의 txt 파일을 함께 리네임
 - 기존 번호 건너뛴 파일들을 연속된 번호로 정리
+- 파일 복사 없이 os.rename 2단계(원본 → 임시 이름 → 새 이름)로 처리하고
+  저널(.rename_journal.json)을 남겨 중단 시 --resume / --rollback 가능
 """
 
 import os
 import glob
+import json
+import time
+import uuid
 from pathlib import Path
-import shutil
 
-def rename_dataset(dataset_dir, start_index=1, suffix='_v'):
+JOURNAL_NAME = '.rename_journal.json'  # 진행 중인 리네임 기록 (중단 시 재개/되돌리기용)
+
+
+def _write_journal(journal_path, journal):
+    """저널 기록 (임시 파일에 쓰고 교체 → 저널 자체가 깨지지 않음)"""
+    tmp_path = f'{journal_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, journal_path)
+
+
+def _read_journal(journal_path):
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_plan(plan):
+    """
+    리네임 계획 검증 (대상 이름 중복, 계획에 없는 기존 파일 덮어쓰기)
+
+    Returns: 문제 목록 (없으면 빈 리스트)
+    """
+    problems = []
+    sources = {os.path.normcase(os.path.abspath(src)) for src, _ in plan}
+    seen = set()
+    for src, dst in plan:
+        key = os.path.normcase(os.path.abspath(dst))
+        if key in seen:
+            problems.append(f"대상 이름 중복: {dst}")
+        seen.add(key)
+        if key not in sources and os.path.exists(dst):
+            problems.append(f"계획에 없는 파일을 덮어씀: {dst}")
+    return problems
+
+
+def execute_plan(plan, journal_path, dry_run=False):
+    """
+    (원본 경로, 새 경로) 목록을 메타데이터 작업(os.rename)만으로 실행
+
+    1단계: 원본 → 같은 폴더의 고유 임시 이름, 2단계: 임시 이름 → 새 이름
+    (번호가 겹쳐도 충돌 없음). 시작 전에 저널을 기록하고 단계가 바뀔 때마다 갱신하므로
+    중간에 끊기면 recover()로 끝까지 진행하거나 원래대로 되돌릴 수 있다.
+
+    Returns: 실제로 이름이 바뀐 파일 수
+    """
+    plan = [(str(src), str(dst)) for src, dst in plan if str(src) != str(dst)]
+    problems = check_plan(plan)
+    if problems:
+        print("Error: 리네임 계획에 문제가 있습니다.")
+        for p in problems[:10]:
+            print(f"  {p}")
+        raise RuntimeError(f"리네임 계획 오류 {len(problems)}건")
+    if dry_run or not plan:
+        return len(plan)
+    if os.path.exists(journal_path):
+        raise RuntimeError(f"이전 리네임이 끝나지 않았습니다: {journal_path} (--resume 또는 --rollback)")
+
+    token = uuid.uuid4().hex[:8]
+    moves = []
+    for i, (src, dst) in enumerate(plan):
+        tmp = os.path.join(os.path.dirname(src), f'.renum_{token}_{i}{os.path.splitext(src)[1]}')
+        moves.append([src, tmp, dst])
+    journal = {'state': 'phase1', 'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'moves': moves}
+    _write_journal(journal_path, journal)
+    _run_moves(journal, journal_path)
+    return len(moves)
+
+
+def _run_moves(journal, journal_path):
+    """저널 상태부터 끝까지 진행 (이미 옮겨진 파일은 건너뜀)"""
+    moves = journal['moves']
+    if journal['state'] == 'phase1':
+        for src, tmp, _ in moves:
+            if not os.path.exists(tmp):
+                os.rename(src, tmp)
+        journal['state'] = 'phase2'
+        _write_journal(journal_path, journal)
+    for _, tmp, dst in moves:
+        if os.path.exists(tmp):
+            os.rename(tmp, dst)
+    os.remove(journal_path)
+
+
+def recover(journal_path, rollback=False):
+    """
+    중단된 리네임 복구
+
+    Args:
+        rollback: False면 끝까지 진행(roll forward), True면 원래 이름으로 되돌림
+    """
+    if not os.path.exists(journal_path):
+        print(f"진행 중인 리네임이 없습니다: {journal_path}")
+        return 0
+    journal = _read_journal(journal_path)
+    moves = journal['moves']
+    print(f"중단된 리네임 발견 ({journal['created']}, {len(moves)}개 파일, 단계: {journal['state']})")
+    if not rollback:
+        _run_moves(journal, journal_path)
+        print("✅ 리네임을 끝까지 진행했습니다.")
+        return len(moves)
+
+    if journal['state'] == 'phase2':
+        # 2단계에서 이미 새 이름으로 옮긴 파일을 임시 이름으로 되돌림
+        for _, tmp, dst in moves:
+            if not os.path.exists(tmp) and os.path.exists(dst):
+                os.rename(dst, tmp)
+        journal['state'] = 'phase1'
+        _write_journal(journal_path, journal)
+    for src, tmp, _ in moves:
+        if os.path.exists(tmp):
+            os.rename(tmp, src)
+    os.remove(journal_path)
+    print("✅ 원래 이름으로 되돌렸습니다.")
+    return len(moves)
+
+
+def print_plan(rows, limit=10):
+    """(원본 이름, 새 이름, 상태) 목록 일부 출력"""
+    for old_name, new_name, status in rows[:limit]:  # 처음 10개만 출력
+        print(f"  {old_name} → {new_name} {status}")
+    if len(rows) > limit:
+        print(f"  ... 외 {len(rows) - limit}개")
+
+
+def rename_dataset(dataset_dir, start_index=1, suffix='_v', dry_run=False):
     """
-    데이터셋 파일명을 순차적으로 재정렬
+    데이터셋 파일명을 순차적으로 재정렬 (파일 복사 없이 os.rename만 사용)
     
     Args:
         dataset_dir: 데이터셋 디렉토리 경로 (예: 'output/20251029_Takistan_1200_Taleban')
         start_index: 시작 인덱스 (기본값: 1)
-        suffix: 파일명 접미사 (예: '_v', '_th', '_ir')
+        suffix: 파일명 접미사 (예: '_v', '_th', '_nv')
+        dry_run: True면 계획만 출력하고 파일은 건드리지 않음
     """
     dataset_path = Path(dataset_dir)
     labels_dir = dataset_path / 'labels'
@@ -39,14 +170,9 @@ def rename_dataset(dataset_dir, start_index=1, suffix='_v'):
     print(f"접미사: {suffix}")
     print()
     
-    # 임시 디렉토리 생성 (충돌 방지)
-    temp_dir = dataset_path / 'temp_rename'
-    temp_labels_dir = temp_dir / 'labels'
-    temp_dir.mkdir(exist_ok=True)
-    temp_labels_dir.mkdir(exist_ok=True)
-    
-    # 파일 리네임 (임시 디렉토리로)
+    # 리네임 계획 (이미지 + 라벨)
     current_index = start_index
+    plan = []
     rename_mapping = []
     
     for img_file in image_files:
@@ -60,84 +186,141 @@ def rename_dataset(dataset_dir, start_index=1, suffix='_v'):
         # 원본 label 파일 경로
         old_label_path = labels_dir / f"{img_path.stem}.txt"
         
-        # 임시 경로
-        temp_img_path = temp_dir / new_img_name
-        temp_label_path = temp_labels_dir / new_label_name
+        plan.append((img_path, dataset_path / new_img_name))
         
-        # 이미지 복사
-        shutil.copy2(img_path, temp_img_path)
-        
-        # 라벨 복사 (존재하는 경우)
+        # 라벨 (존재하는 경우)
         if old_label_path.exists():
-            shutil.copy2(old_label_path, temp_label_path)
+            plan.append((old_label_path, labels_dir / new_label_name))
             rename_mapping.append((img_path.name, new_img_name, '✓'))
         else:
             rename_mapping.append((img_path.name, new_img_name, '✗ (no label)'))
         
         current_index += 1
     
-    # 원본 파일 삭제
-    print("원본 파일 삭제 중...")
-    for img_file in image_files:
-        os.remove(img_file)
-        # 해당 라벨 파일도 삭제
-        label_file = labels_dir / f"{Path(img_file).stem}.txt"
-        if label_file.exists():
-            os.remove(label_file)
-    
-    # 임시 디렉토리에서 원본 위치로 이동
-    print("리네임된 파일 이동 중...")
-    for file in temp_dir.glob(f'*{suffix}.*'):
-        shutil.move(str(file), str(dataset_path / file.name))
-    
-    for file in temp_labels_dir.glob(f'*{suffix}.txt'):
-        shutil.move(str(file), str(labels_dir / file.name))
-    
-    # 임시 디렉토리 삭제
-    temp_labels_dir.rmdir()
-    temp_dir.rmdir()
+    start = time.perf_counter()
+    renamed = execute_plan(plan, str(dataset_path / JOURNAL_NAME), dry_run)
+    elapsed = time.perf_counter() - start
     
     # 결과 출력
-    print("\n=== 리네임 완료 ===")
-    print(f"총 {len(rename_mapping)}개 파일 처리")
+    print(f"\n=== {'리네임 계획 (dry-run, 변경 없음)' if dry_run else '리네임 완료'} ===")
+    print(f"총 {len(rename_mapping)}개 파일 처리, 이름 변경 {renamed}개 (라벨 포함), {elapsed:.2f}s")
     print("\n변경 내역:")
-    for old_name, new_name, status in rename_mapping[:10]:  # 처음 10개만 출력
-        print(f"  {old_name} → {new_name} {status}")
-    
-    if len(rename_mapping) > 10:
-        print(f"  ... 외 {len(rename_mapping) - 10}개")
+    print_plan(rename_mapping)
     
     print(f"\n최종 인덱스: {current_index - 1}")
     print(f"다음 데이터셋 추가 시 시작 인덱스: {current_index}")
 
 
-def rename_multimodal_dataset(base_dir, start_index=1):
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+MODALITIES = {
+    'visual': '_v',
+    'thermal': '_th',
+    'nvg': '_nv'
+}
+
+
+def scan_modality(modality_dir, suffix, exts=IMAGE_EXTS):
+    """폴더를 한 번만 훑어서 {샘플 id: 파일명} (예: 000012_th.png → '000012')"""
+    files = {}
+    if not os.path.isdir(modality_dir):
+        return files
+    for entry in os.scandir(modality_dir):
+        stem, ext = os.path.splitext(entry.name)
+        if entry.is_file() and ext.lower() in exts and stem.endswith(suffix):
+            files[stem[:-len(suffix)]] = entry.name
+    return files
+
+
+def rename_multimodal_dataset(base_dir, start_index=1, dry_run=False):
     """
-    멀티모달 데이터셋 전체 리네임 (visual, thermal, nvg 모두)
+    멀티모달 데이터셋 전체 리네임 (visual, thermal, nvg + labels 를 샘플 id 기준으로 한 번에)
+    
+    모든 모달리티에 있는 샘플 id(교집합)만 새 번호를 받고, 일부 모달리티에만 있는 파일(orphan)은
+    번호가 어긋나지 않도록 orphans/<모달리티>/ 로 옮긴다. 전체를 저널 1개로 한 번에 처리한다.
     
     Args:
-        base_dir: 상위 폴더 경로 (visual, thermal, nvg 포함)
+        base_dir: 상위 폴더 경로 (visual, thermal, nvg, labels 포함)
         start_index: 시작 인덱스
+        dry_run: True면 계획만 출력하고 파일은 건드리지 않음
     """
     base_path = Path(base_dir)
-    
-    modalities = {
-        'visual': '_v',
-        'thermal': '_th',
-        'nvg': '_n'
-    }
+    labels_dir = base_path / 'labels'
+    orphan_dir = base_path / 'orphans'
     
     print("=== 멀티모달 데이터셋 리네임 ===")
     print(f"Base directory: {base_dir}")
     print()
     
-    for modality, suffix in modalities.items():
+    # 모달리티별 샘플 id 인덱스 (폴더당 한 번만 스캔)
+    index = {}
+    for modality, suffix in MODALITIES.items():
         modality_dir = base_path / modality
         if modality_dir.exists():
-            print(f"\n--- {modality.upper()} 처리 중 ---")
-            rename_dataset(str(modality_dir), start_index, suffix)
+            index[modality] = scan_modality(modality_dir, suffix)
+            print(f"  {modality}: {len(index[modality])}개")
         else:
             print(f"Warning: {modality} 폴더가 존재하지 않습니다.")
+    labels = scan_modality(labels_dir, MODALITIES['visual'], ('.txt',))
+    print(f"  labels: {len(labels)}개")
+    
+    if not index:
+        print("Error: 모달리티 폴더가 없습니다.")
+        return
+    
+    # 모든 모달리티에 있는 샘플만 번호 부여
+    common = sorted(set.intersection(*(set(files) for files in index.values())))
+    if not common:
+        print("Error: 모든 모달리티에 공통으로 있는 샘플이 없습니다.")
+        return
+    common_set = set(common)
+    
+    plan = []
+    new_ids = {}
+    for i, sample_id in enumerate(common, start_index):
+        new_id = f"{i:06d}"
+        new_ids[sample_id] = new_id
+        for modality, files in index.items():
+            name = files[sample_id]
+            ext = os.path.splitext(name)[1]
+            plan.append((base_path / modality / name, base_path / modality / f"{new_id}{MODALITIES[modality]}{ext}"))
+        if sample_id in labels:
+            plan.append((labels_dir / labels[sample_id], labels_dir / f"{new_id}_v.txt"))
+    
+    # orphan: 일부 모달리티에만 있는 파일 → orphans/<모달리티>/
+    orphans = {}
+    for modality, files in list(index.items()) + [('labels', labels)]:
+        src_dir = labels_dir if modality == 'labels' else base_path / modality
+        missing = sorted(set(files) - common_set)
+        orphans[modality] = missing
+        for sample_id in missing:
+            plan.append((src_dir / files[sample_id], orphan_dir / modality / files[sample_id]))
+    
+    if not dry_run:
+        for modality, missing in orphans.items():
+            if missing:
+                (orphan_dir / modality).mkdir(parents=True, exist_ok=True)
+    
+    start = time.perf_counter()
+    renamed = execute_plan(plan, str(base_path / JOURNAL_NAME), dry_run)
+    elapsed = time.perf_counter() - start
+    
+    # 결과 출력
+    print(f"\n=== {'리네임 계획 (dry-run, 변경 없음)' if dry_run else '리네임 완료'} ===")
+    print(f"공통 샘플 {len(common)}개, 이름 변경 {renamed}개 (orphan 이동 포함), {elapsed:.2f}s")
+    print("\n변경 내역:")
+    print_plan([(sample_id, new_ids[sample_id], '✓' if sample_id in labels else '✗ (no label)')
+                for sample_id in common])
+    
+    if any(orphans.values()):
+        print(f"\n⚠️  orphan (일부 모달리티에만 있음) → {orphan_dir}")
+        for modality, missing in orphans.items():
+            if missing:
+                preview = ', '.join(missing[:5]) + (' ...' if len(missing) > 5 else '')
+                print(f"  {modality}: {len(missing)}개 ({preview})")
+    
+    last_index = start_index + len(common) - 1
+    print(f"\n최종 인덱스: {last_index}")
+    print(f"다음 데이터셋 추가 시 시작 인덱스: {last_index + 1}")
 
 
 if __name__ == '__main__':
@@ -152,15 +335,26 @@ if __name__ == '__main__':
         print("  2. 멀티모달 (visual, thermal, nvg 모두):")
         print("     python rename_dataset.py <base_dir> [start_index] --multimodal")
         print("     예: python rename_dataset.py data/20251029_Takistan_1200 1 --multimodal")
+        print()
+        print("  옵션:")
+        print("     --dry-run   변경 계획만 출력")
+        print("     --resume    중단된 리네임을 끝까지 진행 (<dataset_dir>의 저널 사용)")
+        print("     --rollback  중단된 리네임을 원래 이름으로 되돌림")
         sys.exit(1)
     
-    dataset_dir = sys.argv[1]
-    start_index = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    flags = {a for a in sys.argv[1:] if a.startswith('--')}
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    dataset_dir = args[0]
+    start_index = int(args[1]) if len(args) > 1 else 1
+    dry_run = '--dry-run' in flags
     
-    if '--multimodal' in sys.argv:
+    if '--resume' in flags or '--rollback' in flags:
+        # 중단된 리네임 복구
+        recover(os.path.join(dataset_dir, JOURNAL_NAME), rollback='--rollback' in flags)
+    elif '--multimodal' in flags:
         # 멀티모달 모드
-        rename_multimodal_dataset(dataset_dir, start_index)
+        rename_multimodal_dataset(dataset_dir, start_index, dry_run)
     else:
         # 단일 모달리티 모드
-        suffix = sys.argv[3] if len(sys.argv) > 3 else '_v'
-        rename_dataset(dataset_dir, start_index, suffix)
+        suffix = args[2] if len(args) > 2 else '_v'
+        rename_dataset(dataset_dir, start_index, suffix, dry_run)
@@ -0,0 +1,218 @@
+"""
+멀티모달 세션 인덱스 (session_index.json)
+- 샘플 id → 모달리티별 파일명/이미지 크기, 라벨 유무/박스 수
+- 한 번 만들어 두면 각 스크립트는 glob / os.path.exists 없이 인덱스만 조회
+  (네트워크 드라이브(E:)에서 파일마다 stat 하는 비용 제거)
+- 갱신은 mtime 기준 증분: 폴더 mtime이 그대로면 그 폴더는 목록도 읽지 않고,
+  바뀐 폴더는 목록을 한 번 읽어 mtime/크기가 바뀐 파일만 다시 읽음
+  (파일 추가/삭제/이름 변경은 폴더 mtime이 바뀌지만 기존 파일 내용만 덮어쓴 경우는 아니므로 그때는 --full)
+
+세션 폴더 구조: <root>/visual/{id}_v.png, thermal/{id}_th.png, nvg/{id}_nv.png, labels/{id}_v.txt
+    visual / labels는 접미사 없는 파일({id}.png, {id}.txt)도 파일 이름 그대로 id로 사용 (기존 라벨러와 동일)
+
+사용 예:
+    python session_index.py output/20251029_Takistan_1400_Taleban_2
+    python session_index.py data/20251029_Takistan_1400_Taleban_2 --full
+"""
+
+import os
+import json
+import time
+import argparse
+
+INDEX_NAME = 'session_index.json'
+INDEX_VERSION = 2       # 형식/스캔 규칙이 바뀌면 올림 → 이전 인덱스는 버리고 다시 만듦
+MODALITIES = {'visual': '_v', 'thermal': '_th', 'nvg': '_nv'}
+LABEL_DIR = 'labels'
+LABEL_SUFFIX = '_v'
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+def image_size(path):
+    """이미지 (w, h) - 헤더만 읽음 (pillow가 없으면 cv2로 디코딩)"""
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return list(img.size)
+    except ImportError:
+        import cv2
+        img = cv2.imread(path)
+        return [img.shape[1], img.shape[0]] if img is not None else None
+    except OSError:
+        return None
+
+
+def count_boxes(path):
+    """YOLO 라벨 파일의 박스 수"""
+    with open(path, 'r') as f:
+        return sum(1 for line in f if len(line.split()) == 5)
+
+
+class SessionIndex:
+    """
+    세션 인덱스
+
+    Args:
+        root: 세션 폴더 (visual/thermal/nvg/labels의 상위 폴더)
+        path: 인덱스 파일 경로 (기본: <root>/session_index.json)
+    """
+
+    def __init__(self, root, path=None):
+        self.root = root
+        self.index_path = path or os.path.join(root, INDEX_NAME)
+        self.dirs = {}      # 폴더 이름 -> 마지막 스캔 시 폴더 mtime
+        self.files = {}     # 폴더 이름 -> {샘플 id: {'name', 'mtime', 'bytes', 'size' 또는 'boxes'}}
+        self.dirty = False
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.dirs = data.get('dirs', {})
+                self.files = data.get('files', {})
+
+    # ---- 갱신 ----
+
+    def _scan_dir(self, name, suffix, exts, full, bare=False):
+        """
+        폴더 1개 증분 갱신 → 다시 읽은 파일 수 (폴더가 그대로면 -1, 폴더가 없으면 None)
+
+        bare=True면 접미사가 없는 파일도 파일 이름 그대로 id로 사용 (같은 id의 접미사 파일이 있으면 그쪽 우선)
+        """
+        dir_path = os.path.join(self.root, name)
+        if not os.path.isdir(dir_path):
+            if name in self.files:
+                del self.files[name]
+                self.dirs.pop(name, None)
+                self.dirty = True
+            return None
+        dir_mtime = os.stat(dir_path).st_mtime
+        if not full and self.dirs.get(name) == dir_mtime and name in self.files:
+            return -1
+
+        old = self.files.get(name, {})
+        new = {}
+        changed = 0
+        entries = {}
+        for entry in os.scandir(dir_path):
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() not in exts or not entry.is_file():
+                continue
+            if stem.endswith(suffix):
+                entries[stem[:-len(suffix)]] = entry    # 접미사 파일이 같은 id의 접미사 없는 파일보다 우선
+            elif bare:
+                entries.setdefault(stem, entry)
+        for sample_id, entry in entries.items():
+            st = entry.stat()
+            rec = old.get(sample_id)
+            if rec and rec['name'] == entry.name and rec['mtime'] == st.st_mtime and rec['bytes'] == st.st_size:
+                new[sample_id] = rec
+                continue
+            rec = {'name': entry.name, 'mtime': st.st_mtime, 'bytes': st.st_size}
+            if name == LABEL_DIR:
+                rec['boxes'] = count_boxes(entry.path)
+            else:
+                rec['size'] = image_size(entry.path)
+            new[sample_id] = rec
+            changed += 1
+        self.files[name] = new
+        self.dirs[name] = dir_mtime
+        self.dirty = True
+        return changed + (len(old.keys() - new.keys()))
+
+    def update(self, full=False):
+        """
+        인덱스 증분 갱신
+
+        Args:
+            full: True면 폴더 mtime과 상관없이 모든 폴더 목록을 다시 읽음
+        Returns: {폴더 이름: 다시 읽은 파일 수 (-1이면 건너뜀, None이면 폴더 없음)}
+        """
+        stats = {}
+        for modality, suffix in MODALITIES.items():
+            stats[modality] = self._scan_dir(modality, suffix, IMAGE_EXTS, full, bare=modality == 'visual')
+        stats[LABEL_DIR] = self._scan_dir(LABEL_DIR, LABEL_SUFFIX, ('.txt',), full, bare=True)
+        return stats
+
+    def save(self):
+        """변경된 경우에만 저장 (임시 파일에 쓰고 교체)"""
+        if not self.dirty:
+            return
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'dirs': self.dirs, 'files': self.files}, f)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    # ---- 조회 (파일 시스템 접근 없음) ----
+
+    def modalities(self):
+        """인덱스에 있는 모달리티 목록"""
+        return [m for m in MODALITIES if m in self.files]
+
+    def ids(self, modalities=None, require_label=False):
+        """주어진 모달리티(기본: visual)에 모두 있는 샘플 id (정렬)"""
+        modalities = modalities or ['visual']
+        sets = [set(self.files.get(m, {})) for m in modalities]
+        if require_label:
+            sets.append(set(self.files.get(LABEL_DIR, {})))
+        return sorted(set.intersection(*sets)) if sets else []
+
+    def all_ids(self):
+        """어느 모달리티에든 있는 샘플 id (정렬)"""
+        return sorted(set().union(*(self.files.get(m, {}) for m in MODALITIES)))
+
+    def record(self, sample_id, modality):
+        return self.files.get(modality, {}).get(sample_id)
+
+    def path(self, sample_id, modality):
+        """모달리티 파일 경로 (없으면 None)"""
+        rec = self.record(sample_id, modality)
+        return os.path.join(self.root, modality, rec['name']) if rec else None
+
+    def size(self, sample_id, modality):
+        """이미지 (w, h) (없으면 None)"""
+        rec = self.record(sample_id, modality)
+        return tuple(rec['size']) if rec and rec.get('size') else None
+
+    def label_path(self, sample_id):
+        """라벨 파일 경로 (없으면 None)"""
+        return self.path(sample_id, LABEL_DIR)
+
+    def boxes(self, sample_id):
+        """라벨 박스 수 (라벨이 없으면 0)"""
+        rec = self.record(sample_id, LABEL_DIR)
+        return rec['boxes'] if rec else 0
+
+    def summary(self):
+        parts = [f"{m} {len(self.files[m])}개" for m in list(MODALITIES) + [LABEL_DIR] if m in self.files]
+        boxes = sum(r['boxes'] for r in self.files.get(LABEL_DIR, {}).values())
+        return ', '.join(parts) + f", 박스 {boxes}개"
+
+
+def load_index(root, update=True, full=False):
+    """인덱스 로드 (+ 증분 갱신 후 저장)"""
+    index = SessionIndex(root)
+    if update:
+        index.update(full)
+        index.save()
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='멀티모달 세션 인덱스 생성/갱신')
+    parser.add_argument('root', help='세션 폴더 (visual/thermal/nvg/labels 상위 폴더)')
+    parser.add_argument('--full', action='store_true', help='폴더 mtime과 상관없이 전체 다시 스캔')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SessionIndex(args.root)
+    stats = index.update(args.full)
+    index.save()
+    print(f"✅ 인덱스 갱신: {index.index_path} ({time.perf_counter() - start:.2f}s)")
+    for name, n in stats.items():
+        if n is not None:
+            print(f"  {name}: {'변경 없음 (건너뜀)' if n < 0 else f'{n}개 파일 다시 읽음'}")
+    print(f"  {index.summary()}")
+    ids = index.ids(index.modalities()) if index.modalities() else []
+    orphans = len(index.all_ids()) - len(ids)
+    print(f"  모든 모달리티에 있는 샘플: {len(ids)}개" + (f", 일부 모달리티에만 있는 샘플: {orphans}개" if orphans else ''))
@@ -2,109 +2,228 @@ from ultralytics import YOLO
 import cv2
 import glob
 import os
+import sys
+import time
+import queue
+import threading
 import numpy as np
 
 # 테스트할 thermal 이미지 폴더 경로
 thermal_dir = r"output\20251029_Takistan_1400_Taleban_2\thermal"
 
-if not os.path.exists(thermal_dir):
-    print(f"❌ 경로를 찾을 수 없습니다: {thermal_dir}")
-    exit()
-
 # 출력 폴더
 output_dir = os.path.join('output', 'test_thermal_detection')
-os.makedirs(output_dir, exist_ok=True)
-
-# YOLO 모델 로드
-print("YOLO 모델 로드 중..." )
-model = YOLO('model/yolov9e.pt')
-model.to('cuda')
-
-# Thermal 이미지 파일 목록
-image_paths = glob.glob(os.path.join(thermal_dir, '*.*'))
-image_paths = [p for p in image_paths if p.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))]
-image_paths.sort()
-
-print(f"총 {len(image_paths)}개의 thermal 이미지 탐지 중...\n")
-
-# 시각화된 이미지들을 저장할 리스트
-viz_images = []
-
-for idx, img_path in enumerate(image_paths):
-    print(f"[{idx+1}/{len(image_paths)}] Processing: {os.path.basename(img_path)}")
-    
-    # 이미지 읽기
-    img = cv2.imread(img_path)
-    if img is None:
-        print(f"  ⚠️ 이미지를 읽을 수 없습니다: {img_path}")
-        continue
-    
-    # YOLO 탐지
-    results = model(img_path)
-    
-    # 결과 처리
-    for r in (results if isinstance(results, list) else [results]):
-        # person(class 0)만 필터링
-        person_indices = (r.boxes.cls == 0).cpu().numpy()
-        person_boxes = r.boxes[person_indices]
-        
-        # 탐지된 person 수
-        num_persons = len(person_boxes)
-        
-        # 박스 그리기
-        for box in person_boxes:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-            conf = box.conf[0].cpu().numpy()
-            
-            # 바운딩 박스
-            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            
-            # 신뢰도 표시
-            label = f'person {conf:.2f}'
-            cv2.putText(img, label, (x1, y1-10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        
-        # 상단에 통계 표시
-        stats_text = f'Detected: {num_persons} persons | Image: {idx+1}/{len(image_paths)}'
-        cv2.putText(img, stats_text, (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-        
-        print(f"  ✅ {num_persons}명 탐지됨")
-    
-    # 시각화 이미지 저장
-    viz_images.append(img.copy())
-    
+
+# 탐지 설정 (person만 모델 내부 NMS 단계에서 남김)
+PERSON_CLASSES = [0]    # COCO class 0 = person
+CONF = 0.25
+IOU = 0.7
+MAX_DET = 300
+
+# 스트리밍 파이프라인 설정
+# 읽기 → 추론 → 그리기/PNG 저장 → 동영상 인코딩 단계가 동시에 돌고,
+# 단계 사이 큐 크기로 메모리에 올라가는 프레임 수를 제한 (전체 프레임을 모아 두지 않음)
+QUEUE_SIZE = 8
+SAVE_PNG = True         # 개별 시각화 이미지 저장 여부
+FPS = 1 / 0.3           # 동영상 FPS (0.3초 = 약 3.33 fps)
+
+_STOP = object()  # 파이프라인 종료 표시
+
+
+def peak_rss_mb():
+    """프로세스 최대 메모리 사용량(MB). 측정할 수 없으면 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # 리눅스는 KB, macOS는 byte 단위
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        return getattr(mem, 'peak_wset', mem.rss) / 1024 / 1024  # Windows는 peak_wset
+    except ImportError:
+        return None
+
+
+def run_stage(fn, in_q, out_q, errors):
+    """스레드 1개 단계: in_q에서 꺼내 fn 처리 후 out_q로 전달 (fn이 None을 반환하면 건너뜀)
+
+    fn에서 예외가 나면 errors에 기록하고, 앞 단계가 막히지 않도록 _STOP까지 in_q를 비움
+    (뒤 단계에는 항상 _STOP 전달 → 메인 스레드가 join에서 멈추지 않음)
+    """
+    try:
+        while True:
+            item = in_q.get()
+            if item is _STOP:
+                return
+            out = fn(item)
+            if out is not None and out_q is not None:
+                out_q.put(out)
+    except Exception as e:
+        errors.append(e)
+        while in_q.get() is not _STOP:
+            pass
+    finally:
+        if out_q is not None:
+            out_q.put(_STOP)
+
+
+def read_images(image_paths, out_q, errors):
+    """이미지 읽기 단계 (다른 단계에서 오류가 나면 남은 이미지는 읽지 않음)"""
+    try:
+        for idx, img_path in enumerate(image_paths):
+            if errors:
+                break
+            img = cv2.imread(img_path)
+            if img is None:
+                print(f"  ⚠️ 이미지를 읽을 수 없습니다: {img_path}")
+                continue
+            out_q.put((idx, img_path, img))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        out_q.put(_STOP)
+
+
+def draw_detections(item, total):
+    """박스/통계 그리기 + 개별 이미지 저장 단계"""
+    idx, img_path, img, boxes_xyxy, confs = item
+
+    # 박스 그리기
+    for (x1, y1, x2, y2), conf in zip(boxes_xyxy, confs):
+        # 바운딩 박스
+        cv2.rectangle(img, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+
+        # 신뢰도 표시
+        label = f'person {conf:.2f}'
+        cv2.putText(img, label, (int(x1), int(y1)-10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    # 상단에 통계 표시
+    stats_text = f'Detected: {len(boxes_xyxy)} persons | Image: {idx+1}/{total}'
+    cv2.putText(img, stats_text, (10, 30),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+
     # 개별 이미지도 저장
-    output_path = os.path.join(output_dir, f'{idx:04d}_{os.path.basename(img_path)}')
-    cv2.imwrite(output_path, img)
-
-print(f"\n✅ 탐지 완료! 총 {len(viz_images)}장 처리됨")
-
-# 동영상 생성
-if len(viz_images) > 0:
-    print("\n동영상 생성 중...")
-    
-    # 첫 번째 이미지 크기 기준
-    height, width = viz_images[0].shape[:2]
-    
-    # 동영상 설정 (0.3초 = 약 3.33 fps)
-    fps = 1 / 0.3  # 3.33 fps
+    if SAVE_PNG:
+        output_path = os.path.join(output_dir, f'{idx:04d}_{os.path.basename(img_path)}')
+        cv2.imwrite(output_path, img)
+    return img
+
+
+class VideoSink:
+    """동영상 인코딩 단계 (첫 프레임 크기로 VideoWriter 생성)"""
+
+    def __init__(self, video_path, fps):
+        self.video_path = video_path
+        self.fps = fps
+        self.writer = None
+        self.frames = 0
+
+    def __call__(self, img):
+        if self.writer is None:
+            height, width = img.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.writer = cv2.VideoWriter(self.video_path, fourcc, self.fps, (width, height))
+        self.writer.write(img)
+        self.frames += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+def main():
+    if not os.path.exists(thermal_dir):
+        print(f"❌ 경로를 찾을 수 없습니다: {thermal_dir}")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+
+    # YOLO 모델 로드
+    print("YOLO 모델 로드 중..." )
+    model = YOLO('model/yolov9e.pt')
+    model.to('cuda')
+
+    # Thermal 이미지 파일 목록
+    image_paths = glob.glob(os.path.join(thermal_dir, '*.*'))
+    image_paths = [p for p in image_paths if p.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))]
+    image_paths.sort()
+    total = len(image_paths)
+
+    print(f"총 {total}개의 thermal 이미지 탐지 중...\n")
+
+    read_q = queue.Queue(QUEUE_SIZE)
+    draw_q = queue.Queue(QUEUE_SIZE)
+    video_q = queue.Queue(QUEUE_SIZE)
     video_path = os.path.join(output_dir, 'thermal_detection_result.mp4')
-    
-    # VideoWriter 설정
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video_writer = cv2.VideoWriter(video_path, fourcc, fps, (width, height))
-    
-    for img in viz_images:
-        video_writer.write(img)
-    
-    video_writer.release()
-    print(f"✅ 동영상 저장 완료: {video_path}")
-    print(f"   - 프레임 수: {len(viz_images)}장")
-    print(f"   - FPS: {fps:.2f}")
-    print(f"   - 재생 시간: {len(viz_images) * 0.3:.1f}초")
-else:
-    print("❌ 처리된 이미지가 없어 동영상을 생성할 수 없습니다.")
-
-print(f"\n📁 결과 폴더: {output_dir}")
-print(f"   시각화 이미지와 동영상이 저장되었습니다.")
+    video = VideoSink(video_path, FPS)
+    errors = []  # 단계 스레드/추론에서 난 예외 (읽기 중단 신호 겸용, join 후 다시 발생시킴)
+    threads = [
+        threading.Thread(target=read_images, args=(image_paths, read_q, errors), daemon=True),
+        threading.Thread(target=run_stage, args=(lambda item: draw_detections(item, total), draw_q, video_q, errors),
+                         daemon=True),
+        threading.Thread(target=run_stage, args=(video, video_q, None, errors), daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    # 추론 단계 (메인 스레드)
+    start = time.perf_counter()
+    infer_time = 0.0
+    item = None
+    try:
+        # 단계 스레드에서 오류가 나면 남은 프레임은 추론하지 않고 바로 중단
+        while not errors:
+            item = read_q.get()
+            if item is _STOP:
+                break
+            idx, img_path, img = item
+            print(f"[{idx+1}/{total}] Processing: {os.path.basename(img_path)}")
+
+            # YOLO 탐지
+            t0 = time.perf_counter()
+            r = model(img, classes=PERSON_CLASSES, conf=CONF, iou=IOU, max_det=MAX_DET, verbose=False)[0]
+            infer_time += time.perf_counter() - t0
+
+            # classes=[0]으로 추론했으므로 박스는 모두 person
+            boxes_xyxy = r.boxes.xyxy.cpu().numpy().astype(int)
+            confs = r.boxes.conf.cpu().numpy()
+            print(f"  ✅ {len(boxes_xyxy)}명 탐지됨")
+            draw_q.put((idx, img_path, img, boxes_xyxy, confs))
+    except BaseException as e:
+        errors.append(e)  # 읽기 스레드 중단
+        raise
+    finally:
+        # 추론이 중간에 끝나도 읽기 스레드가 put에서 막히지 않도록 _STOP까지 비우고,
+        # 그리기/인코딩 단계를 끝내서 동영상을 정상적으로 닫음 (moov atom 기록)
+        while item is not _STOP:
+            item = read_q.get()
+        draw_q.put(_STOP)
+        for t in threads:
+            t.join()
+        video.close()
+    if errors:
+        raise errors[0]
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✅ 탐지 완료! 총 {video.frames}장 처리됨")
+    if video.frames > 0:
+        print(f"✅ 동영상 저장 완료: {video_path}")
+        print(f"   - 프레임 수: {video.frames}장")
+        print(f"   - FPS: {FPS:.2f}")
+        print(f"   - 재생 시간: {video.frames * 0.3:.1f}초")
+        print(f"⏱️ 처리 속도: {video.frames / elapsed:.2f} frames/s (추론만: {video.frames / infer_time:.2f} frames/s)")
+    else:
+        print("❌ 처리된 이미지가 없어 동영상을 생성할 수 없습니다.")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"   - 최대 메모리(peak RSS): {peak:.0f} MB")
+
+    print(f"\n📁 결과 폴더: {output_dir}")
+    print(f"   시각화 이미지와 동영상이 저장되었습니다.")
+
+
+if __name__ == '__main__':
+    main()
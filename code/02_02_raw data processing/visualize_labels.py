@@ -1,8 +1,11 @@
 import cv2
 import os
-import glob
-from concurrent.futures import ThreadPoolExecutor
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
+from session_index import load_index
 
 folder_name = '20251029_Takistan_12 00_Taleban'  # output\ 빼고 폴더명만
 output_dir = os.path.join('output', folder_name)
@@ -15,151 +18,234 @@ label_dir = os.path.join(output_dir, 'labels')
 
 # 시각화 결과 저장 폴더
 viz_dir = os.path.join('output', 'visualization', folder_name)
-os.makedirs(os.path.join(viz_dir, 'visual'), exist_ok=True)
-os.makedirs(os.path.join(viz_dir, 'thermal'), exist_ok=True)
-if os.path.exists(nvg_dir):
-    os.makedirs(os.path.join(viz_dir, 'nvg'), exist_ok=True)
+
+FPS = 1 / 0.3          # 동영상 FPS (0.3초 = 약 3.33 fps)
+SAVE_PNG = False       # True면 시각화 PNG도 저장 (동영상은 항상 프레임에서 바로 인코딩)
+WORKERS = os.cpu_count() or 1
+BACKEND = 'thread'     # 'thread' 또는 'process' (process는 GIL 영향 없음, 대신 프레임을 프로세스 간 복사)
+CHUNKSIZE = 4          # 작업 1개에 묶는 샘플 수 (작업 제출/결과 전달 오버헤드 감소)
+
+
+def box_corners(boxes, w, h):
+    """정규화 YOLO 박스 (N, 5) → 픽셀 (N, 4) [x1, y1, x2, y2], 모든 박스를 한 번에 변환
+
+    박스별 int() 변환(0 방향 절삭)과 같은 결과
+    """
+    x_center_px = np.trunc(boxes[:, 1] * w)
+    y_center_px = np.trunc(boxes[:, 2] * h)
+    box_w = np.trunc(boxes[:, 3] * w)
+    box_h = np.trunc(boxes[:, 4] * h)
+    return np.stack([np.trunc(x_center_px - box_w / 2), np.trunc(y_center_px - box_h / 2),
+                     np.trunc(x_center_px + box_w / 2), np.trunc(y_center_px + box_h / 2)], axis=1).astype(int)
+
 
 def draw_boxes(img, boxes):
-    """박스를 그리는 함수 (numpy 배열로 한 번에 처리)"""
-    for box in boxes:
-        cls, x_center, y_center, width, height = box
-        h, w = img.shape[:2]
-        
-        x_center_px = int(x_center * w)
-        y_center_px = int(y_center * h)
-        box_w = int(width * w)
-        box_h = int(height * h)
-        
-        x1 = int(x_center_px - box_w / 2)
-        y1 = int(y_center_px - box_h / 2)
-        x2 = int(x_center_px + box_w / 2)
-        y2 = int(y_center_px + box_h / 2)
-        
+    """박스를 그리는 함수 (좌표 변환은 numpy 배열로 한 번에 처리)"""
+    if boxes.size == 0:
+        return img
+    h, w = img.shape[:2]
+    for x1, y1, x2, y2 in box_corners(boxes, w, h).tolist():
         cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        cv2.putText(img, 'person', (x1, y1-10), 
+        cv2.putText(img, 'person', (x1, y1-10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
     return img
 
-def process_single_label(label_path):
-    """단일 라벨 파일 처리"""
+
+def default_session():
+    """모듈 설정의 폴더 경로 (프로세스 풀 작업에 그대로 넘길 수 있는 dict)"""
+    return {'visual': visual_dir, 'thermal': thermal_dir, 'nvg': nvg_dir, 'viz': viz_dir}
+
+
+def sample_paths(label_path, session):
+    """라벨 파일 → {모달리티: (이미지 경로, 시각화 파일명)}"""
     label_name = os.path.basename(label_path)
     base_name = os.path.splitext(label_name)[0]  # 예: 000001_v
-    
+
     # base_name에서 숫자만 추출 (000001_v -> 000001)
     if base_name.endswith('_v'):
         base_num = base_name[:-2]
     else:
         base_num = base_name
-    
+
     # 이미지 경로들
-    visual_path = os.path.join(visual_dir, f'{base_name}.png')
-    thermal_path = os.path.join(thermal_dir, f'{base_num}_th.png')
-    nvg_path = os.path.join(nvg_dir, f'{base_num}_nv.png')
-    
+    return {
+        'visual': (os.path.join(session['visual'], f'{base_name}.png'), f'{base_name}.png'),
+        'thermal': (os.path.join(session['thermal'], f'{base_num}_th.png'), f'{base_num}_th.png'),
+        'nvg': (os.path.join(session['nvg'], f'{base_num}_nv.png'), f'{base_num}_nv.png'),
+    }
+
+
+def index_paths(index, sample_id):
+    """세션 인덱스에서 {모달리티: (이미지 경로, 시각화 파일명)} (있는 모달리티만, 파일 시스템 접근 없음)"""
+    paths = {}
+    for mode in ('visual', 'thermal', 'nvg'):
+        img_path = index.path(sample_id, mode)
+        if img_path is not None:
+            paths[mode] = (img_path, os.path.basename(img_path))
+    return paths
+
+
+def render_sample(label_path, session, save_png=SAVE_PNG, paths=None):
+    """
+    샘플 1개의 모달리티별 이미지를 읽어 박스를 그림
+
+    paths가 있으면(세션 인덱스) 그 경로만 사용하고, 없으면 파일명 규칙으로 찾아서 존재 여부 확인
+
+    Returns: {모달리티: 박스가 그려진 이미지} (이미지가 없는 모달리티는 제외)
+    """
     # 라벨 읽기 (numpy로 한 번에)
     try:
         boxes = np.loadtxt(label_path, ndmin=2)
     except:
-        return 0
-    
-    count = 0
-    
-    # Visual 이미지 처리
-    if os.path.exists(visual_path):
-        img = cv2.imread(visual_path)
-        if img is not None:
-            img = draw_boxes(img, boxes)
-            cv2.imwrite(os.path.join(viz_dir, 'visual', f'{base_name}.png'), img)
-            count += 1
-    
-    # Thermal 이미지 처리
-    if os.path.exists(thermal_path):
-        img = cv2.imread(thermal_path)
-        if img is not None:
-            img = draw_boxes(img, boxes)
-            cv2.imwrite(os.path.join(viz_dir, 'thermal', f'{base_num}_th.png'), img)
-            count += 1
-    
-    # NVG 이미지 처리 (있을 경우만)
-    if os.path.exists(nvg_dir) and os.path.exists(nvg_path):
-        img = cv2.imread(nvg_path)
-        if img is not None:
-            img = draw_boxes(img, boxes)
-            cv2.imwrite(os.path.join(viz_dir, 'nvg', f'{base_num}_nv.png'), img)
-            count += 1
-    
-    return count
-
-# 라벨 파일 읽기
-label_files = glob.glob(os.path.join(label_dir, '*.txt'))
-print(f'총 {len(label_files)}개의 라벨 파일 처리 중...')
-
-# 병렬 처리 (CPU 코어 수만큼 스레드 사용)
-with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-    results = list(executor.map(process_single_label, label_files))
-
-print(f'\n시각화 완료! 결과는 output/visualization/{folder_name}/ 폴더에 저장되었습니다.')
-visual_count = len(glob.glob(os.path.join(viz_dir, "visual", "*.png")))
-thermal_count = len(glob.glob(os.path.join(viz_dir, "thermal", "*.png")))
-print(f'Visual: {visual_count}장')
-print(f'Thermal: {thermal_count}장')
-if os.path.exists(nvg_dir):
-    nvg_count = len(glob.glob(os.path.join(viz_dir, "nvg", "*.png")))
-    print(f'NVG: {nvg_count}장')
-else:
-    print('NVG: 없음 (주간 데이터)')
-
-# 동영상 생성
-print('\n동영상 생성 중...')
-
-def create_video(image_dir, output_path, fps=1/0.3):
-    """이미지들을 동영상으로 변환"""
-    image_files = sorted(glob.glob(os.path.join(image_dir, '*.png')))
-    
-    if len(image_files) == 0:
-        return False
-    
-    # 첫 번째 이미지로 크기 확인
-    first_img = cv2.imread(image_files[0])
-    if first_img is None:
-        return False
-    
-    height, width = first_img.shape[:2]
-    
-    # VideoWriter 설정
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video_writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    
-    for img_path in image_files:
+        return {}
+
+    frames = {}
+    for mode, (img_path, viz_name) in (paths or sample_paths(label_path, session)).items():
+        # NVG는 있을 경우만 (야간 데이터)
+        if paths is None and not os.path.exists(img_path):
+            continue
         img = cv2.imread(img_path)
-        if img is not None:
-            video_writer.write(img)
-    
-    video_writer.release()
-    return True
-
-# Visual 동영상 생성
-if visual_count > 0:
-    visual_video_path = os.path.join(viz_dir, 'visual_detection.mp4')
-    if create_video(os.path.join(viz_dir, 'visual'), visual_video_path):
-        print(f'✅ Visual 동영상 생성: {visual_video_path}')
-        print(f'   - 프레임: {visual_count}장, 재생시간: {visual_count * 0.3:.1f}초')
-
-# Thermal 동영상 생성
-if thermal_count > 0:
-    thermal_video_path = os.path.join(viz_dir, 'thermal_detection.mp4')
-    if create_video(os.path.join(viz_dir, 'thermal'), thermal_video_path):
-        print(f'✅ Thermal 동영상 생성: {thermal_video_path}')
-        print(f'   - 프레임: {thermal_count}장, 재생시간: {thermal_count * 0.3:.1f}초')
-
-# NVG 동영상 생성 (있는 경우)
-if os.path.exists(nvg_dir):
-    nvg_count_for_video = len(glob.glob(os.path.join(viz_dir, 'nvg', '*.png')))
-    if nvg_count_for_video > 0:
-        nvg_video_path = os.path.join(viz_dir, 'nvg_detection.mp4')
-        if create_video(os.path.join(viz_dir, 'nvg'), nvg_video_path):
-            print(f'✅ NVG 동영상 생성: {nvg_video_path}')
-            print(f'   - 프레임: {nvg_count_for_video}장, 재생시간: {nvg_count_for_video * 0.3:.1f}초')
-
-print(f'\n📁 모든 작업 완료! 결과: output/visualization/{folder_name}/')
+        if img is None:
+            continue
+        img = draw_boxes(img, boxes)
+        if save_png:
+            cv2.imwrite(os.path.join(session['viz'], mode, viz_name), img)
+        frames[mode] = img
+    return frames
+
+
+def render_chunk(task):
+    """작업 1개 = 샘플 여러 개 (프로세스 풀에서 pickle 가능하도록 모듈 수준 함수)
+
+    샘플은 라벨 경로 또는 (라벨 경로, index_paths() 결과)
+    """
+    samples, session, save_png = task
+    frames = []
+    for sample in samples:
+        label_path, paths = sample if isinstance(sample, tuple) else (sample, None)
+        frames.append(render_sample(label_path, session, save_png, paths))
+    return frames
+
+
+def iter_ordered(executor, fn, items, window):
+    """
+    병렬 처리 결과를 입력 순서대로 반환 (재정렬 버퍼)
+
+    작업은 최대 window개까지만 미리 제출 → 메모리에 올라가는 프레임 수 제한
+    """
+    pending = deque()
+    items = iter(items)
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            break
+    while pending:
+        result = pending.popleft().result()
+        item = next(items, None)
+        if item is not None:
+            pending.append(executor.submit(fn, item))
+        yield result
+
+
+class VideoStreams:
+    """모달리티별 VideoWriter (첫 프레임 크기로 생성, 크기가 다른 프레임은 맞춰서 기록)"""
+
+    def __init__(self, out_dir, fps=FPS):
+        self.out_dir = out_dir
+        self.fps = fps
+        self.writers = {}
+        self.sizes = {}
+        self.counts = {}
+
+    def path(self, mode):
+        return os.path.join(self.out_dir, f'{mode}_detection.mp4')
+
+    def write(self, mode, img):
+        writer = self.writers.get(mode)
+        if writer is None:
+            height, width = img.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            writer = cv2.VideoWriter(self.path(mode), fourcc, self.fps, (width, height))
+            self.writers[mode] = writer
+            self.sizes[mode] = (width, height)
+            self.counts[mode] = 0
+        if (img.shape[1], img.shape[0]) != self.sizes[mode]:
+            img = cv2.resize(img, self.sizes[mode])
+        writer.write(img)
+        self.counts[mode] += 1
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.release()
+
+
+def render_session(label_files, save_png=SAVE_PNG, workers=WORKERS, fps=FPS,
+                   backend=BACKEND, chunksize=CHUNKSIZE, session=None, write_video=True):
+    """
+    라벨 파일들을 병렬로 읽고/그려서 모달리티별 동영상에 순서대로 바로 기록
+
+    Args:
+        label_files: 라벨 경로 또는 (라벨 경로, index_paths() 결과) 목록
+        backend: 'thread' 또는 'process'
+        chunksize: 작업 1개에 묶는 샘플 수
+        session: 폴더 경로 dict (None이면 default_session())
+        write_video: False면 동영상 인코딩 생략 (벤치마크용)
+    Returns: {모달리티: 프레임 수}
+    """
+    session = session or default_session()
+    modes = ['visual', 'thermal'] + (['nvg'] if os.path.exists(session['nvg']) else [])
+    os.makedirs(session['viz'], exist_ok=True)
+    if save_png:
+        for mode in modes:
+            os.makedirs(os.path.join(session['viz'], mode), exist_ok=True)
+
+    pool = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}[backend]
+    tasks = [(label_files[i:i + chunksize], session, save_png) for i in range(0, len(label_files), chunksize)]
+    streams = VideoStreams(session['viz'], fps)
+    counts = {}
+    with pool(max_workers=workers) as executor:
+        for chunk in iter_ordered(executor, render_chunk, tasks, window=workers * 2):
+            for frames in chunk:
+                for mode, img in frames.items():
+                    if write_video:
+                        streams.write(mode, img)
+                    counts[mode] = counts.get(mode, 0) + 1
+    streams.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='라벨 시각화 → 모달리티별 동영상')
+    parser.add_argument('--png', action='store_true', default=SAVE_PNG, help='시각화 PNG도 저장')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--backend', choices=['thread', 'process'], default=BACKEND)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--fps', type=float, default=FPS)
+    args = parser.parse_args()
+
+    # 라벨 있는 샘플 목록 (세션 인덱스, id 순서 = 동영상 프레임 순서)
+    index = load_index(output_dir)
+    label_files = [(index.label_path(i), index_paths(index, i)) for i in index.ids(['labels'])]
+    print(f'총 {len(label_files)}개의 라벨 파일 처리 중...')
+
+    start = time.perf_counter()
+    counts = render_session(label_files, args.png, args.workers, args.fps, args.backend, args.chunksize)
+    elapsed = time.perf_counter() - start
+
+    print(f'\n시각화 완료! 결과는 output/visualization/{folder_name}/ 폴더에 저장되었습니다.')
+    for mode, name in (('visual', 'Visual'), ('thermal', 'Thermal'), ('nvg', 'NVG')):
+        count = counts.get(mode, 0)
+        if count > 0:
+            print(f'✅ {name} 동영상 생성: {os.path.join(viz_dir, f"{mode}_detection.mp4")}')
+            print(f'   - 프레임: {count}장, 재생시간: {count / args.fps:.1f}초')
+        elif mode == 'nvg':
+            print('NVG: 없음 (주간 데이터)')
+    total = sum(counts.values())
+    if elapsed > 0:
+        print(f'\n⏱️ {elapsed:.1f}s, {total / elapsed:.1f} frames/s (PNG 저장: {"예" if args.png else "아니오"})')
+
+    print(f'\n📁 모든 작업 완료! 결과: output/visualization/{folder_name}/')
+
+
+if __name__ == '__main__':
+    main()
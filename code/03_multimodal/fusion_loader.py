@@ -0,0 +1,362 @@
+"""
+Early Fusion 9채널 데이터 로더
+- visual / thermal / nvg를 채널 축으로 이어 붙인 (H, W, 9) 입력 + YOLO 라벨
+- 입력: 세션 폴더(yolo9e_detect_only_person.py의 output, labels/<id>_v.txt) 또는 tensor_store.py 저장소
+    세션 폴더는 샘플마다 모달리티 3장을 스레드로 동시에 디코딩
+- 공간 증강은 샘플마다 무작위 affine 행렬 1개 (뒤집기/회전/스케일/전단/이동 + 출력 크기 맞춤을 합성)
+    → 9채널 이미지에 warpAffine 1번, 박스 전체는 모서리 좌표 행렬곱 1번 (모달리티별/박스별 호출 없음)
+- 배치는 워커 프로세스 풀에서 만들고 입력 순서대로 반환
+- 증강 난수는 (seed, epoch, 샘플 번호)로 정해짐 → 워커 수와 상관없이 재현 가능
+
+사용 예 (CPU 처리량 측정):
+    python fusion_loader.py output/20251029_Takistan_1400_Taleban_2 --workers 4 --batch 16 --batches 50
+    python fusion_loader.py store/Takistan_1400 --workers 8 --preview preview.png
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from tensor_store import MODALITIES, META_NAME, TensorStore
+
+# 세션 인덱스 (02_02_raw data processing/session_index.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '02_02_raw data processing'))
+from session_index import load_index
+
+SIZE = (640, 384)        # 출력 크기 (W, H)
+BATCH_SIZE = 16
+WORKERS = os.cpu_count() or 1
+PAD_VALUE = 114          # 변환 후 빈 영역 값
+MIN_BOX_AREA = 0.2       # 변환 후 화면 안에 남은 면적 비율이 이보다 작은 박스는 제거
+MIN_BOX_PX = 2           # 변환 후 폭/높이가 이보다 작은 박스는 제거
+
+# 공간 증강 (모든 모달리티와 박스에 같은 행렬 적용)
+AUGMENT = {
+    'flip': 0.5,             # 좌우 뒤집기 확률
+    'degrees': 5.0,          # 회전 ±
+    'scale': (0.75, 1.25),   # 스케일 범위
+    'shear': 2.0,            # 전단 ± (도)
+    'translate': 0.1,        # 이동 ± (출력 크기 대비)
+}
+
+
+def random_affine(rng, src_size, dst_size, augment):
+    """
+    원본 크기 → 출력 크기 변환 + 무작위 증강을 합성한 2x3 affine 행렬
+
+    augment가 None이면 출력 크기로 맞추는 변환만
+    """
+    (sw, sh), (dw, dh) = src_size, dst_size
+    # 원본 중심을 원점으로 → 출력 크기 비율로 축소/확대
+    C = np.array([[1, 0, -sw / 2], [0, 1, -sh / 2], [0, 0, 1]], dtype=np.float64)
+    S = np.diag([dw / sw, dh / sh, 1.0])
+    A = np.eye(3)
+    T = np.array([[1, 0, dw / 2], [0, 1, dh / 2], [0, 0, 1]], dtype=np.float64)
+
+    if augment:
+        if rng.random() < augment.get('flip', 0):
+            A = np.diag([-1.0, 1.0, 1.0]) @ A
+        angle = rng.uniform(-augment.get('degrees', 0), augment.get('degrees', 0))
+        scale = rng.uniform(*augment.get('scale', (1, 1)))
+        R = np.eye(3)
+        R[:2] = cv2.getRotationMatrix2D((0, 0), angle, scale)
+        shear = np.tan(np.radians(rng.uniform(-augment.get('shear', 0), augment.get('shear', 0), 2)))
+        Sh = np.array([[1, shear[0], 0], [shear[1], 1, 0], [0, 0, 1]], dtype=np.float64)
+        A = Sh @ R @ A
+        t = augment.get('translate', 0)
+        T[0, 2] += rng.uniform(-t, t) * dw
+        T[1, 2] += rng.uniform(-t, t) * dh
+
+    # 출력 픽셀 단위에서 증강 (스케일/회전 비율이 원본 크기와 무관)
+    return (T @ A @ S @ C)[:2]
+
+
+def transform_boxes(boxes, M, src_size, dst_size, min_area=MIN_BOX_AREA, min_px=MIN_BOX_PX):
+    """
+    정규화 YOLO 박스 (N, 5) 전체를 affine 행렬로 변환 → 출력 크기 기준 정규화 박스 (K, 5)
+
+    네 모서리를 한 번에 변환해 감싸는 사각형으로 만들고, 화면 밖으로 잘린 박스 정리
+    """
+    if len(boxes) == 0:
+        return np.zeros((0, 5), np.float32)
+    (sw, sh), (dw, dh) = src_size, dst_size
+    xc, yc, w, h = boxes[:, 1] * sw, boxes[:, 2] * sh, boxes[:, 3] * sw, boxes[:, 4] * sh
+    x1, y1, x2, y2 = xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2
+    corners = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                        np.stack([x2, y2], 1), np.stack([x1, y2], 1)], 1)   # (N, 4, 2)
+    pts = corners @ M[:, :2].T + M[:, 2]                                   # (N, 4, 2)
+
+    lo, hi = pts.min(axis=1), pts.max(axis=1)                              # (N, 2)
+    area = np.prod(hi - lo, axis=1)
+    lo = np.clip(lo, 0, [dw, dh])
+    hi = np.clip(hi, 0, [dw, dh])
+    size = hi - lo
+    keep = (size.min(axis=1) >= min_px) & (np.prod(size, axis=1) >= min_area * np.maximum(area, 1e-9))
+
+    out = np.empty((int(keep.sum()), 5), np.float32)
+    out[:, 0] = boxes[keep, 0]
+    out[:, 1:3] = (lo[keep] + hi[keep]) / 2 / [dw, dh]
+    out[:, 3:5] = size[keep] / [dw, dh]
+    return out
+
+
+class FusionDataset:
+    """
+    Early Fusion 샘플 (H, W, 3 * 모달리티 수) uint8 + 라벨
+
+    Args:
+        source: 세션 폴더 또는 tensor_store.py 저장소 폴더 (meta.json이 있으면 저장소)
+        modalities: 사용할 모달리티 (세션 폴더만 해당, None이면 세션에 있는 것 전부)
+        size: 출력 크기 (W, H)
+        augment: 증강 설정 dict (None이면 크기 맞춤만)
+        seed: 증강 난수 시드
+    """
+
+    def __init__(self, source, modalities=None, size=SIZE, augment=AUGMENT, seed=0):
+        self.size = tuple(size)
+        self.augment = augment
+        self.seed = seed
+        self.store = None
+        self.index = None
+        if os.path.exists(os.path.join(source, META_NAME)):
+            self.store = TensorStore(source)
+            self.modalities = list(self.store.modalities)
+            self.ids = self.store.ids
+        else:
+            # 인덱스가 없거나 오래됐으면 갱신 (메인 프로세스에서 먼저 저장되므로 워커는 폴더 mtime 확인만)
+            self.index = load_index(source)
+            self.modalities = list(modalities or [m for m in MODALITIES if m in self.index.modalities()])
+            self.ids = self.index.ids(self.modalities)
+            # 모달리티 동시 디코딩용 (cv2.imread는 GIL을 풀어 스레드로 병렬 처리됨)
+            self._reader = ThreadPoolExecutor(max_workers=max(1, len(self.modalities)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _read(self, sample_id, mode):
+        return cv2.imread(self.index.path(sample_id, mode), cv2.IMREAD_COLOR)
+
+    def load(self, i):
+        """증강 전 샘플 → (이미지 (H0, W0, C), 라벨 (k, 5))"""
+        if self.store is not None:
+            img, boxes = self.store[i]
+            return img, np.asarray(boxes)
+
+        sample_id = self.ids[i]
+        parts = list(self._reader.map(lambda mode: self._read(sample_id, mode), self.modalities))
+        for mode, img in zip(self.modalities, parts):
+            if img is None:
+                raise IOError(f'이미지를 읽을 수 없음: {self.index.path(sample_id, mode)}')
+        # 정합된 세트는 크기가 같지만, 다르면 visual(첫 모달리티) 크기에 맞춤
+        h, w = parts[0].shape[:2]
+        parts = [p if p.shape[:2] == (h, w) else cv2.resize(p, (w, h)) for p in parts]
+
+        if self.index.boxes(sample_id) == 0:
+            boxes = np.zeros((0, 5), np.float32)
+        else:
+            boxes = np.loadtxt(self.index.label_path(sample_id), ndmin=2, dtype=np.float32).reshape(-1, 5)
+        return np.concatenate(parts, axis=2), boxes
+
+    def get(self, i, epoch=0):
+        """증강된 샘플 → (이미지 (H, W, C) uint8, 라벨 (K, 5))"""
+        img, boxes = self.load(i)
+        src_size = (img.shape[1], img.shape[0])
+        rng = np.random.default_rng([self.seed, epoch, i])
+        M = random_affine(rng, src_size, self.size, self.augment)
+        # 모든 채널을 한 번에 변환 (cv2는 채널 수 제한 없이 처리)
+        out = cv2.warpAffine(np.ascontiguousarray(img), M, self.size, flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=(PAD_VALUE,) * 4)
+        if out.ndim == 2:
+            out = out[:, :, None]
+        return out, transform_boxes(boxes, M, src_size, self.size)
+
+    def __getitem__(self, i):
+        return self.get(i)
+
+
+def collate(samples):
+    """샘플 목록 → (이미지 (B, H, W, C) uint8, 라벨 (M, 6) [배치 내 번호, cls, xc, yc, w, h])"""
+    images = np.stack([img for img, _ in samples])
+    labels = [np.column_stack([np.full(len(b), j, np.float32), b]) for j, (_, b) in enumerate(samples)]
+    return images, (np.concatenate(labels) if labels else np.zeros((0, 6), np.float32))
+
+
+# ---- 워커 프로세스 ----
+
+_dataset = None
+
+
+def _init_worker(args):
+    """워커마다 데이터셋을 1번만 열어 둠 (메모리 맵/인덱스/디코딩 스레드 재사용)"""
+    global _dataset
+    cv2.setNumThreads(1)  # 프로세스 수만큼 이미 병렬이므로 cv2 내부 스레드는 끔
+    _dataset = FusionDataset(*args)
+
+
+def _load_batch(task):
+    epoch, indices = task
+    return collate([_dataset.get(i, epoch) for i in indices])
+
+
+class FusionLoader:
+    """
+    배치 단위 로더 (워커 프로세스 풀, 입력 순서대로 반환)
+
+    Args:
+        source, modalities, size, augment, seed: FusionDataset 인자
+        batch_size: 배치 크기
+        workers: 워커 프로세스 수 (0이면 현재 프로세스에서 처리)
+        shuffle: epoch마다 순서 섞기
+        drop_last: 마지막 덜 찬 배치 버림
+    """
+
+    def __init__(self, source, batch_size=BATCH_SIZE, workers=WORKERS, shuffle=True, drop_last=False,
+                 modalities=None, size=SIZE, augment=AUGMENT, seed=0):
+        self.args = (source, modalities, size, augment, seed)
+        self.dataset = FusionDataset(*self.args)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+        self.pool = None
+
+    def __len__(self):
+        n = len(self.dataset)
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+    def batches(self, epoch):
+        """epoch의 배치별 샘플 번호 목록"""
+        n = len(self.dataset)
+        order = np.random.default_rng([self.seed, epoch]).permutation(n) if self.shuffle else np.arange(n)
+        batches = [order[i:i + self.batch_size].tolist() for i in range(0, n, self.batch_size)]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        return batches
+
+    def __iter__(self):
+        tasks = [(self.epoch, b) for b in self.batches(self.epoch)]
+        self.epoch += 1
+        if self.workers <= 0:
+            for epoch, indices in tasks:
+                yield collate([self.dataset.get(i, epoch) for i in indices])
+            return
+        if self.pool is None:
+            # 풀은 epoch 사이에도 유지 (워커 시작/데이터셋 열기 비용 1번)
+            self.pool = mp.Pool(self.workers, initializer=_init_worker, initargs=(self.args,))
+        yield from self.pool.imap(_load_batch, tasks)
+
+    def close(self):
+        if self.pool is not None:
+            # 중간에 멈춘 epoch의 남은 배치는 버림
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_transform(n=2000, seed=0):
+    """transform_boxes가 박스별 cv2.transform 계산과 같은지 확인 → 최대 오차 (정규화 좌표)"""
+    rng = np.random.default_rng(seed)
+    src_size, dst_size = (1280, 720), SIZE
+    boxes = np.column_stack([np.zeros(n), rng.uniform(0.1, 0.9, (n, 2)), rng.uniform(0.02, 0.3, (n, 2))])
+    M = random_affine(rng, src_size, dst_size, AUGMENT)
+    got = transform_boxes(boxes, M, src_size, dst_size, min_area=0, min_px=0)
+
+    (sw, sh), (dw, dh) = src_size, dst_size
+    expected = []
+    for cls, xc, yc, w, h in boxes:
+        x1, y1, x2, y2 = (xc - w / 2) * sw, (yc - h / 2) * sh, (xc + w / 2) * sw, (yc + h / 2) * sh
+        pts = cv2.transform(np.array([[[x1, y1], [x2, y1], [x2, y2], [x1, y2]]]), M)[0]
+        bx1, by1 = np.clip(pts.min(0), 0, [dw, dh])
+        bx2, by2 = np.clip(pts.max(0), 0, [dw, dh])
+        if bx2 - bx1 > 0 and by2 - by1 > 0:
+            expected.append([cls, (bx1 + bx2) / 2 / dw, (by1 + by2) / 2 / dh, (bx2 - bx1) / dw, (by2 - by1) / dh])
+    expected = np.array(expected)
+    if len(expected) != len(got):
+        return np.inf
+    return float(np.abs(got - expected).max()) if len(got) else 0.0
+
+
+def save_preview(images, labels, path, columns=4):
+    """배치 앞쪽 샘플들을 모달리티별로 나눠 박스와 함께 한 장으로 저장 (증강 확인용)"""
+    rows = []
+    for j in range(min(columns, len(images))):
+        img = images[j]
+        boxes = labels[labels[:, 0] == j, 1:]
+        h, w = img.shape[:2]
+        tiles = []
+        for c in range(0, img.shape[2], 3):
+            tile = np.ascontiguousarray(img[:, :, c:c + 3])
+            for _, xc, yc, bw, bh in boxes:
+                cv2.rectangle(tile, (int((xc - bw / 2) * w), int((yc - bh / 2) * h)),
+                              (int((xc + bw / 2) * w), int((yc + bh / 2) * h)), (0, 255, 0), 2)
+            tiles.append(tile)
+        rows.append(np.concatenate(tiles, axis=1))
+    cv2.imwrite(path, np.concatenate(rows, axis=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Early Fusion 9채널 로더 처리량 측정')
+    parser.add_argument('source', help='세션 폴더 또는 tensor_store 저장소')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='0이면 현재 프로세스에서 처리')
+    parser.add_argument('--batches', type=int, default=50, help='측정할 배치 수')
+    parser.add_argument('--size', default=f'{SIZE[0]}x{SIZE[1]}', help='출력 크기 WxH')
+    parser.add_argument('--no-augment', action='store_true', help='크기 맞춤만 (증강 없음)')
+    parser.add_argument('--preview', help='첫 배치 미리보기 PNG 경로')
+    args = parser.parse_args()
+
+    err = check_transform()
+    print(f"박스 변환 확인 (박스별 cv2.transform 대비): 최대 오차 {err:.2e} {'✅' if err < 1e-6 else '❌'}")
+
+    size = tuple(map(int, args.size.lower().split('x')))
+    augment = None if args.no_augment else AUGMENT
+    with FusionLoader(args.source, args.batch, args.workers, size=size, augment=augment) as loader:
+        ds = loader.dataset
+        print(f"입력: {args.source} ({'저장소' if ds.store is not None else '세션 폴더'}), "
+              f"{len(ds)}샘플, 모달리티 {'+'.join(ds.modalities)} → {len(ds.modalities) * 3}채널, "
+              f"{size[0]}x{size[1]}, 배치 {args.batch}, 워커 {args.workers}")
+        if len(loader) == 0:
+            # 빈 세션 / 잘못된 경로 / 모두 rejected된 폴더 → epoch가 배치를 하나도 만들지 않음
+            print(f"❌ 샘플이 없습니다: {args.source}")
+            sys.exit(1)
+
+        done = samples = boxes = 0
+        start = first = None
+        t0 = time.perf_counter()
+        while done < args.batches:
+            for images, labels in loader:
+                if first is None:
+                    # 첫 배치는 워커 시작 시간 포함 → 처리량 측정에서 제외
+                    first = time.perf_counter() - t0
+                    start = time.perf_counter()
+                    if args.preview:
+                        save_preview(images, labels, args.preview)
+                        print(f"미리보기 저장: {args.preview}")
+                else:
+                    samples += len(images)
+                    boxes += len(labels)
+                done += 1
+                if done >= args.batches:
+                    break
+        elapsed = time.perf_counter() - start
+
+    print(f"첫 배치: {first:.2f}s (워커 시작 포함)")
+    if samples:
+        print(f"⏱️ {samples}샘플 {elapsed:.2f}s → {samples / elapsed:.1f} samples/s, "
+              f"박스 {boxes}개, 배치 형태 {images.shape} {images.dtype}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+"""
+Late Fusion 추론 (모달리티별 탐지기 동시 실행 + 박스 융합)
+- visual / thermal / nvg 각각 YOLO 탐지기 1개씩 로드해서 정합된 세트(triplet)에 동시에 실행
+    backend 'thread': 한 프로세스에서 모달리티별 스레드 (추론 중 GIL 해제, GPU에 적합)
+    backend 'process': 모달리티별 워커 프로세스 (CPU에서 프로세스마다 torch 스레드 수를 나눠 사용)
+- 결과 박스는 정규화 좌표로 모아서 융합 → 라벨 1세트 (labels_fused/<id>_v.txt)
+    'wbf': Weighted Box Fusion (겹치는 박스를 신뢰도×모달리티 가중치로 평균)
+    'nms': 모달리티 통합 NMS (겹치는 박스 중 신뢰도가 가장 높은 박스만 남김)
+- 읽기 대기 / 모달리티별 추론 / 동시 추론 / 융합 / 저장 단계별 지연시간과 triplets/s 출력
+
+사용 예:
+    python late_fusion_inference.py output/20251029_Takistan_1400_Taleban_2 --fusion wbf
+    python late_fusion_inference.py output/20251029_Takistan_1400_Taleban_2 --backend process --device cpu
+    python late_fusion_inference.py check     # 융합 함수 확인 (모델 없이)
+"""
+
+import os
+import sys
+import time
+import queue
+import argparse
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from tensor_store import MODALITIES
+
+# 세션 인덱스 (02_02_raw data processing/session_index.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '02_02_raw data processing'))
+from session_index import load_index
+
+# 모달리티별 모델 (같은 가중치여도 모달리티마다 따로 로드, 모달리티별 학습 모델로 교체 가능)
+MODELS = {
+    'visual': 'model/yolov9e.pt',
+    'thermal': 'model/yolov9e.pt',
+    'nvg': 'model/yolov9e.pt',
+}
+WEIGHTS = {'visual': 1.0, 'thermal': 1.0, 'nvg': 1.0}  # 융합 시 모달리티 가중치
+DEVICE = None            # None이면 ultralytics가 자동 선택 (GPU가 없으면 CPU)
+BACKEND = 'thread'       # 'thread' 또는 'process'
+PREFETCH = 4             # 미리 읽어 둘 triplet 수
+
+# 탐지 설정 (yolo9e_detect_only_person.py와 동일)
+PERSON_CLASSES = [0]
+CONF = 0.25
+IOU = 0.7
+MAX_DET = 300
+
+# 융합 설정
+FUSION = 'wbf'           # 'wbf' 또는 'nms'
+FUSION_IOU = 0.55        # 같은 물체로 볼 IoU
+FUSED_CONF = 0.1         # 융합 후 남길 최소 신뢰도 (wbf는 한 모달리티만 찾은 박스의 신뢰도가 가중치 비율만큼 낮아짐)
+
+LABEL_DIR = 'labels_fused'
+
+
+# ---- 박스 융합 (정규화 xyxy, numpy 벡터 연산) ----
+
+def box_iou(box, boxes):
+    """박스 1개 (4,)와 박스들 (N, 4)의 IoU (N,)"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-12)
+
+
+def concat_dets(dets, modalities):
+    """{모달리티: (boxes (N, 4), scores (N,), classes (N,))} → 하나로 합친 배열 + 모달리티 번호"""
+    boxes, scores, classes, mods = [], [], [], []
+    for k, mode in enumerate(modalities):
+        b, s, c = dets.get(mode, (np.zeros((0, 4)), np.zeros(0), np.zeros(0)))
+        boxes.append(b)
+        scores.append(s)
+        classes.append(c)
+        mods.append(np.full(len(s), k))
+    return (np.concatenate(boxes).reshape(-1, 4).astype(np.float64), np.concatenate(scores).astype(np.float64),
+            np.concatenate(classes).astype(np.int64), np.concatenate(mods).astype(np.int64))
+
+
+def _class_offset(boxes, classes):
+    """클래스별로 좌표를 떨어뜨려 클래스가 다른 박스끼리는 겹치지 않게 함 (정규화 좌표라 2씩 이동)"""
+    return boxes + (classes * 2.0)[:, None]
+
+
+def fuse_nms(dets, modalities, iou=FUSION_IOU):
+    """
+    모달리티 통합 NMS (클래스별)
+
+    Returns: (boxes (K, 4), scores (K,), classes (K,))
+    """
+    boxes, scores, classes, _ = concat_dets(dets, modalities)
+    shifted = _class_offset(boxes, classes)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        order = rest[box_iou(shifted[i], shifted[rest]) <= iou]
+    keep = np.array(keep, dtype=np.int64)
+    return boxes[keep], scores[keep], classes[keep]
+
+
+def fuse_wbf(dets, modalities, weights=WEIGHTS, iou=FUSION_IOU):
+    """
+    Weighted Box Fusion (클래스별)
+
+    가중 신뢰도가 가장 높은 남은 박스를 기준으로 IoU가 iou 이상인 박스들을 한 클러스터로 묶고
+    - 좌표: 신뢰도×모달리티 가중치로 가중 평균
+    - 신뢰도: 모달리티별 최고 신뢰도의 가중 평균 (박스를 찾지 못한 모달리티는 0)
+    반복 횟수 = 융합된 박스 수, 각 반복은 전체 박스에 대한 벡터 연산
+
+    Returns: (boxes (K, 4), scores (K,), classes (K,))
+    """
+    boxes, scores, classes, mods = concat_dets(dets, modalities)
+    w_mod = np.array([weights.get(m, 1.0) for m in modalities], dtype=np.float64)
+    ws = scores * w_mod[mods]
+    shifted = _class_offset(boxes, classes)
+
+    order = np.argsort(-ws, kind='stable')
+    remaining = np.ones(len(ws), dtype=bool)
+    out_boxes, out_scores, out_classes = [], [], []
+    for i in order:
+        if not remaining[i]:
+            continue
+        members = np.flatnonzero(remaining)
+        members = members[box_iou(shifted[i], shifted[members]) >= iou]   # i 자신 포함 (IoU 1)
+        remaining[members] = False
+
+        mw = ws[members]
+        out_boxes.append((boxes[members] * mw[:, None]).sum(axis=0) / mw.sum())
+        best = np.zeros(len(modalities))
+        np.maximum.at(best, mods[members], scores[members])
+        out_scores.append((best * w_mod).sum() / w_mod.sum())
+        out_classes.append(classes[i])
+
+    if not out_boxes:
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=np.int64)
+    return np.array(out_boxes), np.array(out_scores), np.array(out_classes, dtype=np.int64)
+
+
+def fuse(dets, modalities, method=FUSION, iou=FUSION_IOU, weights=WEIGHTS, min_conf=FUSED_CONF):
+    if method == 'wbf':
+        boxes, scores, classes = fuse_wbf(dets, modalities, weights, iou)
+    else:
+        boxes, scores, classes = fuse_nms(dets, modalities, iou)
+    keep = scores >= min_conf
+    return boxes[keep], scores[keep], classes[keep]
+
+
+def label_lines(boxes, classes):
+    """정규화 xyxy → YOLO 형식(class xc yc w h) 문자열 목록"""
+    xy = (boxes[:, :2] + boxes[:, 2:]) / 2
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return [f"{c} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n"
+            for c, (xc, yc), (w, h) in zip(classes.tolist(), xy.tolist(), wh.tolist())]
+
+
+def check_fusion(n=300, seed=0):
+    """
+    융합 함수 확인 (모델 없이)
+    - fuse_nms가 박스 쌍마다 IoU를 따로 계산하는 단순 NMS와 같은지
+    - 세 모달리티가 같은 박스를 찾으면 wbf 결과는 박스 1개, 신뢰도 그대로인지
+    - 한 모달리티만 찾은 박스는 wbf 신뢰도가 가중치 비율만큼 낮아지는지
+
+    Returns: 실패 항목 수
+    """
+    rng = np.random.default_rng(seed)
+    modalities = list(MODALITIES)
+    dets = {}
+    for m in modalities:
+        xy = rng.uniform(0, 0.9, (n // 3, 2))
+        wh = rng.uniform(0.02, 0.1, (n // 3, 2))
+        dets[m] = (np.hstack([xy, xy + wh]), rng.uniform(0.25, 1, n // 3), rng.integers(0, 2, n // 3))
+
+    def naive_iou(a, b):
+        iw = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+        ih = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = iw * ih
+        return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
+
+    boxes, scores, classes, _ = concat_dets(dets, modalities)
+    keep = []
+    for i in sorted(range(len(scores)), key=lambda i: -scores[i]):
+        if all(classes[i] != classes[j] or naive_iou(boxes[i], boxes[j]) <= FUSION_IOU for j in keep):
+            keep.append(i)
+    got = fuse_nms(dets, modalities)[0]
+    failures = 0
+    ok = len(got) == len(keep) and np.allclose(got, boxes[keep])
+    print(f"  NMS (박스 쌍별 계산 대비): {len(got)}/{len(keep)}개 {'✅' if ok else '❌'}")
+    failures += not ok
+
+    box = np.array([[0.2, 0.2, 0.4, 0.6]])
+    same = {m: (box + 0.001 * k, np.array([0.8]), np.array([0])) for k, m in enumerate(modalities)}
+    b, s, c = fuse_wbf(same, modalities)
+    ok = len(b) == 1 and abs(s[0] - 0.8) < 1e-9
+    print(f"  WBF (세 모달리티 같은 박스 → 1개, 신뢰도 0.80): {len(b)}개, {s[0]:.2f} {'✅' if ok else '❌'}")
+    failures += not ok
+
+    single = {'thermal': (box, np.array([0.9]), np.array([0]))}
+    b, s, c = fuse_wbf(single, modalities)
+    expected = 0.9 * WEIGHTS['thermal'] / sum(WEIGHTS[m] for m in modalities)
+    ok = len(b) == 1 and abs(s[0] - expected) < 1e-9 and np.allclose(b, box)
+    print(f"  WBF (thermal만 탐지 → 신뢰도 {expected:.2f}): {s[0]:.2f} {'✅' if ok else '❌'}")
+    failures += not ok
+    return failures
+
+
+# ---- 탐지기 ----
+
+def load_model(path):
+    from ultralytics import YOLO
+    return YOLO(path)
+
+
+def detect(model, img, device=DEVICE):
+    """이미지 1장 추론 → ((boxes 정규화 xyxy, scores, classes), 추론 시간)"""
+    t0 = time.perf_counter()
+    r = model(img, device=device, classes=PERSON_CLASSES, conf=CONF, iou=IOU, max_det=MAX_DET, verbose=False)[0]
+    dets = (r.boxes.xyxyn.cpu().numpy(), r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy().astype(np.int64))
+    return dets, time.perf_counter() - t0
+
+
+class ThreadDetectors:
+    """모달리티별 모델을 한 프로세스에 올리고 스레드로 동시에 실행"""
+
+    def __init__(self, modalities, models=MODELS, device=DEVICE):
+        self.modalities = modalities
+        self.device = device
+        self.models = {m: load_model(models[m]) for m in modalities}
+        self.executor = ThreadPoolExecutor(max_workers=len(modalities))
+
+    def predict(self, imgs):
+        """{모달리티: 이미지} → {모달리티: (dets, 추론 시간)}"""
+        futures = {m: self.executor.submit(detect, self.models[m], imgs[m], self.device) for m in self.modalities}
+        return {m: f.result() for m, f in futures.items()}
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def _detector_loop(model_path, device, threads, in_q, out_q):
+    """모달리티 1개 워커 프로세스: 모델 1번 로드 후 이미지가 오면 추론 결과를 돌려줌 (None이면 종료)"""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    cv2.setNumThreads(1)
+    model = load_model(model_path)
+    out_q.put('ready')
+    while True:
+        img = in_q.get()
+        if img is None:
+            break
+        out_q.put(detect(model, img, device))
+
+
+class ProcessDetectors:
+    """모달리티별 워커 프로세스 (CPU 코어를 모달리티 수로 나눠 torch 스레드 수 지정)"""
+
+    def __init__(self, modalities, models=MODELS, device=DEVICE):
+        self.modalities = modalities
+        threads = max(1, (os.cpu_count() or 1) // len(modalities))
+        self.queues = {m: (mp.Queue(maxsize=2), mp.Queue(maxsize=2)) for m in modalities}
+        self.procs = [mp.Process(target=_detector_loop, args=(models[m], device, threads, *self.queues[m]), daemon=True)
+                      for m in modalities]
+        for p in self.procs:
+            p.start()
+        for m in modalities:
+            self._get(m)  # 모델 로드 완료 대기
+
+    def _get(self, m):
+        """워커 결과 대기 (워커가 죽으면 멈춰 있지 않고 예외)"""
+        proc = self.procs[self.modalities.index(m)]
+        while True:
+            try:
+                return self.queues[m][1].get(timeout=1)
+            except queue.Empty:
+                if not proc.is_alive():
+                    raise RuntimeError(f'{m} 탐지 워커 종료 (exit code {proc.exitcode})')
+
+    def predict(self, imgs):
+        for m in self.modalities:
+            self.queues[m][0].put(imgs[m])
+        return {m: self._get(m) for m in self.modalities}
+
+    def close(self):
+        for m, p in zip(self.modalities, self.procs):
+            if p.is_alive():
+                self.queues[m][0].put(None)
+        for p in self.procs:
+            p.join(timeout=10)
+
+
+# ---- 실행 ----
+
+def read_triplet(index, sample_id, modalities):
+    imgs = {m: cv2.imread(index.path(sample_id, m)) for m in modalities}
+    missing = [m for m, img in imgs.items() if img is None]
+    return (imgs, None) if not missing else (None, missing)
+
+
+def iter_triplets(index, ids, modalities, prefetch=PREFETCH):
+    """triplet을 스레드로 미리 읽어 (샘플 id, {모달리티: 이미지}, 읽기 대기 시간)을 순서대로 반환"""
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending = deque()
+        ids = iter(ids)
+        for sample_id in ids:
+            pending.append((sample_id, executor.submit(read_triplet, index, sample_id, modalities)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            sample_id, future = pending.popleft()
+            t0 = time.perf_counter()
+            imgs, missing = future.result()
+            wait = time.perf_counter() - t0
+            next_id = next(ids, None)
+            if next_id is not None:
+                pending.append((next_id, executor.submit(read_triplet, index, next_id, modalities)))
+            if imgs is None:
+                print(f'⚠️ 이미지를 읽을 수 없습니다: {sample_id} ({", ".join(missing)})')
+                continue
+            yield sample_id, imgs, wait
+
+
+def print_latency(times, elapsed, count):
+    """단계별 지연시간 (ms) 표"""
+    print(f"\n{'단계':<16s}{'평균':>9s}{'p50':>9s}{'p95':>9s}")
+    for name, values in times.items():
+        v = np.array(values) * 1000
+        print(f"{name:<16s}{v.mean():9.1f}{np.percentile(v, 50):9.1f}{np.percentile(v, 95):9.1f}")
+    per_mod = [np.mean(v) for k, v in times.items() if k.startswith('추론 ') and k != '추론 (동시)']
+    if per_mod and times.get('추론 (동시)'):
+        print(f"\n모달리티별 추론 합계 {sum(per_mod) * 1000:.1f}ms → 동시 실행 "
+              f"{np.mean(times['추론 (동시)']) * 1000:.1f}ms ({sum(per_mod) / np.mean(times['추론 (동시)']):.2f}x)")
+    print(f"⏱️ {count} triplets, {elapsed:.1f}s → {count / elapsed:.2f} triplets/s")
+
+
+def run(session_dir, fusion=FUSION, backend=BACKEND, device=DEVICE, limit=None):
+    index = load_index(session_dir)
+    modalities = [m for m in MODALITIES if m in MODELS and m in index.modalities()]
+    ids = index.ids(modalities)[:limit]
+    out_dir = os.path.join(session_dir, LABEL_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"세션: {session_dir}, 모달리티 {'+'.join(modalities)}, {len(ids)} triplets, "
+          f"backend {backend}, 융합 {fusion}")
+
+    t0 = time.perf_counter()
+    detectors = {'thread': ThreadDetectors, 'process': ProcessDetectors}[backend](modalities, MODELS, device)
+    print(f"모델 로드: {time.perf_counter() - t0:.1f}s")
+
+    times = {'읽기 대기': []}
+    times.update({f'추론 {m}': [] for m in modalities})
+    times.update({'추론 (동시)': [], '융합': [], '저장': [], '전체': []})
+    count = boxes_total = 0
+    start = None
+    try:
+        for n, (sample_id, imgs, wait) in enumerate(iter_triplets(index, ids, modalities)):
+            t0 = time.perf_counter()
+            results = detectors.predict(imgs)
+            t1 = time.perf_counter()
+            boxes, scores, classes = fuse({m: d for m, (d, _) in results.items()}, modalities, fusion)
+            t2 = time.perf_counter()
+            with open(os.path.join(out_dir, f'{sample_id}_v.txt'), 'w') as f:
+                f.writelines(label_lines(boxes, classes))
+            t3 = time.perf_counter()
+
+            if n == 0:
+                # 첫 triplet은 warmup (통계 제외)
+                start = time.perf_counter()
+                continue
+            times['읽기 대기'].append(wait)
+            for m, (_, seconds) in results.items():
+                times[f'추론 {m}'].append(seconds)
+            times['추론 (동시)'].append(t1 - t0)
+            times['융합'].append(t2 - t1)
+            times['저장'].append(t3 - t2)
+            times['전체'].append(wait + t3 - t0)
+            count += 1
+            boxes_total += len(boxes)
+    finally:
+        detectors.close()
+
+    print(f"\n✅ 융합 라벨 저장: {out_dir} (박스 {boxes_total}개, warmup 1개 제외)")
+    if count:
+        print_latency(times, time.perf_counter() - start, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Late Fusion 추론 (모달리티별 탐지기 동시 실행 + 박스 융합)')
+    parser.add_argument('session', help="visual/thermal/nvg 상위 폴더 ('check'이면 융합 함수만 확인)")
+    parser.add_argument('--fusion', choices=['wbf', 'nms'], default=FUSION)
+    parser.add_argument('--backend', choices=['thread', 'process'], default=BACKEND)
+    parser.add_argument('--device', default=DEVICE, help='예: cpu, 0 (기본: 자동)')
+    parser.add_argument('--limit', type=int, help='처리할 triplet 수 (측정용)')
+    args = parser.parse_args()
+
+    if args.session == 'check':
+        print('융합 함수 확인')
+        sys.exit(1 if check_fusion() else 0)
+    run(args.session, args.fusion, args.backend, args.device, args.limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+멀티모달 텐서 저장소 (memory-mapped)
+- output/<session>/{visual,thermal,nvg,labels} → 전처리(리사이즈)된 uint8 배열 1개로 패킹
+    images.npy   (N, H, W, C_total) uint8, 모달리티를 채널 축으로 이어 붙임 (BGR, 예: visual 0-2 / thermal 3-5 / nvg 6-8)
+    labels.npy   (M, 5) float32, 전체 샘플의 YOLO 라벨 [cls, xc, yc, w, h] (정규화 좌표)
+    offsets.npy  (N + 1,) int64, 샘플 i의 라벨 = labels[offsets[i]:offsets[i + 1]]
+    meta.json    샘플 id, 모달리티별 채널 범위, 크기 (마지막에 기록 → 있으면 완성된 저장소)
+- 학습 시 PNG 디코딩 없이 np.load(mmap_mode='r')로 열어 샘플/배치를 복사 없이(view) 반환
+- 리사이즈는 비율 유지 없이 (W, H)로 맞춤 → 정규화 라벨 좌표는 그대로 유효
+
+사용 예:
+    python tensor_store.py build output/20251029_Takistan_1400_Taleban_2 store/Takistan_1400 --size 640x384
+    python tensor_store.py info store/Takistan_1400
+    python tensor_store.py verify store/Takistan_1400 --samples 200
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# 세션 인덱스 (02_02_raw data processing/session_index.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '02_02_raw data processing'))
+from session_index import load_index
+
+IMAGES_NAME = 'images.npy'
+LABELS_NAME = 'labels.npy'
+OFFSETS_NAME = 'offsets.npy'
+META_NAME = 'meta.json'
+
+MODALITIES = ('visual', 'thermal', 'nvg')
+CHANNELS = 3                 # 모달리티당 채널 수 (BGR)
+SIZE = (640, 384)            # 저장 크기 (W, H), 32의 배수
+WORKERS = os.cpu_count() or 1
+
+
+def load_sample(index, sample_id, modalities, size):
+    """샘플 1개 → (모달리티 채널을 이어 붙인 (H, W, C) uint8, 라벨 (k, 5) float32)"""
+    parts = []
+    for mode in modalities:
+        img = cv2.imread(index.path(sample_id, mode), cv2.IMREAD_COLOR)
+        if img is None:
+            raise IOError(f'이미지를 읽을 수 없음: {index.path(sample_id, mode)}')
+        if (img.shape[1], img.shape[0]) != size:
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        parts.append(img)
+
+    # 박스 수는 인덱스에 있으므로 빈 라벨/라벨 없음은 파일을 열지 않음
+    if index.boxes(sample_id) == 0:
+        labels = np.zeros((0, 5), np.float32)
+    else:
+        labels = np.loadtxt(index.label_path(sample_id), ndmin=2, dtype=np.float32).reshape(-1, 5)
+    return np.concatenate(parts, axis=2), labels
+
+
+def build_store(session_dir, store_dir, size=SIZE, modalities=None, workers=WORKERS):
+    """
+    세션 폴더 → 텐서 저장소
+
+    Args:
+        session_dir: visual/thermal/nvg/labels 상위 폴더 (yolo9e_detect_only_person.py의 output)
+        store_dir: 저장소 폴더
+        size: (W, H)
+        modalities: 사용할 모달리티 (None이면 세션에 있는 것 전부, 모든 모달리티가 있는 샘플만 포함)
+        workers: 디코딩/리사이즈 스레드 수 (cv2는 GIL을 풀어 스레드로 병렬 처리됨)
+    Returns: 샘플 수
+    """
+    index = load_index(session_dir)
+    modalities = list(modalities or [m for m in MODALITIES if m in index.modalities()])
+    ids = index.ids(modalities)
+    if not ids:
+        raise ValueError(f'모든 모달리티({", ".join(modalities)})가 있는 샘플이 없음: {session_dir}')
+
+    os.makedirs(store_dir, exist_ok=True)
+    # 이전 저장소를 덮어쓰는 동안에는 meta가 없도록 먼저 삭제 (중간에 끊기면 미완성으로 인식)
+    meta_path = os.path.join(store_dir, META_NAME)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    w, h = size
+    n = len(ids)
+    images = np.lib.format.open_memmap(os.path.join(store_dir, IMAGES_NAME), mode='w+',
+                                       dtype=np.uint8, shape=(n, h, w, CHANNELS * len(modalities)))
+    labels = [None] * n
+
+    def work(i):
+        # 각 스레드가 자기 샘플 위치에 바로 기록 (결과를 모아 두지 않음)
+        images[i], labels[i] = load_sample(index, ids[i], modalities, size)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, _ in enumerate(executor.map(work, range(n)), 1):
+            if done % 1000 == 0 or done == n:
+                print(f'  {done}/{n} 샘플 패킹')
+    images.flush()
+    del images
+
+    counts = np.array([len(l) for l in labels], dtype=np.int64)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    packed = np.concatenate(labels) if offsets[-1] else np.zeros((0, 5), np.float32)
+    np.save(os.path.join(store_dir, LABELS_NAME), packed.astype(np.float32))
+    np.save(os.path.join(store_dir, OFFSETS_NAME), offsets)
+
+    meta = {
+        'version': 1,
+        'session': os.path.abspath(session_dir),
+        'size': [w, h],
+        'modalities': {m: [k * CHANNELS, (k + 1) * CHANNELS] for k, m in enumerate(modalities)},
+        'color': 'BGR',
+        'ids': ids,
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return n
+
+
+class TensorStore:
+    """
+    텐서 저장소 읽기 (memory-mapped, 반환값은 복사 없는 view)
+
+    Args:
+        store_dir: build_store()로 만든 폴더
+    """
+
+    def __init__(self, store_dir):
+        meta_path = os.path.join(store_dir, META_NAME)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f'완성된 저장소가 아님 (meta.json 없음): {store_dir}')
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.store_dir = store_dir
+        self.ids = self.meta['ids']
+        self.modalities = {m: slice(*c) for m, c in self.meta['modalities'].items()}
+        self.images = np.load(os.path.join(store_dir, IMAGES_NAME), mmap_mode='r')
+        self.labels = np.load(os.path.join(store_dir, LABELS_NAME), mmap_mode='r')
+        self.offsets = np.load(os.path.join(store_dir, OFFSETS_NAME))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        """샘플 i → (이미지 (H, W, C), 라벨 (k, 5)) view"""
+        return self.images[i], self.labels[self.offsets[i]:self.offsets[i + 1]]
+
+    def modality(self, i, name):
+        """샘플 i의 모달리티 1개 (H, W, 3) view"""
+        return self.images[i, :, :, self.modalities[name]]
+
+    def batch(self, start, stop):
+        """
+        연속 구간 [start, stop) → (이미지 (B, H, W, C) view, 라벨 view, 배치 기준 offsets)
+
+        배치 내 샘플 j의 라벨 = labels[offsets[j]:offsets[j + 1]]
+        """
+        offsets = self.offsets[start:stop + 1]
+        return (self.images[start:stop], self.labels[offsets[0]:offsets[-1]], offsets - offsets[0])
+
+    def take(self, indices):
+        """임의 순서 샘플들 (셔플 배치용, 불연속이라 복사본) → (이미지 (B, H, W, C), 라벨 목록)"""
+        indices = np.asarray(indices)
+        return self.images[indices], [self.labels[self.offsets[i]:self.offsets[i + 1]] for i in indices]
+
+    def summary(self):
+        w, h = self.meta['size']
+        channels = ', '.join(f'{m} {s.start}-{s.stop - 1}' for m, s in self.modalities.items())
+        return (f'{len(self)}샘플, {w}x{h}, 채널 {self.images.shape[3]} ({channels}), '
+                f'박스 {len(self.labels)}개, {self.images.nbytes / 1024 ** 3:.2f} GB')
+
+
+def verify(store_dir, samples=100, seed=0):
+    """
+    임의 샘플을 원본 PNG에서 다시 읽어 저장소와 비교 + 읽기 속도 비교 (PNG 디코딩 vs memmap)
+
+    Returns: 불일치 샘플 수
+    """
+    store = TensorStore(store_dir)
+    index = load_index(store.meta['session'], update=False)
+    size = tuple(store.meta['size'])
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(store), size=min(samples, len(store)), replace=False)
+
+    mismatch = 0
+    t0 = time.perf_counter()
+    for i in picks:
+        img, labels = load_sample(index, store.ids[i], list(store.modalities), size)
+        stored_img, stored_labels = store[i]
+        mismatch += not (np.array_equal(img, stored_img) and np.array_equal(labels, stored_labels))
+    decode_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in picks:
+        img, labels = store[i]
+        np.asarray(img).sum(dtype=np.uint64)  # 실제로 페이지를 읽도록 접근
+    mmap_time = time.perf_counter() - t0
+
+    print(f'확인 샘플: {len(picks)}개, 불일치 {mismatch}개 {"✅" if mismatch == 0 else "❌"}')
+    print(f'  PNG 디코딩+리사이즈: {len(picks) / decode_time:.1f} samples/s')
+    print(f'  memmap 읽기:         {len(picks) / mmap_time:.1f} samples/s')
+    return mismatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='멀티모달 세션 → memory-mapped 텐서 저장소')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='세션 폴더를 저장소로 패킹')
+    p.add_argument('session', help='visual/thermal/nvg/labels 상위 폴더')
+    p.add_argument('store', help='저장소 폴더')
+    p.add_argument('--size', default=f'{SIZE[0]}x{SIZE[1]}', help='저장 크기 WxH')
+    p.add_argument('--modalities', help='쉼표로 구분 (기본: 세션에 있는 모달리티 전부)')
+    p.add_argument('--workers', type=int, default=WORKERS)
+
+    p = sub.add_parser('info', help='저장소 정보')
+    p.add_argument('store')
+
+    p = sub.add_parser('verify', help='원본과 비교 + 읽기 속도')
+    p.add_argument('store')
+    p.add_argument('--samples', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        size = tuple(map(int, args.size.lower().split('x')))
+        modalities = args.modalities.split(',') if args.modalities else None
+        start = time.perf_counter()
+        n = build_store(args.session, args.store, size, modalities, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f'✅ 저장소 생성: {args.store} ({elapsed:.1f}s, {n / elapsed:.1f} samples/s)')
+        print(f'  {TensorStore(args.store).summary()}')
+    elif args.command == 'info':
+        print(TensorStore(args.store).summary())
+    else:
+        sys.exit(1 if verify(args.store, args.samples) else 0)
+
+
+if __name__ == '__main__':
+    main()